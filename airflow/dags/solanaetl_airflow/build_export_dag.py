@@ -18,13 +18,14 @@
 
 import logging
 import os
+import shutil
 from datetime import timedelta
-from tempfile import TemporaryDirectory
+from tempfile import TemporaryDirectory, gettempdir
 
 import pendulum
 from airflow import DAG, configuration
 from airflow.operators import python_operator
-from solanaetl.cli import export_blocks_and_transactions, extract_accounts
+from solanaetl.cli import export_blocks_and_transactions, extract_accounts, get_block_range_for_date
 from solanaetl.cli.extract_token_transfers import extract_token_transfers
 from solanaetl.cli.extract_tokens import extract_tokens
 
@@ -36,15 +37,21 @@ def build_export_dag(
     dag_id,
     provider_uris,
     output_bucket,
-    export_start_block,
-    export_end_block,
+    export_start_block=None,
+    export_end_block=None,
     notification_emails=None,
     export_schedule_interval='0 0 * * *',
     export_max_workers=1,
+    export_min_workers=None,
     export_block_batch_size=1,
     export_batch_size=100,
+    # getMultipleAccounts calls of up to 100 accounts per JSON RPC batch
+    export_accounts_batch_size=1,
     export_max_active_runs=None,
     export_retries=5,
+    export_load_balance_provider_uris=False,
+    export_rate_limit=None,
+    export_rate_limit_bytes=None,
     **kwargs
 ):
     default_dag_args = {
@@ -66,6 +73,13 @@ def build_export_dag(
     extract_token_transfers_toggle = True
     extract_tokens_toggle = True
 
+    # Tasks running concurrently on a worker share the quota of the providers
+    rate_limit_kwargs = {
+        'rate_limit': export_rate_limit,
+        'rate_limit_bytes': export_rate_limit_bytes,
+        'rate_limit_file': os.path.join(gettempdir(), '{}_rate_limit.json'.format(dag_id)),
+    }
+
     if export_max_active_runs is None:
         export_max_active_runs = configuration.conf.getint(
             'core', 'max_active_runs_per_dag')
@@ -80,12 +94,36 @@ def build_export_dag(
     from airflow.providers.google.cloud.hooks.gcs import GCSHook
     gcs_hook = GCSHook()
 
+    # Without a fixed block range, each run exports the slots of its execution date
+    export_by_date = export_start_block is None
+
     # Export
-    def export_path(directory, start_block, end_block):
+    def export_path(directory, execution_date):
+        if export_by_date:
+            return 'export/{directory}/block_date={block_date}/'.format(
+                directory=directory, block_date=execution_date.strftime('%Y-%m-%d')
+            )
         return 'export/{directory}/start_block={start_block}/end_block={end_block}/'.format(
-            directory=directory, start_block=start_block, end_block=end_block
+            directory=directory, start_block=export_start_block, end_block=export_end_block
         )
 
+    def get_block_range(tempdir, execution_date, provider_uri):
+        if not export_by_date:
+            return export_start_block, export_end_block
+
+        block_range_filename = os.path.join(tempdir, 'block_range.txt')
+        get_block_range_for_date.callback(
+            provider_uri=provider_uri,
+            date=execution_date,
+            output=block_range_filename,
+            # Kept on the worker, the previous days bound the search
+            slot_time_index_file=os.path.join(gettempdir(), '{}_slot_time_index.json'.format(dag_id)),
+        )
+        with open(block_range_filename) as block_range_file:
+            start_block, end_block = block_range_file.read().split(',')
+
+        return int(start_block), int(end_block)
+
     def copy_to_export_path(file_path, export_path):
         logging.info('Calling copy_to_export_path({}, {})'.format(
             file_path, export_path))
@@ -108,73 +146,83 @@ def build_export_dag(
             object=export_path + filename,
             filename=file_path)
 
-    def export_blocks_and_transactions_command(provider_uri, **kwargs):
-        with TemporaryDirectory() as tempdir:
-            logging.info('Calling export_blocks_and_transactions({}, {}, {}, {}, {}, ...)'.format(
-                export_start_block, export_end_block, export_batch_size, provider_uri, export_max_workers))
+    def export_blocks_and_transactions_command(execution_date, provider_uri, **kwargs):
+        # Kept on the worker until uploaded, so that a retry on the same worker resumes from the journal
+        export_dir = os.path.join(gettempdir(), '{}_export_{}'.format(
+            dag_id, execution_date.strftime('%Y%m%dT%H%M%S')))
+        os.makedirs(export_dir, exist_ok=True)
+
+        start_block, end_block = get_block_range(export_dir, execution_date, provider_uri)
+
+        logging.info('Calling export_blocks_and_transactions({}, {}, {}, {}, {}, ...)'.format(
+            start_block, end_block, export_batch_size, provider_uri, export_max_workers))
+
+        export_blocks_and_transactions.callback(
+            start_block=start_block,
+            end_block=end_block,
+            batch_size=export_block_batch_size,
+            provider_uri=provider_uri,
+            max_workers=export_max_workers,
+            min_workers=export_min_workers,
+            blocks_output=os.path.join(export_dir, 'blocks.csv'),
+            transactions_output=os.path.join(export_dir, 'transactions.csv'),
+            instructions_output=os.path.join(export_dir, 'instructions.csv'),
+            journal_file=os.path.join(export_dir, 'journal.json'),
+            # Kept on the worker across runs and retries
+            skipped_slots_dir=os.path.join(gettempdir(), '{}_skipped_slots'.format(dag_id)),
+            **rate_limit_kwargs
+        )
 
-            export_blocks_and_transactions.callback(
-                start_block=export_start_block,
-                end_block=export_end_block,
-                batch_size=export_block_batch_size,
-                provider_uri=provider_uri,
-                max_workers=export_max_workers,
-                blocks_output=os.path.join(tempdir, 'blocks.csv'),
-                transactions_output=os.path.join(tempdir, 'transactions.csv'),
-                instructions_output=os.path.join(tempdir, 'instructions.csv')
-            )
+        copy_to_export_path(
+            os.path.join(export_dir, 'blocks.csv'),
+            export_path('blocks', execution_date)
+        )
 
-            copy_to_export_path(
-                os.path.join(tempdir, 'blocks.csv'),
-                export_path('blocks', export_start_block, export_end_block)
-            )
+        copy_to_export_path(
+            os.path.join(export_dir, 'transactions.csv'),
+            export_path('transactions', execution_date)
+        )
 
-            copy_to_export_path(
-                os.path.join(tempdir, 'transactions.csv'),
-                export_path('transactions', export_start_block,
-                            export_end_block)
-            )
+        copy_to_export_path(
+            os.path.join(export_dir, 'instructions.csv'),
+            export_path('instructions', execution_date)
+        )
 
-            copy_to_export_path(
-                os.path.join(tempdir, 'instructions.csv'),
-                export_path('instructions', export_start_block,
-                            export_end_block)
-            )
+        shutil.rmtree(export_dir)
 
-    def extract_accounts_command(provider_uri, **kwargs):
+    def extract_accounts_command(execution_date, provider_uri, **kwargs):
         with TemporaryDirectory() as tempdir:
             copy_from_export_path(
-                export_path('instructions', export_start_block,
-                            export_end_block),
+                export_path('instructions', execution_date),
                 os.path.join(tempdir, 'instructions.csv')
             )
 
-            logging.info('Calling extract_accounts({}, {}, {}, {}, {}, ...)'.format(
-                export_start_block, export_end_block, export_batch_size, provider_uri, export_max_workers))
+            logging.info('Calling extract_accounts({}, {}, {}, {}, ...)'.format(
+                execution_date, export_accounts_batch_size, provider_uri, export_max_workers))
 
             extract_accounts.callback(
                 instructions=os.path.join(tempdir, 'instructions.csv'),
-                batch_size=export_batch_size,
+                batch_size=export_accounts_batch_size,
                 output=os.path.join(tempdir, 'accounts.csv'),
                 max_workers=export_max_workers,
-                provider_uri=provider_uri
+                provider_uri=provider_uri,
+                **rate_limit_kwargs
             )
 
             copy_to_export_path(
                 os.path.join(tempdir, 'accounts.csv'),
-                export_path('accounts', export_start_block, export_end_block)
+                export_path('accounts', execution_date)
             )
 
-    def extract_token_transfers_command(**kwargs):
+    def extract_token_transfers_command(execution_date, **kwargs):
         with TemporaryDirectory() as tempdir:
             copy_from_export_path(
-                export_path('instructions', export_start_block,
-                            export_end_block),
+                export_path('instructions', execution_date),
                 os.path.join(tempdir, 'instructions.csv')
             )
 
-            logging.info('Calling extract_token_transfers({}, {}, {}, {}, ...)'.format(
-                export_start_block, export_end_block, export_batch_size, export_max_workers))
+            logging.info('Calling extract_token_transfers({}, {}, {}, ...)'.format(
+                execution_date, export_batch_size, export_max_workers))
 
             extract_token_transfers.callback(
                 instructions=os.path.join(tempdir, 'instructions.csv'),
@@ -185,32 +233,31 @@ def build_export_dag(
 
             copy_to_export_path(
                 os.path.join(tempdir, 'token_transfers.csv'),
-                export_path('token_transfers',
-                            export_start_block, export_end_block)
+                export_path('token_transfers', execution_date)
             )
 
-    def extract_tokens_command(provider_uri, **kwargs):
+    def extract_tokens_command(execution_date, provider_uri, **kwargs):
         with TemporaryDirectory() as tempdir:
             copy_from_export_path(
-                export_path('accounts', export_start_block,
-                            export_end_block),
+                export_path('accounts', execution_date),
                 os.path.join(tempdir, 'accounts.csv')
             )
 
-            logging.info('Calling extract_tokens({}, {}, {}, {}, {}, ...)'.format(
-                export_start_block, export_end_block, export_batch_size, provider_uri, export_max_workers))
+            logging.info('Calling extract_tokens({}, {}, {}, {}, ...)'.format(
+                execution_date, export_accounts_batch_size, provider_uri, export_max_workers))
 
             extract_tokens.callback(
                 accounts=os.path.join(tempdir, 'accounts.csv'),
-                batch_size=export_batch_size,
+                batch_size=export_accounts_batch_size,
                 output=os.path.join(tempdir, 'tokens.csv'),
                 max_workers=export_max_workers,
-                provider_uri=provider_uri
+                provider_uri=provider_uri,
+                **rate_limit_kwargs
             )
 
             copy_to_export_path(
                 os.path.join(tempdir, 'tokens.csv'),
-                export_path('tokens', export_start_block, export_end_block)
+                export_path('tokens', execution_date)
             )
 
     def add_task(toggle, task_id, python_callable, dependencies=None):
@@ -230,20 +277,24 @@ def build_export_dag(
         else:
             return None
 
+    def add_provider_uris(python_callable):
+        if export_load_balance_provider_uris:
+            return add_provider_uri_load_balancing(python_callable, provider_uris)
+        else:
+            return add_provider_uri_fallback_loop(python_callable, provider_uris)
+
     # Operators
 
     export_blocks_and_transactions_operator = add_task(
         export_blocks_and_transactions_toggle,
         'export_blocks_and_transactions',
-        add_provider_uri_fallback_loop(
-            export_blocks_and_transactions_command, provider_uris),
+        add_provider_uris(export_blocks_and_transactions_command),
     )
 
     extract_accounts_operator = add_task(
         extract_accounts_toggle,
         'extract_accounts',
-        add_provider_uri_fallback_loop(
-            extract_accounts_command, provider_uris),
+        add_provider_uris(extract_accounts_command),
         dependencies=[export_blocks_and_transactions_operator]
     )
 
@@ -257,8 +308,7 @@ def build_export_dag(
     extract_tokens_operator = add_task(
         extract_tokens_toggle,
         'extract_tokens',
-        add_provider_uri_fallback_loop(
-            extract_tokens_command, provider_uris),
+        add_provider_uris(extract_tokens_command),
         dependencies=[extract_accounts_operator]
     )
 
@@ -282,3 +332,13 @@ def add_provider_uri_fallback_loop(python_callable, provider_uris):
                     raise e
 
     return python_callable_with_fallback
+
+
+def add_provider_uri_load_balancing(python_callable, provider_uris):
+    """Passes all the provider uris to the command, which spreads the requests across them"""
+
+    def python_callable_with_load_balancing(**kwargs):
+        kwargs['provider_uri'] = ','.join(provider_uris)
+        python_callable(**kwargs)
+
+    return python_callable_with_load_balancing
@@ -44,8 +44,8 @@ def build_load_dag(
     output_bucket,
     checkpoint_bucket,
     destination_dataset_project_id,
-    load_start_block,
-    load_end_block,
+    load_start_block=None,
+    load_end_block=None,
     chain='solana',
     notification_emails=None,
     load_schedule_interval='0 0 * * *',
@@ -102,13 +102,19 @@ def build_load_dag(
     from airflow.providers.google.cloud.hooks.gcs import GCSHook
     gcs_hook = GCSHook()
 
+    # Without a fixed block range, the exports are partitioned by block date
+    if load_start_block is None:
+        export_partition = 'block_date={{ ds }}'
+    else:
+        export_partition = f'start_block={load_start_block}/end_block={load_end_block}'
+
     def add_load_tasks(task, file_format, allow_quoted_newlines=False):
         wait_sensor = GCSObjectExistenceSensor(
             task_id=f'wait_latest_{task}',
             timeout=12 * 60 * 60,
             poke_interval=60,
             bucket=output_bucket,
-            object=f'export/{task}/start_block={load_start_block}/end_block={load_end_block}/{task}.{file_format}',
+            object=f'export/{task}/{export_partition}/{task}.{file_format}',
             dag=dag
         )
 
@@ -240,10 +246,11 @@ def build_load_dag(
         return enrich_operator
 
     def add_save_checkpoint_tasks(dependencies=None):
-        def save_checkpoint(**kwargs):
+        def save_checkpoint(ds, **kwargs):
             with TemporaryDirectory() as tempdir:
                 local_path = os.path.join(tempdir, "checkpoint.txt")
-                remote_path = f'load/checkpoint/start_block={load_start_block}/end_block={load_end_block}/checkpoint.txt'
+                checkpoint_partition = export_partition.replace('{{ ds }}', ds)
+                remote_path = f'load/checkpoint/{checkpoint_partition}/checkpoint.txt'
                 open(local_path, mode='a').close()
                 upload_to_gcs(
                     gcs_hook=gcs_hook,
@@ -23,13 +23,17 @@ from airflow.models import Variable
 
 def read_export_dag_vars(var_prefix, **kwargs):
     """Read Airflow variables for Export DAG"""
-    export_start_block = int(read_var(
-        'export_start_block', var_prefix, True, **kwargs))
+    # Without a start block, each run exports the slots of its execution date
+    export_start_block = read_var(
+        'export_start_block', var_prefix, False, **kwargs)
+    export_start_block = int(
+        export_start_block) if export_start_block is not None else None
 
     export_end_block = read_var(
         'export_end_block', var_prefix, False, **kwargs)
     export_end_block = int(
-        export_end_block) if export_end_block is not None else export_start_block+1
+        export_end_block) if export_end_block is not None else \
+        (export_start_block+1 if export_start_block is not None else None)
 
     provider_uris = read_var('provider_uris', var_prefix, True, **kwargs)
     provider_uris = [uri.strip() for uri in provider_uris.split(',')]
@@ -39,6 +43,12 @@ def read_export_dag_vars(var_prefix, **kwargs):
     export_max_active_runs = int(
         export_max_active_runs) if export_max_active_runs is not None else None
 
+    # Tunes the workers between it and export_max_workers
+    export_min_workers = read_var('export_min_workers', var_prefix, False, **kwargs)
+
+    export_rate_limit = read_var('export_rate_limit', var_prefix, False, **kwargs)
+    export_rate_limit_bytes = read_var('export_rate_limit_bytes', var_prefix, False, **kwargs)
+
     vars = {
         'output_bucket': read_var('output_bucket', var_prefix, True, **kwargs),
         'export_start_block': export_start_block,
@@ -48,6 +58,11 @@ def read_export_dag_vars(var_prefix, **kwargs):
         'notification_emails': read_var('notification_emails', None, False, **kwargs),
         'export_max_active_runs': export_max_active_runs,
         'export_max_workers': int(read_var('export_max_workers', var_prefix, True, **kwargs)),
+        'export_min_workers': int(export_min_workers) if export_min_workers is not None else None,
+        'export_load_balance_provider_uris': parse_bool(
+            read_var('export_load_balance_provider_uris', var_prefix, False, **kwargs), default=False),
+        'export_rate_limit': float(export_rate_limit) if export_rate_limit is not None else None,
+        'export_rate_limit_bytes': float(export_rate_limit_bytes) if export_rate_limit_bytes is not None else None,
     }
 
     return vars
@@ -55,13 +70,16 @@ def read_export_dag_vars(var_prefix, **kwargs):
 
 def read_load_dag_vars(var_prefix, **kwargs):
     """Read Airflow variables for Load DAG"""
-    load_start_block = int(read_var(
-        'export_start_block', var_prefix, True, **kwargs))
+    load_start_block = read_var(
+        'export_start_block', var_prefix, False, **kwargs)
+    load_start_block = int(
+        load_start_block) if load_start_block is not None else None
 
     load_end_block = read_var(
         'export_end_block', var_prefix, False, **kwargs)
     load_end_block = int(
-        load_end_block) if load_end_block is not None else load_start_block+1
+        load_end_block) if load_end_block is not None else \
+        (load_start_block+1 if load_start_block is not None else None)
 
     output_bucket = read_var('output_bucket', var_prefix, True, **kwargs)
     checkpoint_bucket = read_var(
@@ -0,0 +1,119 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Per block CPU time of the JSON heavy stages of a block export with each installed codec.
+#
+#   python benchmarks/json_codec_benchmark.py --blocks 20 --transactions-per-block 40
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from blockchainetl_common.jobs.exporters.in_memory_item_exporter import InMemoryItemExporter  # noqa: E402
+from solanaetl import json_codec  # noqa: E402
+from solanaetl.jobs.export_blocks_job import ExportBlocksJob  # noqa: E402
+from solanaetl.mappers.instruction_mapper import InstructionMapper  # noqa: E402
+from solanaetl.mappers.transaction_mapper import TransactionMapper  # noqa: E402
+from solanaetl.providers.batch import BatchProvider  # noqa: E402
+from solanaetl.providers.json_stream import decode_json_chunks  # noqa: E402
+from transport_benchmark import build_batch_response  # noqa: E402
+
+CHUNK_SIZE = 64 * 1024
+
+
+def get_codecs():
+    codecs = {'json': (json.loads, lambda obj: json.dumps(obj, separators=(',', ':'), ensure_ascii=False))}
+    if json_codec.ujson is not None:
+        codecs['ujson'] = (json_codec._loads_ujson, lambda obj: json_codec.ujson.dumps(
+            obj, ensure_ascii=False, escape_forward_slashes=False))
+    if json_codec.orjson is not None:
+        codecs['orjson'] = (json_codec._loads_orjson, lambda obj: json_codec.orjson.dumps(obj).decode('utf-8'))
+    return codecs
+
+
+def measure(function, repeat):
+    start_time = time.process_time()
+    for _ in range(repeat):
+        result = function()
+    return (time.process_time() - start_time) / repeat, result
+
+
+def run_stages(body, block_count, repeat):
+    job = ExportBlocksJob(
+        start_block=0, end_block=block_count - 1, batch_size=block_count, batch_web3_provider=BatchProvider(),
+        max_workers=1, item_exporter=InMemoryItemExporter(['block', 'transaction', 'instruction']))
+    chunks = [body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE)]
+    instruction_mapper = InstructionMapper()
+    transaction_mapper = TransactionMapper()
+
+    timings = {}
+    timings['encode request'], _ = measure(lambda: job._get_blocks_request(list(range(block_count))), repeat)
+    timings['decode response'], response = measure(
+        lambda: decode_json_chunks(chunks, loads=json_codec.loads), repeat)
+    # The exported JSON fields always use the standard library, see json_codec.dumps
+    timings['map and serialize items'], _ = measure(
+        lambda: (job.item_exporter.open(), job._export_blocks_response(response)), repeat)
+
+    transactions = job.item_exporter.get_items('transaction')
+    instructions = job.item_exporter.get_items('instruction')
+    timings['read back items'], _ = measure(lambda: (
+        [transaction_mapper.from_dict(transaction) for transaction in transactions],
+        [instruction_mapper.from_dict(instruction) for instruction in instructions]), repeat)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--blocks', type=int, default=20)
+    parser.add_argument('--transactions-per-block', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    body = build_batch_response(args.blocks, args.transactions_per_block)
+    print('{} blocks, {} transactions per block, {:.1f} MB response'.format(
+        args.blocks, args.transactions_per_block, len(body) / 1e6))
+
+    results = {}
+    for name, (loads, dumps_compact) in get_codecs().items():
+        # The modules look the codec functions up on every call
+        json_codec.loads, json_codec.dumps_compact = loads, dumps_compact
+        results[name] = run_stages(body, args.blocks, args.repeat)
+
+    stages = list(results['json'])
+    print('{:<26}'.format('ms per block') + ''.join('{:>10}'.format(name) for name in results))
+    for stage in stages + ['total']:
+        row = '{:<26}'.format(stage)
+        for name, timings in results.items():
+            seconds = sum(timings.values()) if stage == 'total' else timings[stage]
+            row += '{:>10.2f}'.format(seconds * 1000 / args.blocks)
+        print(row)
+
+    stdlib_total = sum(results['json'].values())
+    for name, timings in results.items():
+        if name != 'json':
+            print('{}: {:.2f} ms CPU saved per block'.format(
+                name, (stdlib_total - sum(timings.values())) * 1000 / args.blocks))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Compares the buffered and the streaming transport for a getBlock batch.
+# A local server returns a batch of synthetic blocks built from the test fixtures, encoded with
+# whatever the client negotiates. Every client runs in its own process to measure its peak RSS.
+#
+#   python benchmarks/transport_benchmark.py --blocks 100 --transactions-per-block 40
+
+import argparse
+import gzip
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from requests.utils import DEFAULT_ACCEPT_ENCODING
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+RESOURCES_DIR = os.path.join(os.path.dirname(__file__), '..', 'tests', 'resources')
+BLOCK_FIXTURE = os.path.join(
+    RESOURCES_DIR, 'test_export_blocks_job', 'blocks_only',
+    'web3_response.getBlock_14330e103da08458fdda89c32fc83905.json')
+TRANSACTION_FIXTURE = os.path.join(
+    RESOURCES_DIR, 'test_export_instructions_job', 'instructions_only',
+    'web3_response.getTransaction_a94e19dfa57bcb58b28242a684b889a7.json')
+
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+
+def build_batch_response(block_count, transactions_per_block):
+    with open(BLOCK_FIXTURE) as block_file, open(TRANSACTION_FIXTURE) as transaction_file:
+        block = json.load(block_file)[0]['result']
+        transaction = json.load(transaction_file)[0]['result']
+
+    response = []
+    for block_index in range(block_count):
+        transactions = []
+        for transaction_index in range(transactions_per_block):
+            # Unique accounts and signatures in every transaction, so the payload doesn't compress
+            # unrealistically well. Program ids and instruction data are kept, the decoders need them.
+            transaction_copy = randomize_addresses(transaction, {})
+            transactions.append({
+                'meta': transaction_copy['meta'],
+                'transaction': transaction_copy['transaction'],
+            })
+        result = dict(block, parentSlot=block['parentSlot'] + block_index, transactions=transactions)
+        response.append({'jsonrpc': '2.0', 'result': result, 'id': block_index})
+    return json.dumps(response).encode('utf-8')
+
+
+def randomize_addresses(value, addresses, key=None):
+    if isinstance(value, dict):
+        return {k: randomize_addresses(v, addresses, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [randomize_addresses(v, addresses, key) for v in value]
+    if isinstance(value, str) and len(value) >= 32 and value.isalnum() and key not in ('programId', 'data'):
+        if value not in addresses:
+            addresses[value] = ''.join(random.choice(BASE58_ALPHABET) for _ in range(len(value)))
+        return addresses[value]
+    return value
+
+
+def encode_body(body):
+    encoded = {'identity': body, 'gzip': gzip.compress(body, compresslevel=6)}
+    try:
+        import brotli
+        encoded['br'] = brotli.compress(body, quality=5)
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        encoded['zstd'] = zstandard.ZstdCompressor(level=3).compress(body)
+    except ImportError:
+        pass
+    return encoded
+
+
+def start_server(encoded_bodies):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers['Content-Length']))
+            accepted = [encoding.strip() for encoding in self.headers.get('Accept-Encoding', '').split(',')]
+            # Prefer the best compression the client accepts
+            encoding = next((encoding for encoding in ['zstd', 'br', 'gzip']
+                             if encoding in accepted and encoding in encoded_bodies), 'identity')
+            body = encoded_bodies[encoding]
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            if encoding != 'identity':
+                self.send_header('Content-Encoding', encoding)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def read_memory_status(name):
+    """Returns the value in kB, VmHWM is the peak RSS"""
+    with open('/proc/self/status') as status_file:
+        for line in status_file:
+            if line.startswith(name + ':'):
+                return int(line.split()[1])
+    raise ValueError('{} not found'.format(name))
+
+
+def run_client(endpoint_uri, mode, accept_encoding):
+    from solanaetl.json_rpc_requests import generate_get_block_by_number_json_rpc
+    from solanaetl.providers.request import make_post_request, make_streaming_post_request
+
+    request_data = json.dumps(list(generate_get_block_by_number_json_rpc(
+        range(100), include_transactions=True))).encode('utf-8')
+    headers = {'Content-Type': 'application/json', 'Accept-Encoding': accept_encoding}
+
+    rss_before = read_memory_status('VmRSS')
+    start_time = time.time()
+    if mode == 'buffered':
+        # What the provider used to do: buffer the body, then decode it as text
+        raw_response = make_post_request(endpoint_uri, request_data, headers=headers)
+        response = json.loads(raw_response.decode('utf-8'))
+    else:
+        response = make_streaming_post_request(endpoint_uri, request_data, headers=headers)
+    duration = time.time() - start_time
+    peak_rss = read_memory_status('VmHWM')
+
+    print(json.dumps({
+        'items': len(response),
+        'peak_rss_increase_mb': (peak_rss - rss_before) / 1024,
+        'seconds': duration,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--blocks', type=int, default=100)
+    parser.add_argument('--transactions-per-block', type=int, default=40)
+    parser.add_argument('--client', nargs=3, metavar=('ENDPOINT_URI', 'MODE', 'ACCEPT_ENCODING'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.client is not None:
+        run_client(*args.client)
+        return
+
+    body = build_batch_response(args.blocks, args.transactions_per_block)
+    encoded_bodies = encode_body(body)
+    server = start_server(encoded_bodies)
+    endpoint_uri = 'http://127.0.0.1:{}'.format(server.server_port)
+
+    print('{} blocks, {:.1f} MB decoded body'.format(args.blocks, len(body) / 1e6))
+    print('{:<10} {:<10} {:>14} {:>18} {:>10}'.format('mode', 'encoding', 'wire MB', 'peak RSS +MB', 'seconds'))
+    # The encodings the client can decode, e.g. br needs brotli
+    supported_encodings = [encoding for encoding in encoded_bodies
+                           if encoding == 'identity' or encoding in DEFAULT_ACCEPT_ENCODING]
+    for mode, encodings in [('buffered', ['identity', 'gzip']), ('streaming', supported_encodings)]:
+        for encoding in encodings:
+            output = subprocess.run(
+                [sys.executable, __file__, '--client', endpoint_uri, mode, encoding],
+                check=True, capture_output=True, text=True).stdout
+            result = json.loads(output)
+            assert result['items'] == args.blocks
+            wire_bytes = len(encoded_bodies[encoding])
+            print('{:<10} {:<10} {:>14.1f} {:>18.1f} {:>10.2f}'.format(
+                mode, encoding, wire_bytes / 1e6, result['peak_rss_increase_mb'], result['seconds']))
+
+
+if __name__ == '__main__':
+    main()
@@ -42,8 +42,17 @@ setup(
         "solana==0.25.0",
         "rlp==3.0.0",
         "requests",
+        "httpx",
     ],
     extras_require={
+        # multiplexes the requests in flight of the async provider over a few connections
+        "http2": ["httpx[http2]"],
+        # br and zstd content encodings, zstd needs a urllib3 version which decodes it
+        "compression": ["brotli", "zstandard"],
+        # faster decoding of the RPC responses, ujson is used too when installed
+        "json": ["orjson"],
+        # new slot notifications and the Pub/Sub output of the stream command
+        "streaming": ["websockets", "google-cloud-pubsub", "timeout-decorator"],
     },
     entry_points={
         "console_scripts": [
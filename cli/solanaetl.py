@@ -17,4 +17,6 @@
 
 from solanaetl.cli import cli
 
-cli()
\ No newline at end of file
+# The processes of --parse-processes are spawned and import the main module again
+if __name__ == '__main__':
+    cli()
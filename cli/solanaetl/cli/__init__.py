@@ -23,19 +23,45 @@ from solanaetl.cli.extract_accounts import extract_accounts
 from solanaetl.cli.extract_field import extract_field
 from solanaetl.cli.extract_token_transfers import extract_token_transfers
 from solanaetl.cli.extract_tokens import extract_tokens
+from solanaetl.cli.fake_rpc_server import fake_rpc_server
+from solanaetl.cli.get_block_range_for_date import get_block_range_for_date
+from solanaetl.cli.profile import profile
+from solanaetl.cli.stream import stream
+from solanaetl.cli.worker import worker
+from solanaetl.metrics import start_metrics_dumps, start_metrics_server
+from solanaetl.tracing import start_tracing
 
 
 @click.group()
 @click.version_option(version="0.0.1")
+@click.option('--metrics-address', default=None, type=str, envvar='SOLANAETL_METRICS_ADDRESS',
+              help='Serve the metrics in the Prometheus text format at /metrics on this port or host:port. '
+                   'The host defaults to 127.0.0.1.')
+@click.option('--metrics-file', default=None, type=str, envvar='SOLANAETL_METRICS_FILE',
+              help='A file the metrics are written to as JSON periodically and on exit.')
+@click.option('--metrics-interval', default=60, show_default=True, type=float, envvar='SOLANAETL_METRICS_INTERVAL',
+              help='The number of seconds between the writes of --metrics-file.')
+@click.option('--trace-file', default=None, type=str, envvar='SOLANAETL_TRACE_FILE',
+              help='A file the spans of the batches are written to in the Chrome trace event format, '
+                   'e.g. to load in https://ui.perfetto.dev.')
 @click.pass_context
-def cli(ctx):
-    pass
+def cli(ctx, metrics_address, metrics_file, metrics_interval, trace_file):
+    if metrics_address is not None:
+        start_metrics_server(metrics_address)
+    if metrics_file is not None:
+        start_metrics_dumps(metrics_file, metrics_interval)
+    if trace_file is not None:
+        start_tracing(trace_file)
 
 
 # export
 cli.add_command(export_all, "export_all")
 cli.add_command(export_blocks_and_transactions, "export_blocks_and_transactions")
 cli.add_command(export_instructions, "export_instructions")
+cli.add_command(worker, "worker")
+
+# streaming
+cli.add_command(stream, "stream")
 
 # extract
 cli.add_command(extract_token_transfers, "extract_token_transfers")
@@ -44,3 +70,6 @@ cli.add_command(extract_tokens, "extract_tokens")
 
 # utils
 cli.add_command(extract_field, "extract_field")
+cli.add_command(get_block_range_for_date, "get_block_range_for_date")
+cli.add_command(fake_rpc_server, "fake_rpc_server")
+cli.add_command(profile, "profile")
@@ -15,9 +15,18 @@
 # THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
 # TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
+from datetime import datetime, timedelta
+
 import click
 from blockchainetl_common.logging_utils import logging_basic_config
 from solanaetl.jobs.export_all_common import export_all_common
+from solanaetl.providers.auto import get_batch_provider_from_uri
+from solanaetl.providers.cache import build_response_cache
+from solanaetl.providers.rate_limit import build_rate_limiter
+from solanaetl.services.account_fetcher import DEFAULT_GET_MULTIPLE_ACCOUNTS_BATCH_SIZE
+from solanaetl.services.export_journal import exit_on_sigterm
+from solanaetl.services.slot_time_index import SlotTimeIndex
+from solanaetl.services.sol_service import SolService
 
 logging_basic_config()
 
@@ -28,11 +37,45 @@ def is_block_range(start, end):
             end.isdigit() and 0 <= int(end) <= 9999999999999999)
 
 
-def get_partitions(start, end, partition_batch_size):
+def is_date_range(start, end):
+    """Checks for YYYY-MM-DD date format."""
+    try:
+        return (datetime.strptime(start, '%Y-%m-%d') and
+                datetime.strptime(end, '%Y-%m-%d'))
+    except ValueError:
+        return False
+
+
+def is_unix_time_range(start, end):
+    """Checks for Unix timestamp format."""
+    return (start.isdigit() and len(start) == 10 and
+            end.isdigit() and len(end) == 10)
+
+
+def get_partitions(start, end, partition_batch_size, provider_uri=None, slot_time_index_file=None):
     """Yield partitions based on input data type."""
-    if is_block_range(start, end):
-        start_block = int(start)
-        end_block = int(end)
+    if is_date_range(start, end) or is_unix_time_range(start, end):
+        sol_service = SolService(get_batch_provider_from_uri(provider_uri), SlotTimeIndex(slot_time_index_file))
+
+    if is_date_range(start, end):
+        start_date = datetime.strptime(start, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end, '%Y-%m-%d').date()
+
+        day = timedelta(days=1)
+
+        while start_date <= end_date:
+            batch_start_block, batch_end_block = sol_service.get_block_range_for_date(start_date)
+            partition_dir = '/date={start_date}'.format(start_date=start_date)
+            yield batch_start_block, batch_end_block, partition_dir
+            start_date += day
+
+    elif is_unix_time_range(start, end) or is_block_range(start, end):
+        if is_unix_time_range(start, end):
+            # Unix times have 10 digits, block numbers of that size are years away
+            start_block, end_block = sol_service.get_block_range_for_timestamps(int(start), int(end))
+        else:
+            start_block = int(start)
+            end_block = int(end)
 
         for batch_start_block in range(start_block, end_block + 1, partition_batch_size):
             batch_end_block = batch_start_block + partition_batch_size - 1
@@ -49,7 +92,7 @@ def get_partitions(start, end, partition_batch_size):
 
     else:
         raise ValueError(
-            'start and end must be either block numbers')
+            'start and end must be either block numbers, ISO dates or Unix times')
 
 
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
@@ -59,11 +102,67 @@ def get_partitions(start, end, partition_batch_size):
               help='The number of blocks to export in partition.')
 @click.option('-p', '--provider-uri', default='https://api.mainnet-beta.solana.com', show_default=True, type=str,
               help='The URI of the web3 provider e.g. '
-                   'https://api.mainnet-beta.solana.com')
+                   'https://api.mainnet-beta.solana.com. '
+                   'Requests are load balanced across several comma separated URIs.')
 @click.option('-o', '--output-dir', default='output', show_default=True, type=str, help='Output directory, partitioned in Hive style.')
 @click.option('-w', '--max-workers', default=1, show_default=True, type=int, help='The maximum number of workers.')
 @click.option('-B', '--export-batch-size', default=100, show_default=True, type=int, help='The number of requests in JSON RPC batches.')
-def export_all(start, end, partition_batch_size, provider_uri, output_dir, max_workers, export_batch_size):
+@click.option('--accounts-batch-size', default=DEFAULT_GET_MULTIPLE_ACCOUNTS_BATCH_SIZE, show_default=True, type=int,
+              help='The number of getMultipleAccounts requests, of up to 100 accounts each, in the JSON RPC batches '
+                   'of the accounts and tokens.')
+@click.option('--async', 'use_async', is_flag=True, default=False,
+              help='Use the asyncio provider, keeping up to --max-workers batches in flight on a single thread. '
+                   'Can also be selected with the async+ uri scheme e.g. async+https://api.mainnet-beta.solana.com')
+@click.option('--rate-limit', default=None, type=float, envvar='SOLANAETL_RATE_LIMIT',
+              help='The maximum number of requests per second to each provider endpoint.')
+@click.option('--rate-limit-bytes', default=None, type=float, envvar='SOLANAETL_RATE_LIMIT_BYTES',
+              help='The maximum number of request and response payload bytes per second to each provider endpoint.')
+@click.option('--rate-limit-file', default=None, type=str, envvar='SOLANAETL_RATE_LIMIT_FILE',
+              help='A file holding the rate limit state, shared by the commands running concurrently on the machine.')
+@click.option('--rpc-cache-dir', default=None, type=str, envvar='SOLANAETL_RPC_CACHE_DIR',
+              help='A directory caching the RPC responses for finalized slots, re-runs are served from it.')
+@click.option('--rpc-cache-size', default=10240, show_default=True, type=int, envvar='SOLANAETL_RPC_CACHE_SIZE',
+              help='The maximum size of the RPC cache in MB, the least recently used responses are evicted.')
+@click.option('--skipped-slots-dir', default=None, type=str, envvar='SOLANAETL_SKIPPED_SLOTS_DIR',
+              help='A directory keeping the skipped slots found by scanning the ranges with getBlocks, '
+                   'so that re-runs and gap fills never request them.')
+@click.option('--slot-time-index-file', default=None, type=str, envvar='SOLANAETL_SLOT_TIME_INDEX_FILE',
+              help='A file indexing the block times of slots, so that dates and Unix times already looked up '
+                   'cost no RPC requests.')
+@click.option('--parse-processes', default=None, type=int, envvar='SOLANAETL_PARSE_PROCESSES',
+              help='Map and parse the blocks in this many processes, 0 for one per core, while threads fetch them '
+                   'and a single thread writes the output. Not supported with --async.')
+@click.option('--min-workers', default=None, type=int, envvar='SOLANAETL_MIN_WORKERS',
+              help='Tune the number of workers between this and --max-workers from the measured throughput and '
+                   'latency. The chosen number is logged at the end, to be pinned with --max-workers.')
+@click.option('--dead-letter-file', default=None, type=str, envvar='SOLANAETL_DEAD_LETTER_FILE',
+              help='A file the blocks failing after all retries are appended to as JSON lines, '
+                   'instead of failing the export.')
+@click.option('--ordered', is_flag=True, default=False,
+              help='Write the items of each partition in slot, transaction and instruction order, '
+                   'and the extracted items in the order of the instructions and accounts they come from.')
+@click.option('--fused', is_flag=True, default=False,
+              help='Extract the token transfers and created accounts while the blocks are mapped, and request the '
+                   'accounts and tokens meanwhile, instead of reading back the instructions and accounts files.')
+@click.option('--partition-workers', default=1, show_default=True, type=int, envvar='SOLANAETL_PARTITION_WORKERS',
+              help='The number of partitions exported at once. The accounts and tokens of a partition are extracted '
+                   'while the blocks of the next ones are exported, sharing --max-workers requests in flight.')
+@click.option('--journal-dir', default=None, type=str, envvar='SOLANAETL_JOURNAL_DIR',
+              help='A directory recording the exported partitions and the progress of the partition being exported. '
+                   'A restarted export skips the exported partitions and resumes the blocks of the current one.')
+def export_all(start, end, partition_batch_size, provider_uri, output_dir, max_workers, export_batch_size,
+               use_async=False, rate_limit=None, rate_limit_bytes=None, rate_limit_file=None,
+               rpc_cache_dir=None, rpc_cache_size=10240, skipped_slots_dir=None, slot_time_index_file=None,
+               parse_processes=None, min_workers=None, dead_letter_file=None, ordered=False, fused=False,
+               partition_workers=1, journal_dir=None, accounts_batch_size=DEFAULT_GET_MULTIPLE_ACCOUNTS_BATCH_SIZE):
     """Exports all data for a range of blocks."""
-    export_all_common(get_partitions(start, end, partition_batch_size),
-                      output_dir, provider_uri, max_workers, export_batch_size)
+    if journal_dir is not None:
+        exit_on_sigterm()
+    export_all_common(get_partitions(start, end, partition_batch_size, provider_uri, slot_time_index_file),
+                      output_dir, provider_uri, max_workers, export_batch_size, use_async=use_async,
+                      rate_limiter=build_rate_limiter(rate_limit, rate_limit_bytes, rate_limit_file),
+                      response_cache=build_response_cache(rpc_cache_dir, rpc_cache_size),
+                      skipped_slots_dir=skipped_slots_dir, parse_processes=parse_processes,
+                      min_workers=min_workers, dead_letter_file=dead_letter_file, ordered=ordered,
+                      journal_dir=journal_dir, fused=fused, partition_workers=partition_workers,
+                      accounts_batch_size=accounts_batch_size)
@@ -20,8 +20,11 @@ from blockchainetl_common.logging_utils import logging_basic_config
 from solanaetl.jobs.export_blocks_job import ExportBlocksJob
 from solanaetl.jobs.exporters.blocks_and_transactions_item_exporter import \
     blocks_and_transactions_item_exporter
-from solanaetl.providers.auto import get_provider_from_uri
-from solanaetl.thread_local_proxy import ThreadLocalProxy
+from solanaetl.providers.auto import get_batch_provider_from_uri
+from solanaetl.providers.cache import build_response_cache
+from solanaetl.providers.rate_limit import build_rate_limiter
+from solanaetl.services.export_journal import exit_on_sigterm
+from solanaetl.services.skipped_slot_registry import SkippedSlotRegistry
 
 logging_basic_config()
 
@@ -32,7 +35,8 @@ logging_basic_config()
 @click.option('-b', '--batch-size', default=1, show_default=True, type=int, help='The number of blocks to export at a time.')
 @click.option('-p', '--provider-uri', default='https://api.mainnet-beta.solana.com', show_default=True, type=str,
               help='The URI of the web3 provider e.g. '
-                   'https://api.mainnet-beta.solana.com')
+                   'https://api.mainnet-beta.solana.com. '
+                   'Requests are load balanced across several comma separated URIs.')
 @click.option('-w', '--max-workers', default=5, show_default=True, type=int, help='The maximum number of workers.')
 @click.option('--blocks-output', default=None, show_default=True, type=str,
               help='The output file for blocks. If not provided blocks will not be exported. Use "-" for stdout')
@@ -42,8 +46,43 @@ logging_basic_config()
 @click.option('--instructions-output', default=None, show_default=True, type=str,
               help='The output file for instructions. '
                    'If not provided instructions will not be exported. Use "-" for stdout.')
+@click.option('--async', 'use_async', is_flag=True, default=False,
+              help='Use the asyncio provider, keeping up to --max-workers batches in flight on a single thread. '
+                   'Can also be selected with the async+ uri scheme e.g. async+https://api.mainnet-beta.solana.com')
+@click.option('--rate-limit', default=None, type=float, envvar='SOLANAETL_RATE_LIMIT',
+              help='The maximum number of requests per second to each provider endpoint.')
+@click.option('--rate-limit-bytes', default=None, type=float, envvar='SOLANAETL_RATE_LIMIT_BYTES',
+              help='The maximum number of request and response payload bytes per second to each provider endpoint.')
+@click.option('--rate-limit-file', default=None, type=str, envvar='SOLANAETL_RATE_LIMIT_FILE',
+              help='A file holding the rate limit state, shared by the commands running concurrently on the machine.')
+@click.option('--rpc-cache-dir', default=None, type=str, envvar='SOLANAETL_RPC_CACHE_DIR',
+              help='A directory caching the RPC responses for finalized slots, re-runs are served from it.')
+@click.option('--rpc-cache-size', default=10240, show_default=True, type=int, envvar='SOLANAETL_RPC_CACHE_SIZE',
+              help='The maximum size of the RPC cache in MB, the least recently used responses are evicted.')
+@click.option('--skipped-slots-dir', default=None, type=str, envvar='SOLANAETL_SKIPPED_SLOTS_DIR',
+              help='A directory keeping the skipped slots found by scanning the ranges with getBlocks, '
+                   'so that re-runs and gap fills never request them.')
+@click.option('--parse-processes', default=None, type=int, envvar='SOLANAETL_PARSE_PROCESSES',
+              help='Map and parse the blocks in this many processes, 0 for one per core, while threads fetch them '
+                   'and a single thread writes the output. Not supported with --async.')
+@click.option('--min-workers', default=None, type=int, envvar='SOLANAETL_MIN_WORKERS',
+              help='Tune the number of workers between this and --max-workers from the measured throughput and '
+                   'latency. The chosen number is logged at the end, to be pinned with --max-workers.')
+@click.option('--dead-letter-file', default=None, type=str, envvar='SOLANAETL_DEAD_LETTER_FILE',
+              help='A file the blocks failing after all retries are appended to as JSON lines, '
+                   'instead of failing the export.')
+@click.option('--ordered', is_flag=True, default=False,
+              help='Write the items in slot, transaction and instruction order. The blocks completing ahead of a slow '
+                   'one are held in a memory bounded buffer which spills to disk.')
+@click.option('--journal-file', default=None, type=str, envvar='SOLANAETL_JOURNAL_FILE',
+              help='A file recording the exported slots and the sizes of the output files. A restarted export '
+                   'resumes from it, appending to the output files. Saved periodically and on SIGTERM.')
 def export_blocks_and_transactions(start_block, end_block, batch_size, provider_uri, max_workers, blocks_output,
-                                   transactions_output, instructions_output):
+                                   transactions_output, instructions_output, use_async=False,
+                                   rate_limit=None, rate_limit_bytes=None, rate_limit_file=None,
+                                   rpc_cache_dir=None, rpc_cache_size=10240, skipped_slots_dir=None,
+                                   parse_processes=None, min_workers=None, dead_letter_file=None,
+                                   ordered=False, journal_file=None):
     """Exports blocks and transactions."""
     if blocks_output is None and transactions_output is None:
         raise ValueError(
@@ -52,17 +91,28 @@ def export_blocks_and_transactions(start_block, end_block, batch_size, provider_
     if transactions_output is None and instructions_output is not None:
         raise ValueError('--transactions-output options must be provided')
 
+    if journal_file is not None:
+        exit_on_sigterm()
+
     job = ExportBlocksJob(
         start_block=start_block,
         end_block=end_block,
         batch_size=batch_size,
-        batch_web3_provider=ThreadLocalProxy(
-            lambda: get_provider_from_uri(provider_uri, batch=True)),
+        batch_web3_provider=get_batch_provider_from_uri(
+            provider_uri, use_async=use_async,
+            rate_limiter=build_rate_limiter(rate_limit, rate_limit_bytes, rate_limit_file),
+            response_cache=build_response_cache(rpc_cache_dir, rpc_cache_size)),
         max_workers=max_workers,
         item_exporter=blocks_and_transactions_item_exporter(
             blocks_output, transactions_output, instructions_output),
         export_blocks=blocks_output is not None,
         export_transactions=transactions_output is not None,
-        export_instructions=instructions_output is not None)
+        export_instructions=instructions_output is not None,
+        skipped_slot_registry=SkippedSlotRegistry(skipped_slots_dir),
+        max_processes=parse_processes,
+        min_workers=min_workers,
+        dead_letter_file=dead_letter_file,
+        ordered=ordered,
+        journal_file=journal_file)
 
     job.run()
@@ -21,8 +21,9 @@ from blockchainetl_common.logging_utils import logging_basic_config
 from solanaetl.jobs.export_instructions_job import ExportInstructionsJob
 from solanaetl.jobs.exporters.instructions_item_exporter import \
     instructions_item_exporter
-from solanaetl.providers.auto import get_provider_from_uri
-from solanaetl.thread_local_proxy import ThreadLocalProxy
+from solanaetl.providers.auto import get_batch_provider_from_uri
+from solanaetl.providers.cache import build_response_cache
+from solanaetl.providers.rate_limit import build_rate_limiter
 
 logging_basic_config()
 
@@ -34,14 +35,32 @@ logging_basic_config()
 @click.option('-w', '--max-workers', default=1, show_default=True, type=int, help='The maximum number of workers.')
 @click.option('-p', '--provider-uri', default='https://api.mainnet-beta.solana.com', show_default=True, type=str,
               help='The URI of the web3 provider e.g. '
-                   'https://api.mainnet-beta.solana.com')
-def export_instructions(transaction_addresses, output, max_workers, provider_uri):
+                   'https://api.mainnet-beta.solana.com. '
+                   'Requests are load balanced across several comma separated URIs.')
+@click.option('--async', 'use_async', is_flag=True, default=False,
+              help='Use the asyncio provider, keeping up to --max-workers batches in flight on a single thread. '
+                   'Can also be selected with the async+ uri scheme e.g. async+https://api.mainnet-beta.solana.com')
+@click.option('--rate-limit', default=None, type=float, envvar='SOLANAETL_RATE_LIMIT',
+              help='The maximum number of requests per second to each provider endpoint.')
+@click.option('--rate-limit-bytes', default=None, type=float, envvar='SOLANAETL_RATE_LIMIT_BYTES',
+              help='The maximum number of request and response payload bytes per second to each provider endpoint.')
+@click.option('--rate-limit-file', default=None, type=str, envvar='SOLANAETL_RATE_LIMIT_FILE',
+              help='A file holding the rate limit state, shared by the commands running concurrently on the machine.')
+@click.option('--rpc-cache-dir', default=None, type=str, envvar='SOLANAETL_RPC_CACHE_DIR',
+              help='A directory caching the RPC responses for finalized slots, re-runs are served from it.')
+@click.option('--rpc-cache-size', default=10240, show_default=True, type=int, envvar='SOLANAETL_RPC_CACHE_SIZE',
+              help='The maximum size of the RPC cache in MB, the least recently used responses are evicted.')
+def export_instructions(transaction_addresses, output, max_workers, provider_uri, use_async=False,
+                        rate_limit=None, rate_limit_bytes=None, rate_limit_file=None,
+                        rpc_cache_dir=None, rpc_cache_size=10240):
     """Exports instructions in transactions."""
 
     with smart_open(transaction_addresses, 'r') as transaction_addresses_file:
         job = ExportInstructionsJob(
-            batch_web3_provider=ThreadLocalProxy(
-                lambda: get_provider_from_uri(provider_uri, batch=True)),
+            batch_web3_provider=get_batch_provider_from_uri(
+                provider_uri, use_async=use_async,
+                rate_limiter=build_rate_limiter(rate_limit, rate_limit_bytes, rate_limit_file),
+                response_cache=build_response_cache(rpc_cache_dir, rpc_cache_size)),
             item_exporter=instructions_item_exporter(output),
             max_workers=max_workers,
             transaction_addresses_iterable=(transaction_address.strip(
@@ -30,13 +30,16 @@ from solanaetl.utils import get_item_iterable
 @click.option('-b', '--batch-size', default=100, show_default=True, type=int, help='The number of blocks to filter at a time.')
 @click.option('-o', '--output', default='-', show_default=True, type=str, help='The output file. If not specified stdout is used.')
 @click.option('-w', '--max-workers', default=1, show_default=True, type=int, help='The maximum number of workers.')
-def extract_token_transfers(instructions, batch_size, output, max_workers):
+@click.option('--ordered', is_flag=True, default=False,
+              help='Write the token transfers in the order of the instructions they are extracted from.')
+def extract_token_transfers(instructions, batch_size, output, max_workers, ordered=False):
     """Extracts Token transfers from instructions file."""
     with get_item_iterable(instructions) as instructions_reader:
         job = ExtractTokenTransfersJob(
             instructions_iterable=instructions_reader,
             batch_size=batch_size,
             max_workers=max_workers,
-            item_exporter=token_transfers_item_exporter(output))
+            item_exporter=token_transfers_item_exporter(output),
+            ordered=ordered)
 
         job.run()
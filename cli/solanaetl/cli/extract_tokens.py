@@ -18,28 +18,53 @@
 import click
 from solanaetl.jobs.exporters.tokens_item_exporter import tokens_item_exporter
 from solanaetl.jobs.extract_tokens_job import ExtractTokensJob
-from solanaetl.providers.auto import get_provider_from_uri
-from solanaetl.thread_local_proxy import ThreadLocalProxy
+from solanaetl.providers.auto import get_batch_provider_from_uri
+from solanaetl.providers.cache import build_response_cache
+from solanaetl.providers.rate_limit import build_rate_limiter
+from solanaetl.services.account_fetcher import DEFAULT_GET_MULTIPLE_ACCOUNTS_BATCH_SIZE
 from solanaetl.utils import get_item_iterable
 
 
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
 @click.option('-a', '--accounts', type=str, required=True, help='The CSV file containing accounts.')
-@click.option('-b', '--batch-size', default=100, show_default=True, type=int, help='The number of blocks to filter at a time.')
+@click.option('-b', '--batch-size', default=DEFAULT_GET_MULTIPLE_ACCOUNTS_BATCH_SIZE, show_default=True, type=int,
+              help='The number of getMultipleAccounts requests, of up to 100 accounts each, in JSON RPC batches.')
 @click.option('-o', '--output', default='-', show_default=True, type=str, help='The output file. If not specified stdout is used.')
 @click.option('-w', '--max-workers', default=1, show_default=True, type=int, help='The maximum number of workers.')
 @click.option('-p', '--provider-uri', default='https://api.mainnet-beta.solana.com', show_default=True, type=str,
               help='The URI of the web3 provider e.g. '
-                   'https://api.mainnet-beta.solana.com')
-def extract_tokens(accounts: str, batch_size: int, output: str, max_workers: int, provider_uri: str):
+                   'https://api.mainnet-beta.solana.com. '
+                   'Requests are load balanced across several comma separated URIs.')
+@click.option('--async', 'use_async', is_flag=True, default=False,
+              help='Use the asyncio provider, keeping up to --max-workers batches in flight on a single thread. '
+                   'Can also be selected with the async+ uri scheme e.g. async+https://api.mainnet-beta.solana.com')
+@click.option('--rate-limit', default=None, type=float, envvar='SOLANAETL_RATE_LIMIT',
+              help='The maximum number of requests per second to each provider endpoint.')
+@click.option('--rate-limit-bytes', default=None, type=float, envvar='SOLANAETL_RATE_LIMIT_BYTES',
+              help='The maximum number of request and response payload bytes per second to each provider endpoint.')
+@click.option('--rate-limit-file', default=None, type=str, envvar='SOLANAETL_RATE_LIMIT_FILE',
+              help='A file holding the rate limit state, shared by the commands running concurrently on the machine.')
+@click.option('--rpc-cache-dir', default=None, type=str, envvar='SOLANAETL_RPC_CACHE_DIR',
+              help='A directory caching the RPC responses for finalized slots, re-runs are served from it.')
+@click.option('--rpc-cache-size', default=10240, show_default=True, type=int, envvar='SOLANAETL_RPC_CACHE_SIZE',
+              help='The maximum size of the RPC cache in MB, the least recently used responses are evicted.')
+@click.option('--ordered', is_flag=True, default=False,
+              help='Write the tokens in the order of the accounts they are extracted from.')
+def extract_tokens(accounts: str, batch_size: int, output: str, max_workers: int, provider_uri: str,
+                   use_async: bool = False, rate_limit: float = None, rate_limit_bytes: float = None,
+                   rate_limit_file: str = None, rpc_cache_dir: str = None, rpc_cache_size: int = 10240,
+                   ordered: bool = False):
     """Extracts Tokens from accounts file."""
     with get_item_iterable(accounts) as accounts_reader:
         job = ExtractTokensJob(
-            batch_web3_provider=ThreadLocalProxy(
-                lambda: get_provider_from_uri(provider_uri, batch=True)),
+            batch_web3_provider=get_batch_provider_from_uri(
+                provider_uri, use_async=use_async,
+                rate_limiter=build_rate_limiter(rate_limit, rate_limit_bytes, rate_limit_file),
+                response_cache=build_response_cache(rpc_cache_dir, rpc_cache_size)),
             accounts_iterable=accounts_reader,
             batch_size=batch_size,
             max_workers=max_workers,
-            item_exporter=tokens_item_exporter(output))
+            item_exporter=tokens_item_exporter(output),
+            ordered=ordered)
 
         job.run()
@@ -0,0 +1,73 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import click
+from blockchainetl_common.logging_utils import logging_basic_config
+from solanaetl.services.fake_rpc_server import (FakeRpcServer, RecordedResponses, SyntheticResponses,
+                                                parse_latency_distribution)
+
+logging_basic_config()
+
+
+@click.command(context_settings=dict(help_option_names=['-h', '--help']))
+@click.option('--host', default='127.0.0.1', show_default=True, type=str, help='The host to listen on.')
+@click.option('--port', default=8899, show_default=True, type=int, help='The port to listen on.')
+@click.option('--recordings-dir', default=None, type=str,
+              help='A directory of responses recorded with --rpc-cache-dir. '
+                   'If not provided, or a response is not recorded, synthetic responses are served.')
+@click.option('--no-synthetic', is_flag=True, default=False,
+              help='Only serve recorded responses, the other requests get an error.')
+@click.option('--transactions-per-block', default=20, show_default=True, type=int,
+              help='The number of transactions in synthetic blocks.')
+@click.option('--skipped-slot-rate', default=0.0, show_default=True, type=float,
+              help='The fraction of synthetic slots which are skipped.')
+@click.option('--latency', default=None, type=str,
+              help='The latency of each request in milliseconds e.g. constant:50, uniform:20,200, normal:100,30, '
+                   'lognormal:80,0.5 or exponential:100')
+@click.option('--latency-per-item', default=None, type=str,
+              help='The latency added for each item of a batch request, in the same format as --latency.')
+@click.option('--max-batch-size', default=None, type=int,
+              help='Batches with more requests are rejected with HTTP 413.')
+@click.option('--rate-limited-rate', default=0.0, show_default=True, type=float,
+              help='The fraction of requests rejected with HTTP 429.')
+@click.option('--timeout-rate', default=0.0, show_default=True, type=float,
+              help='The fraction of requests which never get a response.')
+@click.option('--truncated-rate', default=0.0, show_default=True, type=float,
+              help='The fraction of responses which are cut in the middle of the body.')
+def fake_rpc_server(host, port, recordings_dir, no_synthetic, transactions_per_block, skipped_slot_rate,
+                    latency, latency_per_item, max_batch_size, rate_limited_rate, timeout_rate, truncated_rate):
+    """Serves recorded or synthetic Solana RPC responses locally, for benchmarking without hitting a real node."""
+    server = FakeRpcServer(
+        host=host,
+        port=port,
+        recorded_responses=RecordedResponses(recordings_dir) if recordings_dir is not None else None,
+        synthetic_responses=None if no_synthetic else SyntheticResponses(
+            transactions_per_block=transactions_per_block, skipped_slot_rate=skipped_slot_rate),
+        latency=parse_latency_distribution(latency) if latency is not None else None,
+        latency_per_item=parse_latency_distribution(latency_per_item) if latency_per_item is not None else None,
+        max_batch_size=max_batch_size,
+        rate_limited_rate=rate_limited_rate,
+        timeout_rate=timeout_rate,
+        truncated_rate=truncated_rate,
+    )
+    click.echo('Serving on {}'.format(server.endpoint_uri), err=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
@@ -0,0 +1,47 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from datetime import datetime
+
+import click
+from blockchainetl_common.file_utils import smart_open
+from blockchainetl_common.logging_utils import logging_basic_config
+from solanaetl.providers.auto import get_batch_provider_from_uri
+from solanaetl.services.slot_time_index import SlotTimeIndex
+from solanaetl.services.sol_service import SolService
+
+logging_basic_config()
+
+
+@click.command(context_settings=dict(help_option_names=['-h', '--help']))
+@click.option('-p', '--provider-uri', default='https://api.mainnet-beta.solana.com', show_default=True, type=str,
+              help='The URI of the web3 provider e.g. '
+                   'https://api.mainnet-beta.solana.com. '
+                   'Requests are load balanced across several comma separated URIs.')
+@click.option('-d', '--date', required=True, type=lambda d: datetime.strptime(d, '%Y-%m-%d'),
+              help='The date e.g. 2018-01-01.')
+@click.option('-o', '--output', default='-', show_default=True, type=str, help='The output file. If not specified stdout is used.')
+@click.option('--slot-time-index-file', default=None, type=str, envvar='SOLANAETL_SLOT_TIME_INDEX_FILE',
+              help='A file indexing the block times of slots, so that dates already looked up cost no RPC requests.')
+def get_block_range_for_date(provider_uri, date, output, slot_time_index_file=None):
+    """Outputs start and end slots for given date."""
+    sol_service = SolService(get_batch_provider_from_uri(provider_uri), SlotTimeIndex(slot_time_index_file))
+
+    start_block, end_block = sol_service.get_block_range_for_date(date.date())
+
+    with smart_open(output, 'w') as output_file:
+        output_file.write('{},{}\n'.format(start_block, end_block))
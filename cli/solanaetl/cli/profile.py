@@ -0,0 +1,96 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import logging
+import os
+
+import click
+from blockchainetl_common.logging_utils import logging_basic_config
+from solanaetl.profiler import AllocationProfiler, DEFAULT_SAMPLE_INTERVAL_SECONDS, SamplingProfiler
+from solanaetl.services.fake_rpc_server import FakeRpcServer, SyntheticResponses
+
+logging_basic_config()
+
+
+@click.command(context_settings=dict(help_option_names=['-h', '--help'], ignore_unknown_options=True,
+                                     allow_interspersed_args=False))
+@click.option('-o', '--output-dir', default='profile', show_default=True, type=str,
+              help='The directory the profiles are written to.')
+@click.option('--interval', default=DEFAULT_SAMPLE_INTERVAL_SECONDS, show_default=True, type=float,
+              help='The number of seconds between stack samples.')
+@click.option('--allocation-frames', default=10, show_default=True, type=int,
+              help='The number of frames kept for each allocation by tracemalloc, 0 to not trace allocations, '
+                   'which slows the command down noticeably.')
+@click.option('--top', default=30, show_default=True, type=int,
+              help='The number of functions and allocation sites in the reports.')
+@click.option('--fake-rpc', is_flag=True, default=False,
+              help='Run the command against a fake RPC server serving synthetic responses, started in process, '
+                   'so that runs are reproducible. Use -p replay://<dir> in the command for recorded responses.')
+@click.option('--fake-rpc-transactions-per-block', default=20, show_default=True, type=int,
+              help='The number of transactions in the blocks of the fake RPC server.')
+@click.argument('command_args', nargs=-1, type=click.UNPROCESSED, required=True)
+@click.pass_context
+def profile(ctx, output_dir, interval, allocation_frames, top, fake_rpc, fake_rpc_transactions_per_block,
+            command_args):
+    """Runs a command, e.g. profile export_blocks_and_transactions -s 1 -e 100 ..., under a sampling profiler and
+    tracemalloc. Writes the stacks collapsed for flame graphs, the top functions of each thread and the top
+    allocation sites at the peak of memory to the output directory."""
+    command_name, args = command_args[0], list(command_args[1:])
+    command = ctx.parent.command.get_command(ctx, command_name)
+    if command is None or command is ctx.command:
+        raise click.UsageError('No such command {}'.format(command_name))
+
+    if uses_parse_processes(command, args):
+        logging.warning('The parse processes are not profiled, only the main process is sampled and traced. '
+                        'Profile without --parse-processes to see the decoding and mapping of the blocks.')
+
+    server = None
+    if fake_rpc:
+        if not any(param.name == 'provider_uri' for param in command.params):
+            raise click.UsageError('{} does not take a --provider-uri'.format(command_name))
+        server = FakeRpcServer(
+            synthetic_responses=SyntheticResponses(transactions_per_block=fake_rpc_transactions_per_block))
+        server.start()
+        # The last occurrence of an option wins
+        args += ['--provider-uri', server.endpoint_uri]
+
+    os.makedirs(output_dir, exist_ok=True)
+    profiler = SamplingProfiler(interval)
+    allocation_profiler = AllocationProfiler(allocation_frames) if allocation_frames > 0 else None
+    if allocation_profiler is not None:
+        allocation_profiler.start()
+    profiler.start()
+    try:
+        with command.make_context(command_name, args, parent=ctx) as command_ctx:
+            command.invoke(command_ctx)
+    finally:
+        profiler.stop()
+        profiler.write_collapsed_stacks(os.path.join(output_dir, 'stacks.collapsed'))
+        profiler.write_thread_report(os.path.join(output_dir, 'threads.txt'), top)
+        if allocation_profiler is not None:
+            allocation_profiler.stop()
+            allocation_profiler.write_report(os.path.join(output_dir, 'allocations.txt'), top)
+        if server is not None:
+            server.shutdown()
+        logging.info('The profiles are written to {}'.format(output_dir))
+
+
+def uses_parse_processes(command, args):
+    if not any(param.name == 'parse_processes' for param in command.params):
+        return False
+    return any(arg == '--parse-processes' or arg.startswith('--parse-processes=') for arg in args) or \
+        os.environ.get('SOLANAETL_PARSE_PROCESSES') is not None
@@ -0,0 +1,112 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import logging
+import os
+
+import click
+from blockchainetl_common.streaming.streaming_utils import configure_logging, configure_signals
+from solanaetl.enumeration.entity_type import EntityType
+from solanaetl.providers.auto import ASYNC_URI_SCHEME_PREFIX, get_batch_provider_from_uri, split_provider_uris
+from solanaetl.providers.rate_limit import build_rate_limiter
+from solanaetl.streaming.slot_watcher import SlotWatcher, get_ws_uri
+
+
+@click.command(context_settings=dict(help_option_names=['-h', '--help']))
+@click.option('-l', '--last-synced-block-file', default='last_synced_slot.txt', show_default=True, type=str,
+              help='The file with the last synced slot, streaming resumes after it.')
+@click.option('--lag', default=0, show_default=True, type=int, help='The number of slots to lag behind the network.')
+@click.option('-p', '--provider-uri', default='https://api.mainnet-beta.solana.com', show_default=True, type=str,
+              help='The URI of the web3 provider e.g. '
+                   'https://api.mainnet-beta.solana.com. '
+                   'Requests are load balanced across several comma separated URIs.')
+@click.option('--ws-uri', default=None, type=str,
+              help='The WebSocket URI notifying new slots. Defaults to the first provider URI with the ws or wss scheme.')
+@click.option('--poll', is_flag=True, default=False,
+              help='Poll getSlot instead of subscribing to new slots over WebSocket.')
+@click.option('-c', '--commitment', default='finalized', show_default=True,
+              type=click.Choice(['finalized', 'confirmed']), help='The commitment level of the streamed slots.')
+@click.option('-o', '--output', type=str,
+              help='Either Google PubSub topic path e.g. projects/your-project/topics/solana_blockchain, '
+                   'or empty to print to the console.')
+@click.option('-s', '--start-block', default=None, show_default=True, type=int,
+              help='Start slot. Defaults to the current slot unless the last synced slot file exists.')
+@click.option('-e', '--entity-types', default=','.join(EntityType.ALL_FOR_STREAMING), show_default=True, type=str,
+              help='The list of entity types to export.')
+@click.option('--period-seconds', default=0.5, show_default=True, type=float,
+              help='How many seconds to sleep between syncs')
+@click.option('-b', '--batch-size', default=5, show_default=True, type=int,
+              help='How many slots to batch in single request')
+@click.option('-B', '--block-batch-size', default=50, show_default=True, type=int,
+              help='The maximum number of slots exported in each micro-batch')
+@click.option('-w', '--max-workers', default=5, show_default=True, type=int, help='The number of workers')
+@click.option('--rate-limit', default=None, type=float, envvar='SOLANAETL_RATE_LIMIT',
+              help='The maximum number of requests per second to each provider endpoint.')
+@click.option('--log-file', default=None, show_default=True, type=str, help='Log file')
+@click.option('--pid-file', default=None, show_default=True, type=str, help='pid file')
+def stream(last_synced_block_file, lag, provider_uri, ws_uri, poll, commitment, output, start_block, entity_types,
+           period_seconds=0.5, batch_size=5, block_batch_size=50, max_workers=5, rate_limit=None,
+           log_file=None, pid_file=None):
+    """Streams blocks, transactions and instructions as the slots are confirmed or finalized."""
+    configure_logging(log_file)
+    configure_signals()
+    entity_types = parse_entity_types(entity_types)
+
+    from blockchainetl_common.streaming.streamer import Streamer
+    from solanaetl.streaming.item_exporter_creator import create_item_exporter
+    from solanaetl.streaming.solana_streamer_adapter import SolanaStreamerAdapter
+
+    if ws_uri is None and not poll:
+        ws_uri = get_ws_uri(split_provider_uris(provider_uri)[0].replace(ASYNC_URI_SCHEME_PREFIX, '', 1))
+
+    streamer_adapter = SolanaStreamerAdapter(
+        batch_web3_provider=get_batch_provider_from_uri(
+            provider_uri, rate_limiter=build_rate_limiter(rate_limit)),
+        item_exporter=create_item_exporter(output),
+        batch_size=batch_size,
+        max_workers=max_workers,
+        entity_types=entity_types,
+        commitment=commitment,
+        slot_watcher=SlotWatcher(ws_uri, commitment) if ws_uri is not None and not poll else None,
+    )
+    if start_block is None and not os.path.isfile(last_synced_block_file):
+        start_block = streamer_adapter.get_current_block_number()
+        logging.info('Starting from the current slot {}'.format(start_block))
+
+    streamer = Streamer(
+        blockchain_streamer_adapter=streamer_adapter,
+        last_synced_block_file=last_synced_block_file,
+        lag=lag,
+        start_block=start_block,
+        period_seconds=period_seconds,
+        block_batch_size=block_batch_size,
+        pid_file=pid_file,
+    )
+    streamer.stream()
+
+
+def parse_entity_types(entity_types):
+    entity_types = [c.strip() for c in entity_types.split(',')]
+
+    # validate passed types
+    for entity_type in entity_types:
+        if entity_type not in EntityType.ALL_FOR_STREAMING:
+            raise click.BadOptionUsage(
+                '--entity-type', '{} is not an available entity type. Supply a comma separated list of types from {}'
+                    .format(entity_type, ','.join(EntityType.ALL_FOR_STREAMING)))
+
+    return entity_types
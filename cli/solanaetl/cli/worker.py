@@ -0,0 +1,119 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import click
+from blockchainetl_common.logging_utils import logging_basic_config
+from solanaetl.cli.export_all import get_partitions
+from solanaetl.jobs.export_all_common import export_all_common
+from solanaetl.providers.cache import build_response_cache
+from solanaetl.providers.rate_limit import build_rate_limiter
+from solanaetl.services.account_fetcher import DEFAULT_GET_MULTIPLE_ACCOUNTS_BATCH_SIZE
+from solanaetl.services.export_journal import exit_on_sigterm
+from solanaetl.services.lease_coordinator import (DEFAULT_LEASE_SECONDS, DEFAULT_POLL_SECONDS, LeaseCoordinator,
+                                                  run_worker)
+
+logging_basic_config()
+
+
+@click.command(context_settings=dict(help_option_names=['-h', '--help']))
+@click.option('-s', '--start', required=True, type=str, help='Start block/ISO date/Unix time')
+@click.option('-e', '--end', required=True, type=str, help='End block/ISO date/Unix time')
+@click.option('-b', '--partition-batch-size', default=10000, show_default=True, type=int,
+              help='The number of blocks to export in partition.')
+@click.option('-p', '--provider-uri', default='https://api.mainnet-beta.solana.com', show_default=True, type=str,
+              help='The URI of the web3 provider e.g. '
+                   'https://api.mainnet-beta.solana.com. '
+                   'Requests are load balanced across several comma separated URIs.')
+@click.option('-o', '--output-dir', default='output', show_default=True, type=str, help='Output directory, partitioned in Hive style.')
+@click.option('-w', '--max-workers', default=1, show_default=True, type=int, help='The maximum number of workers.')
+@click.option('-B', '--export-batch-size', default=100, show_default=True, type=int, help='The number of requests in JSON RPC batches.')
+@click.option('--accounts-batch-size', default=DEFAULT_GET_MULTIPLE_ACCOUNTS_BATCH_SIZE, show_default=True, type=int,
+              help='The number of getMultipleAccounts requests, of up to 100 accounts each, in the JSON RPC batches '
+                   'of the accounts and tokens.')
+@click.option('--async', 'use_async', is_flag=True, default=False,
+              help='Use the asyncio provider, keeping up to --max-workers batches in flight on a single thread. '
+                   'Can also be selected with the async+ uri scheme e.g. async+https://api.mainnet-beta.solana.com')
+@click.option('--rate-limit', default=None, type=float, envvar='SOLANAETL_RATE_LIMIT',
+              help='The maximum number of requests per second to each provider endpoint.')
+@click.option('--rate-limit-bytes', default=None, type=float, envvar='SOLANAETL_RATE_LIMIT_BYTES',
+              help='The maximum number of request and response payload bytes per second to each provider endpoint.')
+@click.option('--rate-limit-file', default=None, type=str, envvar='SOLANAETL_RATE_LIMIT_FILE',
+              help='A file holding the rate limit state, shared by the commands running concurrently on the machine.')
+@click.option('--rpc-cache-dir', default=None, type=str, envvar='SOLANAETL_RPC_CACHE_DIR',
+              help='A directory caching the RPC responses for finalized slots, re-runs are served from it.')
+@click.option('--rpc-cache-size', default=10240, show_default=True, type=int, envvar='SOLANAETL_RPC_CACHE_SIZE',
+              help='The maximum size of the RPC cache in MB, the least recently used responses are evicted.')
+@click.option('--skipped-slots-dir', default=None, type=str, envvar='SOLANAETL_SKIPPED_SLOTS_DIR',
+              help='A directory keeping the skipped slots found by scanning the ranges with getBlocks, '
+                   'so that re-runs and gap fills never request them.')
+@click.option('--slot-time-index-file', default=None, type=str, envvar='SOLANAETL_SLOT_TIME_INDEX_FILE',
+              help='A file indexing the block times of slots, so that dates and Unix times already looked up '
+                   'cost no RPC requests.')
+@click.option('--parse-processes', default=None, type=int, envvar='SOLANAETL_PARSE_PROCESSES',
+              help='Map and parse the blocks in this many processes, 0 for one per core, while threads fetch them '
+                   'and a single thread writes the output. Not supported with --async.')
+@click.option('--min-workers', default=None, type=int, envvar='SOLANAETL_MIN_WORKERS',
+              help='Tune the number of workers between this and --max-workers from the measured throughput and '
+                   'latency. The chosen number is logged at the end, to be pinned with --max-workers.')
+@click.option('--dead-letter-file', default=None, type=str, envvar='SOLANAETL_DEAD_LETTER_FILE',
+              help='A file the blocks failing after all retries are appended to as JSON lines, '
+                   'instead of failing the export.')
+@click.option('--ordered', is_flag=True, default=False,
+              help='Write the items of each partition in slot, transaction and instruction order, '
+                   'and the extracted items in the order of the instructions and accounts they come from.')
+@click.option('--fused', is_flag=True, default=False,
+              help='Extract the token transfers and created accounts while the blocks are mapped, and request the '
+                   'accounts and tokens meanwhile, instead of reading back the instructions and accounts files.')
+@click.option('--journal-dir', default=None, type=str, envvar='SOLANAETL_JOURNAL_DIR',
+              help='A directory recording the progress of the partition being exported, '
+                   'a restarted worker resumes the blocks of its partition.')
+@click.option('--coordinator-dir', required=True, type=str, envvar='SOLANAETL_COORDINATOR_DIR',
+              help='A directory shared by the workers, e.g. on NFS, holding the partitions and their leases.')
+@click.option('--worker-id', default=None, type=str,
+              help='The name of the worker in the leases, hostname-pid by default.')
+@click.option('--lease-seconds', default=DEFAULT_LEASE_SECONDS, show_default=True, type=int,
+              help='The duration of the leases, renewed every third of it. '
+                   'The partitions of a worker not renewing its lease are exported by another worker.')
+@click.option('--poll-seconds', default=DEFAULT_POLL_SECONDS, show_default=True, type=int,
+              help='How often a worker with nothing to claim checks for expired leases.')
+def worker(start, end, partition_batch_size, provider_uri, output_dir, max_workers, export_batch_size,
+           use_async=False, rate_limit=None, rate_limit_bytes=None, rate_limit_file=None,
+           rpc_cache_dir=None, rpc_cache_size=10240, skipped_slots_dir=None, slot_time_index_file=None,
+           parse_processes=None, min_workers=None, dead_letter_file=None, ordered=False, fused=False,
+           journal_dir=None, coordinator_dir=None, worker_id=None, lease_seconds=DEFAULT_LEASE_SECONDS,
+           poll_seconds=DEFAULT_POLL_SECONDS, accounts_batch_size=DEFAULT_GET_MULTIPLE_ACCOUNTS_BATCH_SIZE):
+    """Exports the partitions of a range claimed from a coordinator directory, run it on several machines."""
+    # The lease is released on SIGTERM, another worker takes the partition over right away
+    exit_on_sigterm()
+
+    coordinator = LeaseCoordinator(coordinator_dir, worker_id, lease_seconds)
+    if not coordinator.has_partitions():
+        coordinator.add_partitions(
+            get_partitions(start, end, partition_batch_size, provider_uri, slot_time_index_file))
+
+    rate_limiter = build_rate_limiter(rate_limit, rate_limit_bytes, rate_limit_file)
+    response_cache = build_response_cache(rpc_cache_dir, rpc_cache_size)
+
+    def export_partition(partition, lease_lost):
+        export_all_common([partition], output_dir, provider_uri, max_workers, export_batch_size,
+                          use_async=use_async, rate_limiter=rate_limiter, response_cache=response_cache,
+                          skipped_slots_dir=skipped_slots_dir, parse_processes=parse_processes,
+                          min_workers=min_workers, dead_letter_file=dead_letter_file, ordered=ordered,
+                          journal_dir=journal_dir, fused=fused, stop_event=lease_lost,
+                          accounts_batch_size=accounts_batch_size)
+
+    run_worker(coordinator, export_partition, poll_seconds)
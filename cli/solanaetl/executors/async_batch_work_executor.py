@@ -0,0 +1,154 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import asyncio
+import logging
+import time
+from functools import partial
+
+from solanaetl.executors.batch_size_controller import is_rate_limited
+from solanaetl.executors.batch_work_executor import (RETRY_EXCEPTIONS,
+                                                     BatchWorkExecutor)
+from solanaetl.misc.partial_batch_error import PartialBatchError
+from solanaetl.providers.response_stats import start_response_stats
+from solanaetl.tracing import span
+from solanaetl.utils import chunk, dynamic_batch_iterator
+
+
+# Executes the given coroutine work handler in batches on a single event loop.
+# Up to max_in_flight batches are awaited concurrently, without an OS thread per outstanding request.
+class AsyncBatchWorkExecutor(BatchWorkExecutor):
+    def __init__(self, starting_batch_size, max_in_flight, retry_exceptions=RETRY_EXCEPTIONS, max_retries=5,
+                 min_in_flight=None, dead_letter_file=None, **kwargs):
+        super().__init__(starting_batch_size, max_in_flight,
+                         retry_exceptions=retry_exceptions, max_retries=max_retries, min_workers=min_in_flight,
+                         dead_letter_file=dead_letter_file, **kwargs)
+        self.max_in_flight = max_in_flight
+        self.loop = asyncio.new_event_loop()
+        self.retry_tasks = set()
+        self.logger = logging.getLogger('AsyncBatchWorkExecutor')
+
+    def execute(self, work_iterable, work_handler, total_items=None):
+        self.progress_logger.start(total_items=total_items)
+        self.loop.run_until_complete(
+            self._execute(work_iterable, work_handler))
+
+    async def _execute(self, work_iterable, work_handler):
+        tasks = set()
+        # Retries wait outside of the batches in flight
+        self.retry_tasks = set()
+        try:
+            for batch in dynamic_batch_iterator(work_iterable, lambda: self.batch_size):
+                # The number of batches in flight may change while waiting
+                while True:
+                    pending = [task for task in tasks if not task.done()]
+                    if len(pending) < self.concurrency:
+                        break
+                    await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                self._check_completed_tasks(tasks)
+                self._check_completed_tasks(self.retry_tasks)
+                task = self.loop.create_task(
+                    self._fail_safe_execute_async(work_handler, batch))
+                tasks.add(task)
+            await asyncio.gather(*tasks)
+            # A retry may schedule another
+            while len(self.retry_tasks) > 0:
+                await asyncio.wait(self.retry_tasks, return_when=asyncio.FIRST_COMPLETED)
+                self._check_completed_tasks(self.retry_tasks)
+        except BaseException:
+            # Fail fast, same as FailSafeExecutor
+            for task in tasks | self.retry_tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, *self.retry_tasks, return_exceptions=True)
+            raise
+
+    def _check_completed_tasks(self, tasks):
+        for task in tasks.copy():
+            if task.done():
+                # Will throw an exception here if the task failed
+                task.result()
+                tasks.remove(task)
+
+    async def _fail_safe_execute_async(self, work_handler, batch):
+        self.retry_budget.deposit()
+        # Set in the context of the task, the requests awaited by the task record to it
+        response_stats = start_response_stats()
+        start_time = time.time()
+        try:
+            with span('batch', size=len(batch)):
+                await work_handler(batch)
+            self._record_batch_success(len(batch), response_stats, time.time() - start_time)
+        except PartialBatchError as e:
+            self._count_errors(e)
+            self.logger.info('{} out of {} items of the batch failed and will be retried.'.format(
+                len(e.failed_items), len(batch)))
+            self._schedule_retry(partial(self._execute_retry_async, work_handler), e.failed_items, 0, e)
+        except self.retry_exceptions as e:
+            self.logger.exception(
+                'An exception occurred while executing work_handler.')
+            self._record_batch_failure(len(batch), e)
+            await self._execute_bisecting_async(work_handler, batch, e)
+
+        self.progress_logger.track(len(batch))
+
+    async def _execute_bisecting_async(self, work_handler, batch, error):
+        retry_handler = partial(self._execute_retry_async, work_handler)
+        if len(batch) == 1 or is_rate_limited(error):
+            self._schedule_retry(retry_handler, batch, 0, error)
+            return
+        self.logger.info('The batch of size {} will be retried in halves.'.format(len(batch)))
+        for half in chunk(batch, (len(batch) + 1) // 2):
+            try:
+                with span('batch_half', size=len(half)):
+                    await work_handler(half)
+            except PartialBatchError as e:
+                self._count_errors(e)
+                self._schedule_retry(retry_handler, e.failed_items, 0, e)
+            except self.retry_exceptions as e:
+                self.logger.info('A half of size {} failed: {}'.format(len(half), repr(e)))
+                await self._execute_bisecting_async(work_handler, half, e)
+
+    async def _execute_retry_async(self, work_handler, items, attempt):
+        try:
+            with span('retry', size=len(items), attempt=attempt):
+                await work_handler(items)
+        except PartialBatchError as e:
+            self._count_errors(e)
+            self._log_failed_items(e, attempt)
+            self._schedule_retry(partial(self._execute_retry_async, work_handler), e.failed_items, attempt + 1, e)
+        except self.retry_exceptions as e:
+            self.logger.exception('An exception occurred while retrying {} failed items. Retry #{}'.format(
+                len(items), attempt))
+            self._schedule_retry(partial(self._execute_retry_async, work_handler), items, attempt + 1, e)
+
+    def _schedule(self, delay_seconds, retry_handler, items, attempt):
+        self.retry_tasks.add(self.loop.create_task(
+            self._execute_later_async(delay_seconds, retry_handler, items, attempt)))
+
+    async def _execute_later_async(self, delay_seconds, retry_handler, items, attempt):
+        # Only suspends this retry, the batches in flight keep going
+        await asyncio.sleep(delay_seconds)
+        await retry_handler(items, attempt)
+
+    def run_until_complete(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def shutdown(self):
+        super().shutdown()
+        self.loop.close()
+
@@ -0,0 +1,134 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import logging
+import threading
+from collections import Counter
+
+from requests.exceptions import HTTPError, Timeout as RequestsTimeout
+from web3._utils.threads import Timeout as Web3Timeout
+
+# The response latency the batches are sized for
+DEFAULT_TARGET_LATENCY_SECONDS = 3
+# The bytes on the wire of a response, compressed responses fit more blocks
+DEFAULT_MAX_RESPONSE_BYTES = 32 * 1024 * 1024
+# How far above the starting batch size the batches are probed
+MAX_BATCH_SIZE_FACTOR = 4
+
+TIMEOUT_EXCEPTIONS = (RequestsTimeout, Web3Timeout)
+TIMEOUT_STATUS_CODES = (504,)
+OVERSIZED_STATUS_CODES = (413,)
+RATE_LIMITED_STATUS_CODES = (429,)
+
+
+# Sizes the batches with additive increase and multiplicative decrease (AIMD).
+# The batch size grows by a step while the responses stay below the latency target and the response byte budget,
+# and is cut on timeouts and on slow or oversized responses. Batches of another size than the current one,
+# e.g. those sent before the last change, don't change it again.
+class BatchSizeController(object):
+    def __init__(self, starting_batch_size, max_batch_size=None, min_batch_size=1,
+                 target_latency_seconds=DEFAULT_TARGET_LATENCY_SECONDS,
+                 max_response_bytes=DEFAULT_MAX_RESPONSE_BYTES,
+                 additive_increase=None, multiplicative_decrease=0.5):
+        self.batch_size = starting_batch_size
+        self.max_batch_size = max_batch_size if max_batch_size is not None \
+            else starting_batch_size * MAX_BATCH_SIZE_FACTOR
+        self.min_batch_size = min_batch_size
+        self.target_latency_seconds = target_latency_seconds
+        self.max_response_bytes = max_response_bytes
+        self.additive_increase = additive_increase if additive_increase is not None \
+            else max(1, starting_batch_size // 8)
+        self.multiplicative_decrease = multiplicative_decrease
+
+        self.decisions = Counter()
+        self.lowest_batch_size = starting_batch_size
+        self.highest_batch_size = starting_batch_size
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger('BatchSizeController')
+
+    def record_success(self, batch_size, latency_seconds, response_bytes=None):
+        with self.lock:
+            if batch_size != self.batch_size:
+                return
+            if response_bytes is not None and self.max_response_bytes is not None \
+                    and response_bytes > self.max_response_bytes:
+                self._decrease('oversized')
+            elif latency_seconds > self.target_latency_seconds:
+                self._decrease('slow')
+            elif self._is_within_budget(batch_size + self.additive_increase, batch_size,
+                                        latency_seconds, response_bytes):
+                self._increase()
+            else:
+                self.decisions['hold'] += 1
+
+    def record_failure(self, batch_size, exception):
+        reason = get_decrease_reason(exception)
+        with self.lock:
+            if batch_size != self.batch_size:
+                return
+            if reason is not None:
+                self._decrease(reason)
+            else:
+                # e.g. rate limits and connection errors, smaller batches would not help
+                self.decisions['hold'] += 1
+
+    def get_metrics(self):
+        with self.lock:
+            return dict(self.decisions, batch_size=self.batch_size,
+                        lowest_batch_size=self.lowest_batch_size, highest_batch_size=self.highest_batch_size)
+
+    # The responses of the larger batch are estimated from those of the last one
+    def _is_within_budget(self, new_batch_size, batch_size, latency_seconds, response_bytes):
+        if new_batch_size > self.max_batch_size:
+            return False
+        if response_bytes is not None and self.max_response_bytes is not None \
+                and response_bytes * new_batch_size / batch_size > self.max_response_bytes:
+            return False
+        return latency_seconds * new_batch_size / batch_size <= self.target_latency_seconds
+
+    def _increase(self):
+        self._set_batch_size(min(self.max_batch_size, self.batch_size + self.additive_increase), 'increase')
+
+    def _decrease(self, reason):
+        self._set_batch_size(
+            max(self.min_batch_size, int(self.batch_size * self.multiplicative_decrease)), 'decrease_' + reason)
+
+    def _set_batch_size(self, batch_size, decision):
+        self.decisions[decision] += 1
+        if batch_size == self.batch_size:
+            return
+        self.logger.info('Changing batch size from {} to {} ({}).'.format(self.batch_size, batch_size, decision))
+        self.batch_size = batch_size
+        self.lowest_batch_size = min(self.lowest_batch_size, batch_size)
+        self.highest_batch_size = max(self.highest_batch_size, batch_size)
+
+
+def get_decrease_reason(exception):
+    if isinstance(exception, TIMEOUT_EXCEPTIONS):
+        return 'timeout'
+    if isinstance(exception, HTTPError) and exception.response is not None:
+        if exception.response.status_code in TIMEOUT_STATUS_CODES:
+            return 'timeout'
+        if exception.response.status_code in OVERSIZED_STATUS_CODES:
+            return 'oversized'
+    return None
+
+
+def is_rate_limited(exception):
+    return isinstance(exception, HTTPError) and exception.response is not None \
+        and exception.response.status_code in RATE_LIMITED_STATUS_CODES
@@ -17,38 +17,75 @@
 
 
 import logging
+import threading
 import time
+from collections import Counter
+from functools import partial
 from json.decoder import JSONDecodeError
 
 from requests.exceptions import Timeout as RequestsTimeout, HTTPError, TooManyRedirects, ConnectionError as RequestsConnectionError
 from web3._utils.threads import Timeout as Web3Timeout
 
+from solanaetl.executors.batch_size_controller import BatchSizeController, is_rate_limited
 from solanaetl.executors.bounded_executor import BoundedExecutor
+from solanaetl.executors.concurrency_controller import ConcurrencyController
 from solanaetl.executors.fail_safe_executor import FailSafeExecutor
+from solanaetl.executors.retry_queue import (DEFAULT_MAX_RETRY_DELAY_SECONDS, DEFAULT_RETRY_DELAY_SECONDS,
+                                             DelayedRetryQueue, RetryBudget, get_retry_delay)
+from solanaetl.metrics import BATCH_SECONDS, BATCH_SIZE, CONCURRENCY, DEAD_LETTERED_ITEMS, RETRIED_ITEMS
+from solanaetl.misc.partial_batch_error import PartialBatchError
 from solanaetl.misc.retriable_value_error import RetriableValueError
 from solanaetl.progress_logger import ProgressLogger
-from solanaetl.utils import dynamic_batch_iterator
+from solanaetl.providers.response_stats import start_response_stats
+from solanaetl.tracing import span
+from solanaetl.utils import chunk, dynamic_batch_iterator
 
 RETRY_EXCEPTIONS = (ConnectionError, RequestsConnectionError, HTTPError, RequestsTimeout, TooManyRedirects, Web3Timeout,
                     OSError, RetriableValueError, JSONDecodeError)
 
-BATCH_CHANGE_COOLDOWN_PERIOD_SECONDS = 2 * 60
 
-
-# Executes the given work in batches, reducing the batch size exponentially in case of errors.
+# Executes the given work in batches, sized by BatchSizeController from the latency and size of the responses.
+# With min_workers the number of workers in use is tuned by ConcurrencyController between min_workers and max_workers.
+# Failed batches are bisected, the items still failing after retries are written to dead_letter_file if given.
+# Retries wait on a DelayedRetryQueue instead of in the workers, which keep executing fresh batches meanwhile.
 class BatchWorkExecutor:
-    def __init__(self, starting_batch_size, max_workers, retry_exceptions=RETRY_EXCEPTIONS, max_retries=5):
-        self.batch_size = starting_batch_size
-        self.max_batch_size = starting_batch_size
-        self.latest_batch_size_change_time = None
+    def __init__(self, starting_batch_size, max_workers, retry_exceptions=RETRY_EXCEPTIONS, max_retries=5,
+                 batch_size_controller=None, min_workers=None, dead_letter_file=None, retry_budget=None,
+                 retry_delay_seconds=DEFAULT_RETRY_DELAY_SECONDS,
+                 max_retry_delay_seconds=DEFAULT_MAX_RETRY_DELAY_SECONDS):
+        self.batch_size_controller = batch_size_controller if batch_size_controller is not None \
+            else BatchSizeController(starting_batch_size)
         self.max_workers = max_workers
+        self.concurrency_controller = ConcurrencyController(min_workers, max_workers) \
+            if min_workers is not None else None
         # Using bounded executor prevents unlimited queue growth
         # and allows monitoring in-progress futures and failing fast in case of errors.
-        self.executor = FailSafeExecutor(BoundedExecutor(1, self.max_workers))
+        self.bounded_executor = BoundedExecutor(1, self.max_workers)
+        self.executor = FailSafeExecutor(self.bounded_executor)
+        self._apply_concurrency()
         self.retry_exceptions = retry_exceptions
         self.max_retries = max_retries
+        self.dead_letter_file = dead_letter_file
+        self.retry_budget = retry_budget if retry_budget is not None else RetryBudget()
+        self.retry_delay_seconds = retry_delay_seconds
+        self.max_retry_delay_seconds = max_retry_delay_seconds
+        self.retry_queue = DelayedRetryQueue(self.executor.submit)
         self.progress_logger = ProgressLogger()
         self.logger = logging.getLogger('BatchWorkExecutor')
+        # Failed requests by JSON RPC error code, None when the response has no item for the request
+        self.error_counts = Counter()
+        self.error_counts_lock = threading.Lock()
+        # The dead letter file may be shared with other executors
+        self.dead_lettered_item_count = 0
+
+    @property
+    def batch_size(self):
+        return self.batch_size_controller.batch_size
+
+    @property
+    def concurrency(self):
+        return self.concurrency_controller.concurrency if self.concurrency_controller is not None \
+            else self.max_workers
 
     def execute(self, work_iterable, work_handler, total_items=None):
         self.progress_logger.start(total_items=total_items)
@@ -56,61 +93,156 @@ class BatchWorkExecutor:
             self.executor.submit(self._fail_safe_execute, work_handler, batch)
 
     def _fail_safe_execute(self, work_handler, batch):
+        self.retry_budget.deposit()
+        response_stats = start_response_stats()
+        start_time = time.time()
         try:
-            work_handler(batch)
-            self._try_increase_batch_size(len(batch))
-        except self.retry_exceptions:
+            with span('batch', size=len(batch)):
+                work_handler(batch)
+            self._record_batch_success(len(batch), response_stats, time.time() - start_time)
+        except PartialBatchError as e:
+            # The rest of the batch succeeded, the batch size is fine
+            self._count_errors(e)
+            self.logger.info('{} out of {} items of the batch failed and will be retried.'.format(
+                len(e.failed_items), len(batch)))
+            self._schedule_retry(partial(self._execute_retry, work_handler), e.failed_items, 0, e)
+        except self.retry_exceptions as e:
             self.logger.exception(
                 'An exception occurred while executing work_handler.')
-            self._try_decrease_batch_size(len(batch))
-            self.logger.info(
-                'The batch of size {} will be retried one item at a time.'.format(len(batch)))
-            for item in batch:
-                execute_with_retries(work_handler, [item],
-                                     max_retries=self.max_retries, retry_exceptions=self.retry_exceptions)
+            self._record_batch_failure(len(batch), e)
+            self._execute_bisecting(work_handler, batch, e)
 
         self.progress_logger.track(len(batch))
 
-    # Some acceptable race conditions are possible
-    def _try_decrease_batch_size(self, current_batch_size):
-        batch_size = self.batch_size
-        if batch_size == current_batch_size and batch_size > 1:
-            new_batch_size = int(current_batch_size / 2)
-            self.logger.info(
-                'Reducing batch size to {}.'.format(new_batch_size))
-            self.batch_size = new_batch_size
-            self.latest_batch_size_change_time = time.time()
-
-    def _try_increase_batch_size(self, current_batch_size):
-        if current_batch_size * 2 <= self.max_batch_size:
-            current_time = time.time()
-            latest_batch_size_change_time = self.latest_batch_size_change_time
-            seconds_since_last_change = current_time - latest_batch_size_change_time \
-                if latest_batch_size_change_time is not None else 0
-            if seconds_since_last_change > BATCH_CHANGE_COOLDOWN_PERIOD_SECONDS:
-                new_batch_size = current_batch_size * 2
-                self.logger.info(
-                    'Increasing batch size to {}.'.format(new_batch_size))
-                self.batch_size = new_batch_size
-                self.latest_batch_size_change_time = current_time
+    # The good halves succeed in large requests while a bad item is isolated in O(log n) requests
+    def _execute_bisecting(self, work_handler, batch, error):
+        retry_handler = partial(self._execute_retry, work_handler)
+        # Splitting would only make more requests to a rate limited endpoint
+        if len(batch) == 1 or is_rate_limited(error):
+            self._schedule_retry(retry_handler, batch, 0, error)
+            return
+        self.logger.info('The batch of size {} will be retried in halves.'.format(len(batch)))
+        for half in chunk(batch, (len(batch) + 1) // 2):
+            try:
+                with span('batch_half', size=len(half)):
+                    work_handler(half)
+            except PartialBatchError as e:
+                self._count_errors(e)
+                self._schedule_retry(retry_handler, e.failed_items, 0, e)
+            except self.retry_exceptions as e:
+                self.logger.info('A half of size {} failed: {}'.format(len(half), repr(e)))
+                self._execute_bisecting(work_handler, half, e)
+
+    def _execute_retry(self, work_handler, items, attempt):
+        try:
+            with span('retry', size=len(items), attempt=attempt):
+                work_handler(items)
+        except PartialBatchError as e:
+            # Only the items still failing are retried
+            self._count_errors(e)
+            self._log_failed_items(e, attempt)
+            self._schedule_retry(partial(self._execute_retry, work_handler), e.failed_items, attempt + 1, e)
+        except self.retry_exceptions as e:
+            self.logger.exception('An exception occurred while retrying {} failed items. Retry #{}'.format(
+                len(items), attempt))
+            self._schedule_retry(partial(self._execute_retry, work_handler), items, attempt + 1, e)
+
+    # retry_handler(items, attempt) is called on the retry queue once the backoff has passed
+    def _schedule_retry(self, retry_handler, items, attempt, error):
+        if attempt >= self.max_retries:
+            return self._dead_letter_or_raise(items, error)
+        if not self.retry_budget.withdraw():
+            self.logger.warning('The retry budget is exhausted, {} items are not retried.'.format(len(items)))
+            return self._dead_letter_or_raise(items, error)
+        delay_seconds = get_retry_delay(attempt, self.retry_delay_seconds, self.max_retry_delay_seconds)
+        self.logger.info('{} items will be retried in {:.1f} seconds. Retry #{}'.format(
+            len(items), delay_seconds, attempt))
+        RETRIED_ITEMS.labels(type(error).__name__).inc(len(items))
+        self._schedule(delay_seconds, retry_handler, items, attempt)
+
+    def _schedule(self, delay_seconds, retry_handler, items, attempt):
+        self.retry_queue.schedule(delay_seconds, retry_handler, items, attempt)
+
+    # Done once no work is running and no retry is waiting, a running retry may schedule another
+    def _wait_for_retries(self):
+        while not (self.bounded_executor.is_idle() and self.retry_queue.pending == 0):
+            self.retry_queue.wait(0.1)
+        self.retry_queue.close()
+
+    def _dead_letter_or_raise(self, items, error):
+        if self.dead_letter_file is None:
+            raise error
+        self.logger.error('{} items failed and are written to the dead letter file {}: {}'.format(
+            len(items), self.dead_letter_file.path, repr(error)))
+        self.dead_letter_file.write(items, error)
+        with self.error_counts_lock:
+            self.dead_lettered_item_count += len(items)
+        DEAD_LETTERED_ITEMS.labels(type(error).__name__).inc(len(items))
+
+    def _count_errors(self, partial_batch_error):
+        with self.error_counts_lock:
+            self.error_counts.update(partial_batch_error.error_codes)
+
+    def _log_failed_items(self, partial_batch_error, retry):
+        self.logger.warning('Retry #{} failed for {} items, by item: {}'.format(
+            retry, len(partial_batch_error.failed_items),
+            dict(zip(partial_batch_error.failed_items, partial_batch_error.error_codes))))
+
+    def _record_batch_success(self, batch_size, response_stats, elapsed_seconds):
+        BATCH_SECONDS.observe(elapsed_seconds)
+        if response_stats.response_count > 0:
+            latency_seconds = response_stats.latency_seconds
+            self.batch_size_controller.record_success(batch_size, latency_seconds, response_stats.response_bytes)
+        else:
+            # No request was made over HTTP, e.g. the responses came from the cache
+            latency_seconds = elapsed_seconds
+            self.batch_size_controller.record_success(batch_size, latency_seconds)
+        if self.concurrency_controller is not None:
+            self.concurrency_controller.record_success(batch_size, latency_seconds)
+            self._apply_concurrency()
+        self._set_gauges()
+
+    def _record_batch_failure(self, batch_size, exception):
+        self.batch_size_controller.record_failure(batch_size, exception)
+        if self.concurrency_controller is not None:
+            self.concurrency_controller.record_failure()
+            self._apply_concurrency()
+        self._set_gauges()
+
+    def _set_gauges(self):
+        BATCH_SIZE.set(self.batch_size)
+        CONCURRENCY.set(self.concurrency)
+
+    def _apply_concurrency(self):
+        self.bounded_executor.resize(self.concurrency)
 
     def shutdown(self):
+        self._wait_for_retries()
         self.executor.shutdown()
-        self.progress_logger.finish()
+        self._finish()
 
+    def _finish(self):
+        if self.dead_letter_file is not None:
+            self.dead_letter_file.close()
+        self.progress_logger.finish()
+        if len(self.error_counts) > 0:
+            self.logger.info('Failed requests by error code: {}'.format(dict(self.error_counts)))
+        self.logger.info('Batch size decisions: {}'.format(self.batch_size_controller.get_metrics()))
+        self._log_concurrency()
+        self._log_dead_letters()
+        if self.retry_budget.exhausted_count > 0:
+            self.logger.warning('The retry budget was exhausted {} times.'.format(self.retry_budget.exhausted_count))
+
+    def _log_dead_letters(self):
+        if self.dead_lettered_item_count > 0:
+            self.logger.warning('{} items were written to the dead letter file {}.'.format(
+                self.dead_lettered_item_count, self.dead_letter_file.path))
+
+    def _log_concurrency(self):
+        if self.concurrency_controller is not None:
+            metrics = self.concurrency_controller.get_metrics()
+            self.logger.info('Concurrency: {}. The best throughput of {} items/s was reached with {} workers, '
+                             'it can be pinned with --max-workers.'.format(
+                                 metrics['concurrency'], metrics['best_throughput'],
+                                 metrics['best_throughput_concurrency']))
 
-def execute_with_retries(func, *args, max_retries=6, retry_exceptions=RETRY_EXCEPTIONS, sleep_seconds=1):
-    for i in range(max_retries):
-        try:
-            return func(*args)
-        except retry_exceptions:
-            logging.exception(
-                'An exception occurred while executing execute_with_retries. Retry #{}'.format(i))
-            if i < max_retries - 1:
-                logging.info('The request will be retried after {} seconds. Retry #{}'.format(
-                    sleep_seconds, i))
-                time.sleep(sleep_seconds)
-                sleep_seconds = sleep_seconds * 2
-                continue
-            else:
-                raise
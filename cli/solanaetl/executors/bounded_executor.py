@@ -17,7 +17,7 @@
 
 
 from concurrent.futures import ThreadPoolExecutor
-from threading import BoundedSemaphore
+from threading import Condition
 
 
 class BoundedExecutor:
@@ -30,21 +30,45 @@ class BoundedExecutor:
 
     def __init__(self, bound, max_workers):
         self._delegate = ThreadPoolExecutor(max_workers=max_workers)
-        self._semaphore = BoundedSemaphore(bound + max_workers)
+        self._bound = bound
+        self._limit = bound + max_workers
+        self._in_flight = 0
+        self._condition = Condition()
+
+    """Limits the workers in use to at most the size of the thread pool"""
+
+    def resize(self, workers):
+        with self._condition:
+            self._limit = self._bound + workers
+            self._condition.notify_all()
 
     """See concurrent.futures.Executor#submit"""
 
     def submit(self, fn, *args, **kwargs):
-        self._semaphore.acquire()
+        with self._condition:
+            while self._in_flight >= self._limit:
+                self._condition.wait()
+            self._in_flight += 1
         try:
             future = self._delegate.submit(fn, *args, **kwargs)
         except:
-            self._semaphore.release()
+            self._release()
             raise
         else:
-            future.add_done_callback(lambda x: self._semaphore.release())
+            future.add_done_callback(lambda x: self._release())
             return future
 
+    """True when no work item is queued or running"""
+
+    def is_idle(self):
+        with self._condition:
+            return self._in_flight == 0
+
+    def _release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
     """See concurrent.futures.Executor#shutdown"""
 
     def shutdown(self, wait=True):
@@ -0,0 +1,124 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import logging
+import math
+import threading
+import time
+
+# The window over which throughput and latency are measured before the concurrency is changed
+DEFAULT_WINDOW_SECONDS = 2
+# Latency growth within this ratio of the baseline is not taken as queueing at the endpoint
+LATENCY_TOLERANCE = 1.2
+# At min_concurrency the baseline drifts up by this ratio per window, so that a slower network is eventually accepted
+BASELINE_DRIFT = 0.02
+BACKOFF_FACTOR = 0.75
+SMOOTHING = 0.5
+
+
+# Tunes the number of batches in flight between min_concurrency and max_concurrency.
+# The concurrency doubles while the latency per item stays flat (slow start), then follows the gradient of the
+# latency per item against its baseline plus a headroom of sqrt(concurrency), in the manner of the gradient
+# limiters. Failed batches back it off. By Little's law the throughput grows with the concurrency
+# until the endpoint starts queueing, which shows up in the latency.
+class ConcurrencyController(object):
+    def __init__(self, min_concurrency, max_concurrency, window_seconds=DEFAULT_WINDOW_SECONDS):
+        if min_concurrency < 1 or min_concurrency > max_concurrency:
+            raise ValueError('min_concurrency must be between 1 and max_concurrency')
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.window_seconds = window_seconds
+        self.concurrency = min_concurrency
+        self.slow_start = True
+        self.baseline_item_latency = None
+        self.best_throughput = 0.0
+        self.best_throughput_concurrency = min_concurrency
+
+        self._reset_window(time.time())
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger('ConcurrencyController')
+
+    def record_success(self, item_count, latency_seconds):
+        with self.lock:
+            self.window_items += item_count
+            self.window_item_latency_seconds += latency_seconds
+            self.window_samples += 1
+            self._try_close_window()
+
+    def record_failure(self):
+        with self.lock:
+            self.window_failures += 1
+            self.window_samples += 1
+            self._try_close_window()
+
+    def get_metrics(self):
+        with self.lock:
+            return dict(concurrency=self.concurrency,
+                        best_throughput=round(self.best_throughput, 1),
+                        best_throughput_concurrency=self.best_throughput_concurrency)
+
+    def _try_close_window(self):
+        now = time.time()
+        elapsed_seconds = now - self.window_start_time
+        # A window sees at least half of the batches in flight complete
+        if elapsed_seconds < self.window_seconds or self.window_samples < max(1, self.concurrency // 2):
+            return
+
+        throughput = self.window_items / elapsed_seconds
+        if throughput > self.best_throughput:
+            self.best_throughput = throughput
+            self.best_throughput_concurrency = self.concurrency
+
+        if self.window_failures > 0:
+            self.slow_start = False
+            new_concurrency = self.concurrency * BACKOFF_FACTOR
+            reason = 'failures'
+        elif self.window_items > 0:
+            item_latency = self.window_item_latency_seconds / self.window_items
+            if self.baseline_item_latency is None:
+                self.baseline_item_latency = item_latency
+            elif self.concurrency == self.min_concurrency:
+                self.baseline_item_latency = min(item_latency, self.baseline_item_latency * (1 + BASELINE_DRIFT))
+            else:
+                # Above min_concurrency a higher latency may well be caused by the load
+                self.baseline_item_latency = min(item_latency, self.baseline_item_latency)
+            gradient = max(0.5, min(1.0, LATENCY_TOLERANCE * self.baseline_item_latency / item_latency))
+            if self.slow_start and gradient == 1.0:
+                new_concurrency = self.concurrency * 2
+            else:
+                self.slow_start = False
+                new_concurrency = self.concurrency * gradient + math.sqrt(self.concurrency)
+                new_concurrency = self.concurrency * (1 - SMOOTHING) + new_concurrency * SMOOTHING
+            reason = 'latency gradient {:.2f}'.format(gradient)
+        else:
+            new_concurrency = self.concurrency
+            reason = None
+
+        new_concurrency = max(self.min_concurrency, min(self.max_concurrency, int(round(new_concurrency))))
+        if new_concurrency != self.concurrency:
+            self.logger.info('Changing concurrency from {} to {} ({}), throughput {:.1f} items/s.'.format(
+                self.concurrency, new_concurrency, reason, throughput))
+            self.concurrency = new_concurrency
+        self._reset_window(now)
+
+    def _reset_window(self, now):
+        self.window_start_time = now
+        self.window_items = 0
+        self.window_item_latency_seconds = 0.0
+        self.window_samples = 0
+        self.window_failures = 0
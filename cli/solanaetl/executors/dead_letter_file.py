@@ -0,0 +1,63 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+from solanaetl.misc.partial_batch_error import PartialBatchError
+
+
+# Appends the items which failed after all retries as JSON lines, e.g.
+# {"item": 138802069, "error_type": "PartialBatchError", "error_code": -32004, "error": "...", "time": "..."}
+# It may be shared by several executors, the file is opened again when written to after being closed.
+class DeadLetterFile(object):
+    def __init__(self, path):
+        self.path = path
+        self.item_count = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def write(self, items, error):
+        # The errors of a partially failed batch are known by item
+        item_errors = dict(zip(error.failed_items, error.errors)) if isinstance(error, PartialBatchError) else {}
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            if self._file is None:
+                if os.path.dirname(self.path):
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._file = open(self.path, 'a')
+            for item in items:
+                item_error = item_errors.get(item)
+                self._file.write(json.dumps({
+                    'item': item,
+                    'error_type': type(error).__name__,
+                    'error_code': item_error.get('code') if item_error is not None else None,
+                    'error': item_error.get('message') if item_error is not None else str(error),
+                    'time': now,
+                }, default=str) + '\n')
+            self._file.flush()
+            self.item_count += len(items)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
@@ -16,16 +16,22 @@
 # TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
+import threading
+
+
 class FailSafeExecutor:
 
     def __init__(self, delegate):
         self._delegate = delegate
         self._futures = []
+        # Work is submitted by the retry queue too
+        self._futures_lock = threading.Lock()
 
     def submit(self, fn, *args, **kwargs):
         self._check_completed_futures()
         future = self._delegate.submit(fn, *args, **kwargs)
-        self._futures.append(future)
+        with self._futures_lock:
+            self._futures.append(future)
 
         return future
 
@@ -36,8 +42,9 @@ class FailSafeExecutor:
 
     def _check_completed_futures(self):
         """Fail safe in this case means fail fast. TODO: Add retry logic"""
-        for future in self._futures.copy():
-            if future.done():
-                # Will throw an exception here if the future failed
-                future.result()
-                self._futures.remove(future)
+        with self._futures_lock:
+            for future in self._futures.copy():
+                if future.done():
+                    # Will throw an exception here if the future failed
+                    future.result()
+                    self._futures.remove(future)
@@ -0,0 +1,193 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from multiprocessing import get_context
+
+from solanaetl.executors.batch_size_controller import is_rate_limited
+from solanaetl.executors.batch_work_executor import (RETRY_EXCEPTIONS,
+                                                     BatchWorkExecutor)
+from solanaetl.providers.response_stats import start_response_stats
+from solanaetl.tracing import get_trace_file, init_process, span
+from solanaetl.utils import chunk, dynamic_batch_iterator
+
+_STOP = object()
+
+
+# Executes the given work in three stages: fetch_handler on a pool of I/O threads, process_handler on a pool
+# of processes and write_handler on a single writer thread. fetch_handler returns the raw response, which is
+# decoded by process_handler(batch, response) in the processes. The fetched batches wait in a bounded queue for
+# the processes, so that slow processes block the fetch threads. process_handler must be picklable and return
+# (results, partial_batch_error), the failed items of the error are fetched and processed again.
+class PipelineWorkExecutor(BatchWorkExecutor):
+    def __init__(self, batch_size, max_workers, max_processes, queue_size=None,
+                 retry_exceptions=RETRY_EXCEPTIONS, max_retries=5, min_workers=None, dead_letter_file=None, **kwargs):
+        super().__init__(batch_size, max_workers,
+                         retry_exceptions=retry_exceptions, max_retries=max_retries, min_workers=min_workers,
+                         dead_letter_file=dead_letter_file, **kwargs)
+        self.max_processes = max_processes
+        # Processes are spawned, forking a process running threads is not safe
+        self.process_executor = ProcessPoolExecutor(max_processes, mp_context=get_context('spawn'),
+                                                   initializer=init_process,
+                                                   initargs=(get_trace_file(),))
+        queue_size = queue_size if queue_size is not None else 2 * max_processes
+        self.process_queue = queue.Queue(maxsize=queue_size)
+        # Batches submitted to the processes and not yet written, the processes are kept busy without piling up
+        # results in memory
+        self.process_slots = threading.BoundedSemaphore(max_processes + queue_size)
+        self.write_queue = queue.Queue()
+        # Batches fetched and not yet written, including those retried
+        self._in_pipeline = 0
+        self._in_pipeline_lock = threading.Lock()
+        self.dispatcher = None
+        self.writer = None
+        self.writer_error = None
+        self.logger = logging.getLogger('PipelineWorkExecutor')
+
+    def execute(self, work_iterable, fetch_handler, process_handler, write_handler, total_items=None):
+        self.progress_logger.start(total_items=total_items)
+        self.dispatcher = threading.Thread(target=self._dispatch, args=(process_handler,), name='PipelineDispatcher',
+                                           daemon=True)
+        self.dispatcher.start()
+        self.writer = threading.Thread(target=self._write, args=(fetch_handler, write_handler), name='PipelineWriter',
+                                       daemon=True)
+        self.writer.start()
+        for batch in dynamic_batch_iterator(work_iterable, lambda: self.batch_size):
+            if self.writer_error is not None:
+                raise self.writer_error
+            self.executor.submit(self._fail_safe_execute_pipeline, fetch_handler, batch)
+
+    def _fail_safe_execute_pipeline(self, fetch_handler, batch):
+        self.retry_budget.deposit()
+        self._execute_pipeline(fetch_handler, batch)
+        self.progress_logger.track(len(batch))
+
+    # attempt is None for fresh batches and their halves
+    def _execute_pipeline(self, fetch_handler, items, attempt=None):
+        next_attempt = attempt + 1 if attempt is not None else 0
+        response_stats = start_response_stats()
+        start_time = time.time()
+        try:
+            with span('fetch', size=len(items)):
+                response = fetch_handler(items)
+        except self.retry_exceptions as e:
+            self.logger.exception('An exception occurred while fetching {} items.'.format(len(items)))
+            self._handle_failure(fetch_handler, items, attempt, e)
+            return
+        if attempt is None:
+            self._record_batch_success(len(items), response_stats, time.time() - start_time)
+        with self._in_pipeline_lock:
+            self._in_pipeline += 1
+        # Blocks while the processes are behind
+        self.process_queue.put((items, next_attempt, response))
+
+    def _handle_failure(self, fetch_handler, items, attempt, error):
+        retry_handler = partial(self._execute_pipeline, fetch_handler)
+        next_attempt = attempt + 1 if attempt is not None else 0
+        if attempt is not None:
+            self._schedule_retry(retry_handler, items, next_attempt, error)
+            return
+        self._record_batch_failure(len(items), error)
+        # Bisected, same as BatchWorkExecutor
+        if len(items) > 1 and not is_rate_limited(error):
+            for half in chunk(items, (len(items) + 1) // 2):
+                self._execute_pipeline(fetch_handler, half)
+        else:
+            self._schedule_retry(retry_handler, items, next_attempt, error)
+
+    def _dispatch(self, process_handler):
+        while True:
+            entry = self.process_queue.get()
+            if entry is _STOP:
+                return
+            items, next_attempt, response = entry
+            self.process_slots.acquire()
+            try:
+                future = self.process_executor.submit(process_handler, items, response)
+            except Exception as e:
+                # e.g. a process of the pool died, failed by the writer
+                future = Future()
+                future.set_exception(e)
+            future.add_done_callback(partial(self._processed, items, next_attempt))
+
+    def _processed(self, items, next_attempt, future):
+        self.write_queue.put((items, next_attempt, future))
+
+    def _write(self, fetch_handler, write_handler):
+        retry_handler = partial(self._execute_pipeline, fetch_handler)
+        while True:
+            entry = self.write_queue.get()
+            if entry is _STOP:
+                return
+            items, next_attempt, future = entry
+            self.process_slots.release()
+            try:
+                # After a failure the queue is still drained, the dispatcher would block otherwise
+                if self.writer_error is None:
+                    self._write_processed(retry_handler, write_handler, items, next_attempt, future)
+            except Exception as e:
+                self.logger.exception('An exception occurred while writing.')
+                self.writer_error = e
+            finally:
+                with self._in_pipeline_lock:
+                    self._in_pipeline -= 1
+
+    def _write_processed(self, retry_handler, write_handler, items, next_attempt, future):
+        try:
+            results, error = future.result()
+        except self.retry_exceptions as e:
+            self.logger.exception('An exception occurred while processing {} items.'.format(len(items)))
+            self._schedule_retry(retry_handler, items, next_attempt, e)
+            return
+        with span('write'):
+            write_handler(results)
+        if error is not None:
+            self._count_errors(error)
+            self.logger.info('{} out of {} items failed and will be retried.'.format(
+                len(error.failed_items), len(items)))
+            self._schedule_retry(retry_handler, error.failed_items, next_attempt, error)
+
+    def _wait_for_retries(self):
+        # The batches in the pipeline may still be retried
+        while not (self.bounded_executor.is_idle() and self.retry_queue.pending == 0 and self._in_pipeline == 0):
+            if self.writer_error is not None:
+                break
+            self.retry_queue.wait(0.1)
+        self.retry_queue.close()
+
+    def shutdown(self):
+        try:
+            self._wait_for_retries()
+            self.executor.shutdown()
+        finally:
+            if self.dispatcher is not None:
+                self.process_queue.put(_STOP)
+                self.dispatcher.join()
+            # Waits for the batches being processed, their results are queued for the writer
+            self.process_executor.shutdown()
+            if self.writer is not None:
+                self.write_queue.put(_STOP)
+                self.writer.join()
+        if self.writer_error is not None:
+            raise self.writer_error
+        self._finish()
@@ -0,0 +1,127 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import heapq
+import itertools
+import random
+import threading
+import time
+
+DEFAULT_RETRY_DELAY_SECONDS = 1
+DEFAULT_MAX_RETRY_DELAY_SECONDS = 60
+# Retries allowed per fresh batch, on top of the reserve
+DEFAULT_RETRY_RATIO = 0.2
+DEFAULT_RETRY_RESERVE = 20
+
+
+# Exponential backoff with equal jitter, so that the batches failing together are not retried together
+def get_retry_delay(attempt, retry_delay_seconds=DEFAULT_RETRY_DELAY_SECONDS,
+                    max_retry_delay_seconds=DEFAULT_MAX_RETRY_DELAY_SECONDS):
+    delay = min(max_retry_delay_seconds, retry_delay_seconds * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+# A token bucket shared by all retries. Every fresh batch deposits ratio tokens and every retry takes one,
+# so that an unhealthy endpoint is not flooded with retries.
+class RetryBudget(object):
+    def __init__(self, ratio=DEFAULT_RETRY_RATIO, reserve=DEFAULT_RETRY_RESERVE):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.balance = float(reserve)
+        # A long healthy run doesn't save up for an outage
+        self.max_balance = float(reserve * 10)
+        self.exhausted_count = 0
+        self.lock = threading.Lock()
+
+    def deposit(self):
+        with self.lock:
+            self.balance = min(self.max_balance, self.balance + self.ratio)
+
+    def withdraw(self):
+        with self.lock:
+            if self.balance >= 1:
+                self.balance -= 1
+                return True
+            self.exhausted_count += 1
+            return False
+
+
+# Holds the retries until they are due and then submits them, the workers never sleep on a retry.
+# join() waits until all scheduled retries have run, including those they schedule in turn.
+class DelayedRetryQueue(object):
+    def __init__(self, submit):
+        self.submit = submit
+        self._heap = []
+        self._sequence = itertools.count()
+        self._pending = 0
+        self._closed = False
+        self._thread = None
+        self._condition = threading.Condition()
+
+    def schedule(self, delay_seconds, fn, *args):
+        with self._condition:
+            # After a failure of the executor the job fails anyway
+            if self._closed:
+                return
+            heapq.heappush(self._heap, (time.time() + delay_seconds, next(self._sequence), fn, args))
+            self._pending += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='DelayedRetryQueue', daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    @property
+    def pending(self):
+        with self._condition:
+            return self._pending
+
+    def wait(self, timeout):
+        with self._condition:
+            self._condition.wait(timeout)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and (len(self._heap) == 0 or self._heap[0][0] > time.time()):
+                    self._condition.wait(self._heap[0][0] - time.time() if len(self._heap) > 0 else None)
+                if self._closed:
+                    return
+                _, _, fn, args = heapq.heappop(self._heap)
+            try:
+                self.submit(self._run_retry, fn, *args)
+            except BaseException:
+                # The executor failed, the remaining retries are dropped
+                with self._condition:
+                    self._pending -= len(self._heap) + 1
+                    self._heap.clear()
+                    self._closed = True
+                    self._condition.notify_all()
+                return
+
+    def _run_retry(self, fn, *args):
+        try:
+            fn(*args)
+        finally:
+            with self._condition:
+                self._pending -= 1
+                self._condition.notify_all()
@@ -19,121 +19,299 @@
 import logging
 import os
 import shutil
+import threading
 from time import time
 
+from blockchainetl_common.jobs.exporters.multi_item_exporter import MultiItemExporter
 from solanaetl.jobs.export_blocks_job import ExportBlocksJob
 from solanaetl.jobs.exporters.accounts_item_exporter import \
     accounts_item_exporter
 from solanaetl.jobs.exporters.blocks_and_transactions_item_exporter import \
     blocks_and_transactions_item_exporter
+from solanaetl.jobs.exporters.queue_item_exporter import QueueItemExporter
+from solanaetl.jobs.exporters.routing_item_exporter import RoutingItemExporter
+from solanaetl.jobs.exporters.stoppable_item_exporter import StoppableItemExporter
 from solanaetl.jobs.exporters.tokens_item_exporter import tokens_item_exporter
 from solanaetl.jobs.exporters.token_transfers_item_exporter import \
     token_transfers_item_exporter
 from solanaetl.jobs.extract_accounts_job import ExtractAccountsJob
 from solanaetl.jobs.extract_tokens_job import ExtractTokensJob
 from solanaetl.jobs.extract_token_transfers_job import ExtractTokenTransfersJob
-from solanaetl.providers.auto import get_provider_from_uri
-from solanaetl.thread_local_proxy import ThreadLocalProxy
+from solanaetl.executors.bounded_executor import BoundedExecutor
+from solanaetl.executors.dead_letter_file import DeadLetterFile
+from solanaetl.providers.auto import get_batch_provider_from_uri
+from solanaetl.providers.concurrency import ConcurrencyLimiter
+from solanaetl.services.account_fetcher import DEFAULT_GET_MULTIPLE_ACCOUNTS_BATCH_SIZE
+from solanaetl.services.export_journal import ExportJournal
+from solanaetl.services.skipped_slot_registry import SkippedSlotRegistry
 from solanaetl.utils import get_item_iterable
 
 logger = logging.getLogger('export_all')
 
-
-def export_all_common(partitions, output_dir, provider_uri, max_workers, batch_size):
-    for batch_start_block, batch_end_block, partition_dir in partitions:
-        # # # start # # #
-
-        start_time = time()
-
-        padded_batch_start_block = str(batch_start_block).zfill(8)
-        padded_batch_end_block = str(batch_end_block).zfill(8)
-        block_range = '{padded_batch_start_block}-{padded_batch_end_block}'.format(
-            padded_batch_start_block=padded_batch_start_block,
-            padded_batch_end_block=padded_batch_end_block,
-        )
-        file_name_suffix = '{padded_batch_start_block}_{padded_batch_end_block}'.format(
-            padded_batch_start_block=padded_batch_start_block,
-            padded_batch_end_block=padded_batch_end_block,
-        )
-
-        cache_output_dir = '{output_dir}/.tmp{partition_dir}'.format(
-            output_dir=output_dir,
-            partition_dir=partition_dir,
-        )
-        os.makedirs(os.path.dirname(cache_output_dir), exist_ok=True)
-
-        # # # blocks_and_transactions # # #
-
-        blocks_output_dir = '{output_dir}/blocks{partition_dir}'.format(
-            output_dir=output_dir,
-            partition_dir=partition_dir,
-        )
-        os.makedirs(os.path.dirname(blocks_output_dir), exist_ok=True)
-
-        transactions_output_dir = '{output_dir}/transactions{partition_dir}'.format(
-            output_dir=output_dir,
-            partition_dir=partition_dir,
-        )
-        os.makedirs(os.path.dirname(transactions_output_dir), exist_ok=True)
-
-        instructions_output_dir = '{output_dir}/instructions{partition_dir}'.format(
-            output_dir=output_dir,
-            partition_dir=partition_dir,
-        )
-        os.makedirs(os.path.dirname(transactions_output_dir), exist_ok=True)
-
-        blocks_file = '{blocks_output_dir}/blocks_{file_name_suffix}.csv'.format(
-            blocks_output_dir=blocks_output_dir,
-            file_name_suffix=file_name_suffix,
-        )
-        transactions_file = '{transactions_output_dir}/transactions_{file_name_suffix}.csv'.format(
-            transactions_output_dir=transactions_output_dir,
-            file_name_suffix=file_name_suffix,
-        )
-        instructions_file = '{instructions_output_dir}/instructions_{file_name_suffix}.csv'.format(
-            instructions_output_dir=instructions_output_dir,
-            file_name_suffix=file_name_suffix,
-        )
-        logger.info('Exporting blocks {block_range} to {blocks_file}'.format(
-            block_range=block_range,
-            blocks_file=blocks_file,
-        ))
-        logger.info('Exporting transactions from blocks {block_range} to {transactions_file}'.format(
+# The items waiting for the accounts and tokens jobs of a fused export, the blocks job waits when they fall behind
+FUSED_QUEUE_SIZE = 10000
+
+
+def export_all_common(partitions, output_dir, provider_uri, max_workers, batch_size, use_async=False,
+                      rate_limiter=None, response_cache=None, skipped_slots_dir=None,
+                      parse_processes=None, min_workers=None, dead_letter_file=None, ordered=False,
+                      journal_dir=None, fused=False, partition_workers=1, stop_event=None,
+                      accounts_batch_size=DEFAULT_GET_MULTIPLE_ACCOUNTS_BATCH_SIZE):
+    # Shared by the partitions, so that each chunk of the registry is read once
+    skipped_slot_registry = SkippedSlotRegistry(skipped_slots_dir)
+    # The jobs of the partitions exported at once share max_workers requests in flight
+    concurrency_limiter = ConcurrencyLimiter(max_workers) if partition_workers > 1 else None
+    # And the dead letter file
+    if dead_letter_file is not None:
+        dead_letter_file = DeadLetterFile(dead_letter_file)
+
+    def export(partition):
+        batch_start_block, batch_end_block, partition_dir = partition
+        export_partition(batch_start_block, batch_end_block, partition_dir, output_dir, provider_uri, max_workers,
+                         batch_size, use_async=use_async, rate_limiter=rate_limiter, response_cache=response_cache,
+                         skipped_slot_registry=skipped_slot_registry, parse_processes=parse_processes,
+                         min_workers=min_workers, dead_letter_file=dead_letter_file, ordered=ordered,
+                         journal_dir=journal_dir, fused=fused, concurrency_limiter=concurrency_limiter,
+                         stop_event=stop_event, accounts_batch_size=accounts_batch_size)
+
+    try:
+        if partition_workers > 1:
+            export_partitions_concurrently(partitions, export, partition_workers)
+        else:
+            for partition in partitions:
+                export(partition)
+    finally:
+        if dead_letter_file is not None:
+            dead_letter_file.close()
+
+
+def export_partitions_concurrently(partitions, export, partition_workers):
+    """Exports up to partition_workers partitions at once, so that the stages of a partition which don't request the
+    provider, or request it less, overlap with the blocks of the next ones"""
+    executor = BoundedExecutor(0, partition_workers)
+    futures = []
+    try:
+        for partition in partitions:
+            # Stop scheduling partitions once one failed
+            if any(future.done() and future.exception() is not None for future in futures):
+                break
+            futures.append(executor.submit(export, partition))
+    finally:
+        executor.shutdown(wait=True)
+    for future in futures:
+        future.result()
+
+
+def export_partition(batch_start_block, batch_end_block, partition_dir, output_dir, provider_uri, max_workers,
+                     batch_size, use_async=False, rate_limiter=None, response_cache=None, skipped_slot_registry=None,
+                     parse_processes=None, min_workers=None, dead_letter_file=None, ordered=False, journal_dir=None,
+                     fused=False, concurrency_limiter=None, stop_event=None,
+                     accounts_batch_size=DEFAULT_GET_MULTIPLE_ACCOUNTS_BATCH_SIZE):
+    # # # start # # #
+
+    start_time = time()
+
+    padded_batch_start_block = str(batch_start_block).zfill(8)
+    padded_batch_end_block = str(batch_end_block).zfill(8)
+    block_range = '{padded_batch_start_block}-{padded_batch_end_block}'.format(
+        padded_batch_start_block=padded_batch_start_block,
+        padded_batch_end_block=padded_batch_end_block,
+    )
+    file_name_suffix = '{padded_batch_start_block}_{padded_batch_end_block}'.format(
+        padded_batch_start_block=padded_batch_start_block,
+        padded_batch_end_block=padded_batch_end_block,
+    )
+
+    partition_journal = None
+    blocks_journal_file = None
+    if journal_dir is not None:
+        partition_journal = ExportJournal(
+            os.path.join(journal_dir, 'partition_{}.json'.format(file_name_suffix)),
+            batch_start_block, batch_end_block, [])
+        if partition_journal.load() and partition_journal.finished:
+            logger.info('Skipping blocks {block_range}, exported by a previous run'.format(block_range=block_range))
+            return
+        blocks_journal_file = os.path.join(journal_dir, 'blocks_{}.json'.format(file_name_suffix))
+
+    cache_output_dir = '{output_dir}/.tmp{partition_dir}'.format(
+        output_dir=output_dir,
+        partition_dir=partition_dir,
+    )
+    os.makedirs(os.path.dirname(cache_output_dir), exist_ok=True)
+
+    # # # blocks_and_transactions # # #
+
+    blocks_output_dir = '{output_dir}/blocks{partition_dir}'.format(
+        output_dir=output_dir,
+        partition_dir=partition_dir,
+    )
+    os.makedirs(os.path.dirname(blocks_output_dir), exist_ok=True)
+
+    transactions_output_dir = '{output_dir}/transactions{partition_dir}'.format(
+        output_dir=output_dir,
+        partition_dir=partition_dir,
+    )
+    os.makedirs(os.path.dirname(transactions_output_dir), exist_ok=True)
+
+    instructions_output_dir = '{output_dir}/instructions{partition_dir}'.format(
+        output_dir=output_dir,
+        partition_dir=partition_dir,
+    )
+    os.makedirs(os.path.dirname(transactions_output_dir), exist_ok=True)
+
+    blocks_file = '{blocks_output_dir}/blocks_{file_name_suffix}.csv'.format(
+        blocks_output_dir=blocks_output_dir,
+        file_name_suffix=file_name_suffix,
+    )
+    transactions_file = '{transactions_output_dir}/transactions_{file_name_suffix}.csv'.format(
+        transactions_output_dir=transactions_output_dir,
+        file_name_suffix=file_name_suffix,
+    )
+    instructions_file = '{instructions_output_dir}/instructions_{file_name_suffix}.csv'.format(
+        instructions_output_dir=instructions_output_dir,
+        file_name_suffix=file_name_suffix,
+    )
+    logger.info('Exporting blocks {block_range} to {blocks_file}'.format(
+        block_range=block_range,
+        blocks_file=blocks_file,
+    ))
+    logger.info('Exporting transactions from blocks {block_range} to {transactions_file}'.format(
+        block_range=block_range,
+        transactions_file=transactions_file,
+    ))
+    logger.info('Exporting instructions from blocks {block_range} to {instructions_file}'.format(
+        block_range=block_range,
+        instructions_file=instructions_file,
+    ))
+
+    accounts_output_dir = '{output_dir}/accounts{partition_dir}'.format(
+        output_dir=output_dir,
+        partition_dir=partition_dir
+    )
+    os.makedirs(os.path.dirname(accounts_output_dir), exist_ok=True)
+
+    accounts_file = '{accounts_output_dir}/accounts_{file_name_suffix}.csv'.format(
+        accounts_output_dir=accounts_output_dir,
+        file_name_suffix=file_name_suffix,
+    )
+
+    token_transfers_output_dir = '{output_dir}/token_transfers{partition_dir}'.format(
+        output_dir=output_dir,
+        partition_dir=partition_dir
+    )
+    os.makedirs(os.path.dirname(token_transfers_output_dir), exist_ok=True)
+
+    token_transfers_file = '{token_transfers_output_dir}/token_transfers_{file_name_suffix}.csv'.format(
+        token_transfers_output_dir=token_transfers_output_dir,
+        file_name_suffix=file_name_suffix,
+    )
+
+    tokens_output_dir = '{output_dir}/tokens{partition_dir}'.format(
+        output_dir=output_dir,
+        partition_dir=partition_dir
+    )
+    os.makedirs(os.path.dirname(tokens_output_dir), exist_ok=True)
+
+    tokens_file = '{tokens_output_dir}/tokens_{file_name_suffix}.csv'.format(
+        tokens_output_dir=tokens_output_dir,
+        file_name_suffix=file_name_suffix,
+    )
+
+    if fused:
+        # Token transfers and created accounts are extracted while mapping the blocks, the accounts and tokens
+        # are requested on other threads as they come, instead of reading back the instructions and accounts
+        logger.info('Extracting accounts, token transfers and tokens from blocks {block_range} to {files}'.format(
             block_range=block_range,
-            transactions_file=transactions_file,
-        ))
-        logger.info('Exporting instructions from blocks {block_range} to {instructions_file}'.format(
-            block_range=block_range,
-            instructions_file=instructions_file,
+            files=', '.join([accounts_file, token_transfers_file, tokens_file]),
         ))
+        created_accounts = QueueItemExporter(FUSED_QUEUE_SIZE)
+        accounts = QueueItemExporter(FUSED_QUEUE_SIZE)
+
+        accounts_job = JobThread(ExtractAccountsJob(
+            batch_web3_provider=get_batch_provider_from_uri(
+                provider_uri, use_async=use_async, rate_limiter=rate_limiter,
+                response_cache=response_cache, concurrency_limiter=concurrency_limiter),
+            instructions_iterable=None,
+            created_accounts_iterable=created_accounts,
+            batch_size=accounts_batch_size,
+            max_workers=max_workers,
+            item_exporter=MultiItemExporter([
+                stoppable(accounts_item_exporter(accounts_file), stop_event), accounts]),
+            ordered=ordered), name='ExtractAccountsJob', items=created_accounts)
+
+        tokens_job = JobThread(ExtractTokensJob(
+            batch_web3_provider=get_batch_provider_from_uri(
+                provider_uri, use_async=use_async, rate_limiter=rate_limiter,
+                response_cache=response_cache, concurrency_limiter=concurrency_limiter),
+            accounts_iterable=accounts,
+            batch_size=accounts_batch_size,
+            max_workers=max_workers,
+            item_exporter=stoppable(tokens_item_exporter(tokens_file), stop_event),
+            ordered=ordered), name='ExtractTokensJob', items=accounts)
 
+        # No blocks journal, the blocks resumed from it would miss the accounts of the blocks exported before
         job = ExportBlocksJob(
             start_block=batch_start_block,
             end_block=batch_end_block,
             batch_size=batch_size,
-            batch_web3_provider=ThreadLocalProxy(
-                lambda: get_provider_from_uri(provider_uri, batch=True)),
+            batch_web3_provider=get_batch_provider_from_uri(
+                provider_uri, use_async=use_async, rate_limiter=rate_limiter,
+                response_cache=response_cache, concurrency_limiter=concurrency_limiter),
             max_workers=max_workers,
-            item_exporter=blocks_and_transactions_item_exporter(
-                blocks_file, transactions_file, instructions_file),
+            item_exporter=RoutingItemExporter(
+                stoppable(blocks_and_transactions_item_exporter(
+                    blocks_file, transactions_file, instructions_file), stop_event),
+                {'token_transfer': stoppable(token_transfers_item_exporter(token_transfers_file), stop_event),
+                 'created_account': created_accounts}),
             export_blocks=blocks_file is not None,
             export_transactions=transactions_file is not None,
-            export_instructions=instructions_file is not None)
+            export_instructions=instructions_file is not None,
+            skipped_slot_registry=skipped_slot_registry,
+            max_processes=parse_processes,
+            min_workers=min_workers,
+            dead_letter_file=dead_letter_file,
+            ordered=ordered,
+            export_token_transfers=True,
+            export_created_accounts=True)
+
+        accounts_job.start()
+        tokens_job.start()
+        try:
+            job.run()
+        finally:
+            # Closed by the jobs, unless they failed before
+            created_accounts.close()
+            accounts_job.join()
+            accounts.close()
+            tokens_job.join()
+            # A failed tokens job stops the accounts job, which stops the blocks job. The first error is raised.
+            tokens_job.raise_error()
+            accounts_job.raise_error()
+
+    else:
+        job = ExportBlocksJob(
+            start_block=batch_start_block,
+            end_block=batch_end_block,
+            batch_size=batch_size,
+            batch_web3_provider=get_batch_provider_from_uri(
+                provider_uri, use_async=use_async, rate_limiter=rate_limiter,
+                response_cache=response_cache, concurrency_limiter=concurrency_limiter),
+            max_workers=max_workers,
+            item_exporter=stoppable(blocks_and_transactions_item_exporter(
+                blocks_file, transactions_file, instructions_file), stop_event),
+            export_blocks=blocks_file is not None,
+            export_transactions=transactions_file is not None,
+            export_instructions=instructions_file is not None,
+            skipped_slot_registry=skipped_slot_registry,
+            max_processes=parse_processes,
+            min_workers=min_workers,
+            dead_letter_file=dead_letter_file,
+            ordered=ordered,
+            journal_file=blocks_journal_file)
 
         job.run()
 
         # # # accounts # # #
-        accounts_output_dir = '{output_dir}/accounts{partition_dir}'.format(
-            output_dir=output_dir,
-            partition_dir=partition_dir
-        )
-        os.makedirs(os.path.dirname(accounts_output_dir), exist_ok=True)
-
-        accounts_file = '{accounts_output_dir}/accounts_{file_name_suffix}.csv'.format(
-            accounts_output_dir=accounts_output_dir,
-            file_name_suffix=file_name_suffix,
-        )
-
         logger.info('Extracting accounts from blocks {block_range} to {accounts_file}'.format(
             block_range=block_range,
             accounts_file=accounts_file,
@@ -141,27 +319,18 @@ def export_all_common(partitions, output_dir, provider_uri, max_workers, batch_s
 
         with get_item_iterable(instructions_file) as instructions_reader:
             job = ExtractAccountsJob(
-                batch_web3_provider=ThreadLocalProxy(
-                    lambda: get_provider_from_uri(provider_uri, batch=True)),
+                batch_web3_provider=get_batch_provider_from_uri(
+                    provider_uri, use_async=use_async, rate_limiter=rate_limiter,
+                    response_cache=response_cache, concurrency_limiter=concurrency_limiter),
                 instructions_iterable=instructions_reader,
-                batch_size=batch_size,
+                batch_size=accounts_batch_size,
                 max_workers=max_workers,
-                item_exporter=accounts_item_exporter(accounts_file))
+                item_exporter=stoppable(accounts_item_exporter(accounts_file), stop_event),
+                ordered=ordered)
 
             job.run()
 
         # # # token transfers # # #
-        token_transfers_output_dir = '{output_dir}/token_transfers{partition_dir}'.format(
-            output_dir=output_dir,
-            partition_dir=partition_dir
-        )
-        os.makedirs(os.path.dirname(token_transfers_output_dir), exist_ok=True)
-
-        token_transfers_file = '{token_transfers_output_dir}/token_transfers_{file_name_suffix}.csv'.format(
-            token_transfers_output_dir=token_transfers_output_dir,
-            file_name_suffix=file_name_suffix,
-        )
-
         logger.info('Extracting token transfers from blocks {block_range} to {token_transfers_file}'.format(
             block_range=block_range,
             token_transfers_file=token_transfers_file,
@@ -172,22 +341,12 @@ def export_all_common(partitions, output_dir, provider_uri, max_workers, batch_s
                 instructions_iterable=instructions_reader,
                 batch_size=batch_size,
                 max_workers=max_workers,
-                item_exporter=token_transfers_item_exporter(token_transfers_file))
+                item_exporter=stoppable(token_transfers_item_exporter(token_transfers_file), stop_event),
+                ordered=ordered)
 
             job.run()
 
         # # # tokens # # #
-        tokens_output_dir = '{output_dir}/tokens{partition_dir}'.format(
-            output_dir=output_dir,
-            partition_dir=partition_dir
-        )
-        os.makedirs(os.path.dirname(tokens_output_dir), exist_ok=True)
-
-        tokens_file = '{tokens_output_dir}/tokens_{file_name_suffix}.csv'.format(
-            tokens_output_dir=tokens_output_dir,
-            file_name_suffix=file_name_suffix,
-        )
-
         logger.info('Extracting tokens from blocks {block_range} to {tokens_file}'.format(
             block_range=block_range,
             tokens_file=tokens_file,
@@ -195,20 +354,56 @@ def export_all_common(partitions, output_dir, provider_uri, max_workers, batch_s
 
         with get_item_iterable(accounts_file) as accounts_reader:
             job = ExtractTokensJob(
-                batch_web3_provider=ThreadLocalProxy(
-                    lambda: get_provider_from_uri(provider_uri, batch=True)),
+                batch_web3_provider=get_batch_provider_from_uri(
+                    provider_uri, use_async=use_async, rate_limiter=rate_limiter,
+                    response_cache=response_cache, concurrency_limiter=concurrency_limiter),
                 accounts_iterable=accounts_reader,
-                batch_size=batch_size,
+                batch_size=accounts_batch_size,
                 max_workers=max_workers,
-                item_exporter=tokens_item_exporter(tokens_file))
+                item_exporter=stoppable(tokens_item_exporter(tokens_file), stop_event),
+                ordered=ordered)
 
             job.run()
 
-        # # # finish # # #
-        shutil.rmtree(os.path.dirname(cache_output_dir))
-        end_time = time()
-        time_diff = round(end_time - start_time, 5)
-        logger.info('Exporting blocks {block_range} took {time_diff} seconds'.format(
-            block_range=block_range,
-            time_diff=time_diff,
-        ))
+    # # # finish # # #
+    # Date partitions share the directory, it may be removed by a partition exported at the same time
+    shutil.rmtree(os.path.dirname(cache_output_dir), ignore_errors=True)
+    if partition_journal is not None:
+        partition_journal.finish()
+    end_time = time()
+    time_diff = round(end_time - start_time, 5)
+    logger.info('Exporting blocks {block_range} took {time_diff} seconds'.format(
+        block_range=block_range,
+        time_diff=time_diff,
+    ))
+
+
+def stoppable(item_exporter, stop_event):
+    """Stops the writes of the export once stop_event is set, e.g. by the worker losing the lease of the partition"""
+    if stop_event is None:
+        return item_exporter
+    return StoppableItemExporter(item_exporter, stop_event)
+
+
+class JobThread(threading.Thread):
+    """Runs a job on a thread, its exception is raised by raise_error once joined. If the job fails, the
+    QueueItemExporter it iterates over is cancelled, so that the job exporting to it fails too."""
+
+    def __init__(self, job, name, items=None):
+        super().__init__(name=name, daemon=True)
+        self.job = job
+        self.items = items
+        self.error = None
+
+    def run(self):
+        try:
+            self.job.run()
+        except BaseException as e:
+            logger.exception('{} failed'.format(self.name))
+            self.error = e
+            if self.items is not None:
+                self.items.cancel()
+
+    def raise_error(self):
+        if self.error is not None:
+            raise self.error
@@ -15,23 +15,44 @@
 # THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
 # TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
-import json
+import logging
+import os
+import threading
+import time
+from functools import partial
 from typing import List
 
 from blockchainetl_common.jobs.base_job import BaseJob
 from blockchainetl_common.jobs.exporters.composite_item_exporter import \
     CompositeItemExporter
+from solanaetl import json_codec
 from solanaetl.domain.block import Block
 from solanaetl.domain.transaction import Transaction
+from solanaetl.executors.async_batch_work_executor import \
+    AsyncBatchWorkExecutor
 from solanaetl.executors.batch_work_executor import BatchWorkExecutor
-from solanaetl.json_rpc_requests import generate_get_block_by_number_json_rpc
+from solanaetl.executors.dead_letter_file import DeadLetterFile
+from solanaetl.executors.pipeline_work_executor import PipelineWorkExecutor
+from solanaetl.jobs.exporters.ordered_item_exporter import OrderedItemExporter
+from solanaetl.jobs.exporters.resumable_item_exporter import ResumableItemExporter
+from solanaetl.json_rpc_requests import generate_get_block_by_number_json_rpc, generate_get_blocks_json_rpc
 from solanaetl.mappers.account_mapper import AccountMapper
 from solanaetl.mappers.block_mapper import BlockMapper
 from solanaetl.mappers.instruction_mapper import InstructionMapper
+from solanaetl.mappers.token_transfer_mapper import TokenTransferMapper
 from solanaetl.mappers.transaction_mapper import TransactionMapper
-from solanaetl.providers.batch import BatchProvider
+from solanaetl.misc.partial_batch_error import PartialBatchError
+from solanaetl.providers.batch import AsyncBatchProvider, BatchProvider
+from solanaetl.services.account_extractor import extract_account_pubkey_from_instruction
+from solanaetl.services.export_journal import DEFAULT_SAVE_INTERVAL_SECONDS, ExportJournal, slots_to_intervals
 from solanaetl.services.instruction_parser import InstructionParser
-from solanaetl.utils import rpc_response_batch_to_results, validate_range
+from solanaetl.services.skipped_slot_registry import SkippedSlotRegistry
+from solanaetl.services.token_transfer_extractor import extract_transfer_from_instruction
+from solanaetl.tracing import span, traced_phase
+from solanaetl.utils import rpc_response_batch_to_partial_item_results, rpc_response_to_result, validate_range
+
+# The maximum range of getBlocks
+MAX_GET_BLOCKS_SLOTS = 500000
 
 
 class ExportBlocksJob(BaseJob):
@@ -44,77 +65,346 @@ class ExportBlocksJob(BaseJob):
                  item_exporter: CompositeItemExporter,
                  export_blocks=True,
                  export_transactions=True,
-                 export_instructions=True) -> None:
+                 export_instructions=True,
+                 commitment=None,
+                 skipped_slot_registry: SkippedSlotRegistry = None,
+                 max_processes=None,
+                 min_workers=None,
+                 dead_letter_file=None,
+                 ordered=False,
+                 journal_file=None,
+                 journal_save_interval_seconds=DEFAULT_SAVE_INTERVAL_SECONDS,
+                 export_token_transfers=False,
+                 export_created_accounts=False,
+                 skipped_slot_scan_start_block=None,
+                 skipped_slot_scan_end_block=None) -> None:
         validate_range(start_block, end_block)
         self.start_block = start_block
         self.end_block = end_block
 
         self.batch_web3_provider = batch_web3_provider
+        self.is_async = isinstance(batch_web3_provider, AsyncBatchProvider)
+
+        # 0 uses every core
+        self.max_processes = max_processes if max_processes != 0 else os.cpu_count()
+        if self.max_processes is not None and self.is_async:
+            raise ValueError('The async provider can not be used with parse processes')
 
-        self.batch_work_executor = BatchWorkExecutor(batch_size, max_workers)
+        # The blocks failing after all retries are written to it instead of failing the job. Jobs writing to the same
+        # file share a DeadLetterFile, so that their lines don't interleave
+        if isinstance(dead_letter_file, str):
+            dead_letter_file = DeadLetterFile(dead_letter_file)
+        if self.is_async:
+            self.batch_work_executor = AsyncBatchWorkExecutor(
+                batch_size, max_workers, min_in_flight=min_workers, dead_letter_file=dead_letter_file)
+        elif self.max_processes is not None:
+            self.batch_work_executor = PipelineWorkExecutor(
+                batch_size, max_workers, self.max_processes, min_workers=min_workers,
+                dead_letter_file=dead_letter_file)
+        else:
+            self.batch_work_executor = BatchWorkExecutor(
+                batch_size, max_workers, min_workers=min_workers, dead_letter_file=dead_letter_file)
         self.item_exporter = item_exporter
+        # Exports the items in slot order, created once the slots to export are known
+        self.ordered = ordered
+        self.ordered_item_exporter = None
+
+        # The exported slots and output offsets are saved to the journal, a restarted export resumes from them
+        self.export_journal = None
+        if journal_file is not None:
+            self.item_exporter = ResumableItemExporter(item_exporter)
+            self.export_journal = ExportJournal(
+                journal_file, start_block, end_block, self.item_exporter.get_output_files())
+        self.journal_save_interval_seconds = journal_save_interval_seconds
+        self.journal_lock = threading.Lock()
+        self.journal_saved_time = time.time()
+        self.unsaved_slots = []
+        self.export_finished = False
 
         self.export_blocks = export_blocks
         self.export_transactions = export_transactions
         self.export_instructions = export_instructions
+        # Extracted from the parsed instructions as the blocks are mapped, instead of reading back the instructions.
+        # The created accounts are exported as created_account items, holding the pubkey and the tx_signature.
+        self.export_token_transfers = export_token_transfers
+        self.export_created_accounts = export_created_accounts
+        self.commitment = commitment
+        self.skipped_slot_registry = skipped_slot_registry if skipped_slot_registry is not None \
+            else SkippedSlotRegistry()
+        # The slots are only known between the blocks returned by a scan. Near the tip the scan reaches past the
+        # range, so that the skipped slots at its ends are known too, which nodes answer with retriable errors
+        self.skipped_slot_scan_start_block = min(start_block, skipped_slot_scan_start_block) \
+            if skipped_slot_scan_start_block is not None else start_block
+        self.skipped_slot_scan_end_block = max(end_block, skipped_slot_scan_end_block) \
+            if skipped_slot_scan_end_block is not None else end_block
 
         if not self.export_blocks and not self.export_transactions:
             raise ValueError(
                 'At least one of export_blocks or export_transactions must be True')
 
-        if not self.export_transactions and self.export_instructions:
+        if not self.export_transactions and (
+                self.export_instructions or self.export_token_transfers or self.export_created_accounts):
             raise ValueError(
                 'export_transactions must be True')
 
+        self.blocks_response_mapper = BlocksResponseMapper(
+            export_blocks, export_transactions, export_instructions, export_token_transfers, export_created_accounts)
+
+    def _start(self):
+        if self.export_journal is None or not self.export_journal.load():
+            self.item_exporter.open()
+            return
+        if self.export_journal.finished:
+            logging.info('The journal {} records the export as finished.'.format(self.export_journal.path))
+            return
+        if not self.item_exporter.can_resume(self.export_journal.offsets):
+            logging.warning('The output files are missing or shorter than in the journal, exporting from the start.')
+            self.export_journal.reset()
+            self.item_exporter.open()
+            return
+        logging.info('Resuming from the journal, {} slots already exported.'.format(
+            self.export_journal.get_exported_slot_count()))
+        self.item_exporter.open(self.export_journal.offsets)
+
+    def _export(self):
+        if self.export_journal is not None and self.export_journal.finished:
+            return
+        block_numbers = self._get_block_numbers()
+        if self.ordered:
+            self.ordered_item_exporter = OrderedItemExporter(self.item_exporter, block_numbers)
+        if self.max_processes is not None:
+            self.batch_work_executor.execute(
+                block_numbers,
+                self._fetch_raw_batch,
+                map_blocks_response_in_process(self.export_blocks, self.export_transactions,
+                                               self.export_instructions, self.export_token_transfers,
+                                               self.export_created_accounts),
+                self._export_mapped_blocks,
+                total_items=len(block_numbers)
+            )
+        else:
+            self.batch_work_executor.execute(
+                block_numbers,
+                self._export_batch_async if self.is_async else self._export_batch,
+                total_items=len(block_numbers)
+            )
+        self.export_finished = True
+
+    def _get_block_numbers(self):
+        # Skipped slots would cost a getBlock each, they are found with a few getBlocks range scans instead
+        try:
+            self._scan_skipped_slots()
+        except (OSError, ValueError):
+            logging.exception('Scanning the range for skipped slots failed, requesting every slot.')
+        block_numbers = []
+        skipped_slot_count = 0
+        exported_slot_count = 0
+        for block_number in range(self.start_block, self.end_block + 1):
+            if self.skipped_slot_registry.is_skipped(block_number):
+                skipped_slot_count += 1
+            elif self.export_journal is not None and self.export_journal.is_exported(block_number):
+                exported_slot_count += 1
+            else:
+                block_numbers.append(block_number)
+        if skipped_slot_count > 0:
+            logging.info('Skipping {} skipped slots.'.format(skipped_slot_count))
+        if exported_slot_count > 0:
+            logging.info('Skipping {} slots already exported according to the journal.'.format(exported_slot_count))
+        return block_numbers
+
+    def _scan_skipped_slots(self):
+        intervals = self.skipped_slot_registry.get_unscanned_intervals(self.start_block, self.end_block)
+        if len(intervals) > 0 and intervals[0][0] == self.start_block:
+            intervals[0] = (self.skipped_slot_scan_start_block, intervals[0][1])
+        if len(intervals) > 0 and intervals[-1][1] == self.end_block:
+            intervals[-1] = (intervals[-1][0], self.skipped_slot_scan_end_block)
+        for start_slot, end_slot in intervals:
+            for scan_start_slot in range(start_slot, end_slot + 1, MAX_GET_BLOCKS_SLOTS):
+                scan_end_slot = min(end_slot, scan_start_slot + MAX_GET_BLOCKS_SLOTS - 1)
+                # At the commitment of the exported blocks, a confirmed scan returns the blocks of the confirmed fork
+                request = json_codec.dumps_compact([generate_get_blocks_json_rpc(
+                    scan_start_slot, scan_end_slot, commitment=self.commitment)])
+                if self.is_async:
+                    response = self.batch_work_executor.run_until_complete(
+                        self.batch_web3_provider.make_batch_request_async(request))
+                else:
+                    response = self.batch_web3_provider.make_batch_request(request)
+                blocks = rpc_response_to_result(response[0])
+                self.skipped_slot_registry.record_scan(scan_start_slot, scan_end_slot, blocks or [])
+
+    def _export_batch(self, block_number_batch: List[int]):
+        response = self._fetch_batch(block_number_batch)
+        self._export_blocks_response(block_number_batch, response)
+
+    async def _export_batch_async(self, block_number_batch: List[int]):
+        response = await self.batch_web3_provider.make_batch_request_async(
+            self._get_blocks_request(block_number_batch))
+        self._export_blocks_response(block_number_batch, response)
+
+    def _get_blocks_request(self, block_number_batch: List[int]):
+        with span('build_request'):
+            blocks_rpc = list(generate_get_block_by_number_json_rpc(
+                block_number_batch, self.export_transactions, commitment=self.commitment))
+            return json_codec.dumps_compact(blocks_rpc)
+
+    def _fetch_batch(self, block_number_batch: List[int]):
+        return self.batch_web3_provider.make_batch_request(
+            self._get_blocks_request(block_number_batch))
+
+    def _fetch_raw_batch(self, block_number_batch: List[int]):
+        # Decoded by the processes of PipelineWorkExecutor
+        return self.batch_web3_provider.make_raw_batch_request(
+            self._get_blocks_request(block_number_batch))
+
+    def _export_blocks_response(self, block_number_batch: List[int], response):
+        self._export_mapped_blocks(self.blocks_response_mapper.map(block_number_batch, response))
+
+    def _export_mapped_blocks(self, mapped_blocks):
+        if self.export_journal is None:
+            self._write_mapped_blocks(mapped_blocks)
+            return
+        # The batches are written under the lock, the journal is saved between them
+        with self.journal_lock:
+            try:
+                self._write_mapped_blocks(mapped_blocks)
+            finally:
+                if time.time() - self.journal_saved_time >= self.journal_save_interval_seconds:
+                    self._save_journal()
+
+    def _write_mapped_blocks(self, mapped_blocks):
+        for block_number, items in mapped_blocks:
+            with span('export_items', slot=block_number, items=len(items)):
+                if self.ordered_item_exporter is not None:
+                    self.ordered_item_exporter.export_items(block_number, items)
+                    continue
+                for item in items:
+                    self.item_exporter.export_item(item)
+            if self.export_journal is not None:
+                self.unsaved_slots.append(block_number)
+
+    def _save_journal(self):
+        if self.export_journal is None or self.export_journal.finished:
+            return
+        if self.ordered_item_exporter is not None:
+            # The items are written in slot order, the slots before the next one to write are exported
+            next_block_number = self.ordered_item_exporter.get_next_key()
+            end_block = next_block_number - 1 if next_block_number is not None else self.end_block
+            exported_intervals = [(self.start_block, end_block)] if end_block >= self.start_block else []
+        else:
+            exported_intervals = slots_to_intervals(self.unsaved_slots)
+            self.unsaved_slots = []
+        self.export_journal.save(exported_intervals, self.item_exporter.get_offsets())
+        self.journal_saved_time = time.time()
+
+    def _end(self):
+        # Saved before waiting for the batches in flight, in case the export is killed meanwhile
+        with self.journal_lock:
+            self._save_journal()
+        if self.is_async:
+            self.batch_work_executor.run_until_complete(
+                self.batch_web3_provider.close_async())
+        self.batch_work_executor.shutdown()
+        self.skipped_slot_registry.flush()
+        with self.journal_lock:
+            self._save_journal()
+        if self.ordered_item_exporter is not None:
+            self.ordered_item_exporter.close()
+        else:
+            self.item_exporter.close()
+        if self.export_journal is not None and self.export_finished:
+            self.export_journal.finish()
+
+
+class BlocksResponseMapper(object):
+    def __init__(self, export_blocks=True, export_transactions=True, export_instructions=True,
+                 export_token_transfers=False, export_created_accounts=False):
+        self.export_blocks = export_blocks
+        self.export_transactions = export_transactions
+        self.export_instructions = export_instructions
+        self.export_token_transfers = export_token_transfers
+        self.export_created_accounts = export_created_accounts
+        self.parse_instructions = export_instructions or export_token_transfers or export_created_accounts
+
         self.block_mapper = BlockMapper()
         self.transaction_mapper = TransactionMapper()
         self.instruction_mapper = InstructionMapper()
         self.account_mapper = AccountMapper()
+        self.token_transfer_mapper = TokenTransferMapper()
         self.instruction_parser = InstructionParser()
 
-    def _start(self):
-        self.item_exporter.open()
+        # Timed within the map_block spans when tracing
+        self._block_to_dict = traced_phase('to_dict', self.block_mapper.to_dict)
+        self._transaction_to_dict = traced_phase('to_dict', self.transaction_mapper.to_dict)
+        self._instruction_to_dict = traced_phase('to_dict', self.instruction_mapper.to_dict)
+        self._parse_instruction = traced_phase('InstructionParser.parse', self.instruction_parser.parse)
 
-    def _export(self):
-        self.batch_work_executor.execute(
-            range(self.start_block, self.end_block + 1),
-            self._export_batch,
-            total_items=self.end_block - self.start_block + 1
-        )
+    def map(self, block_number_batch: List[int], response):
+        """Yields the requested slots with their items."""
+        # The blocks which failed are raised after the others are mapped
+        for block_number, result in rpc_response_batch_to_partial_item_results(response, block_number_batch):
+            # Skipped slots have no result
+            if result is None:
+                yield block_number, []
+                continue
+            with span('BlockMapper.from_json_dict', slot=block_number):
+                block = self.block_mapper.from_json_dict(result)
+            with span('map_block', slot=block_number):
+                items = list(self._map_block(block))
+            yield block_number, items
 
-    def _export_batch(self, block_number_batch: List[int]):
-        blocks_rpc = list(generate_get_block_by_number_json_rpc(
-            block_number_batch, self.export_transactions))
-        response = self.batch_web3_provider.make_batch_request(
-            json.dumps(blocks_rpc))
-        results = rpc_response_batch_to_results(response)
-        blocks = [self.block_mapper.from_json_dict(
-            result) for result in results]
-
-        for block in blocks:
-            self._export_block(block)
-
-    def _export_block(self, block: Block):
+    def _map_block(self, block: Block):
         if self.export_blocks:
-            self.item_exporter.export_item(
-                self.block_mapper.to_dict(block))
+            yield self._block_to_dict(block)
 
         # transactions
         if self.export_transactions:
             for transaction in block.transactions:
-                self._export_transaction(transaction)
+                yield from self._map_transaction(transaction)
 
-    def _export_transaction(self, transaction: Transaction):
-        self.item_exporter.export_item(
-            self.transaction_mapper.to_dict(transaction))
+    def _map_transaction(self, transaction: Transaction):
+        yield self._transaction_to_dict(transaction)
 
         # instructions
-        if self.export_instructions:
+        if self.parse_instructions:
             for instruction in transaction.instructions:
-                instruction = self.instruction_parser.parse(instruction)
-                self.item_exporter.export_item(
-                    self.instruction_mapper.to_dict(instruction))
+                instruction = self._parse_instruction(instruction)
+                if self.export_instructions:
+                    yield self._instruction_to_dict(instruction)
+                if self.export_token_transfers:
+                    token_transfer = extract_transfer_from_instruction(instruction)
+                    if token_transfer is not None:
+                        yield self.token_transfer_mapper.to_dict(token_transfer)
+                if self.export_created_accounts:
+                    account = extract_account_pubkey_from_instruction(instruction)
+                    if account.pubkey is not None:
+                        yield {'type': 'created_account', 'pubkey': account.pubkey,
+                               'tx_signature': account.tx_signature}
 
-    def _end(self):
-        self.batch_work_executor.shutdown()
-        self.item_exporter.close()
+
+# One mapper per process of PipelineWorkExecutor, by export flags
+_blocks_response_mappers = {}
+
+
+def map_blocks_response_in_process(export_blocks, export_transactions, export_instructions,
+                                   export_token_transfers=False, export_created_accounts=False):
+    return partial(_map_blocks_response, export_blocks, export_transactions, export_instructions,
+                   export_token_transfers, export_created_accounts)
+
+
+def _map_blocks_response(export_blocks, export_transactions, export_instructions, export_token_transfers,
+                         export_created_accounts, block_number_batch, response_body):
+    key = (export_blocks, export_transactions, export_instructions, export_token_transfers, export_created_accounts)
+    blocks_response_mapper = _blocks_response_mappers.get(key)
+    if blocks_response_mapper is None:
+        blocks_response_mapper = BlocksResponseMapper(*key)
+        _blocks_response_mappers[key] = blocks_response_mapper
+
+    with span('json_decode', response_bytes=len(response_body)):
+        response = json_codec.loads(response_body)
+    mapped_blocks = []
+    try:
+        for mapped_block in blocks_response_mapper.map(block_number_batch, response):
+            mapped_blocks.append(mapped_block)
+    except PartialBatchError as e:
+        return mapped_blocks, e
+    return mapped_blocks, None
@@ -16,19 +16,21 @@
 # TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
-import json
 
 from blockchainetl_common.jobs.base_job import BaseJob
 from blockchainetl_common.jobs.exporters.composite_item_exporter import \
     CompositeItemExporter
+from solanaetl import json_codec
 from solanaetl.domain.transaction import Transaction
+from solanaetl.executors.async_batch_work_executor import \
+    AsyncBatchWorkExecutor
 from solanaetl.executors.batch_work_executor import BatchWorkExecutor
 from solanaetl.json_rpc_requests import generate_get_transaction_json_rpc
 from solanaetl.mappers.instruction_mapper import InstructionMapper
 from solanaetl.mappers.transaction_mapper import TransactionMapper
-from solanaetl.providers.batch import BatchProvider
+from solanaetl.providers.batch import AsyncBatchProvider, BatchProvider
 from solanaetl.services.instruction_parser import InstructionParser
-from solanaetl.utils import rpc_response_batch_to_results
+from solanaetl.utils import rpc_response_batch_to_partial_results
 
 
 class ExportInstructionsJob(BaseJob):
@@ -39,8 +41,12 @@ class ExportInstructionsJob(BaseJob):
                  max_workers) -> None:
         self.item_exporter = item_exporter
         self.transaction_addresses_iterable = transaction_addresses_iterable
-        self.batch_work_executor = BatchWorkExecutor(1, max_workers)
         self.batch_web3_provider = batch_web3_provider
+        self.is_async = isinstance(batch_web3_provider, AsyncBatchProvider)
+        if self.is_async:
+            self.batch_work_executor = AsyncBatchWorkExecutor(1, max_workers)
+        else:
+            self.batch_work_executor = BatchWorkExecutor(1, max_workers)
 
         self.transaction_mapper = TransactionMapper()
         self.instruction_mapper = InstructionMapper()
@@ -51,19 +57,29 @@ class ExportInstructionsJob(BaseJob):
 
     def _export(self):
         self.batch_work_executor.execute(
-            self.transaction_addresses_iterable, self._export_instructions)
+            self.transaction_addresses_iterable,
+            self._export_instructions_async if self.is_async else self._export_instructions)
 
     def _export_instructions(self, transaction_addresses):
+        response = self.batch_web3_provider.make_batch_request(
+            self._get_transactions_request(transaction_addresses))
+        self._export_transactions_response(transaction_addresses, response)
+
+    async def _export_instructions_async(self, transaction_addresses):
+        response = await self.batch_web3_provider.make_batch_request_async(
+            self._get_transactions_request(transaction_addresses))
+        self._export_transactions_response(transaction_addresses, response)
+
+    def _get_transactions_request(self, transaction_addresses):
         transactions_rpc = list(
             generate_get_transaction_json_rpc(transaction_addresses))
-        response = self.batch_web3_provider.make_batch_request(
-            json.dumps(transactions_rpc))
-        results = rpc_response_batch_to_results(response)
-        transactions = [self.transaction_mapper.from_json_dict(
-            result) for result in results]
+        return json_codec.dumps_compact(transactions_rpc)
 
-        for transaction in transactions:
-            self._export_instructions_in_transaction(transaction)
+    def _export_transactions_response(self, transaction_addresses, response):
+        # The transactions which failed are raised after the others are exported
+        for result in rpc_response_batch_to_partial_results(response, transaction_addresses):
+            if result is not None:
+                self._export_instructions_in_transaction(self.transaction_mapper.from_json_dict(result))
 
     def _export_instructions_in_transaction(self, transaction: Transaction):
         for instruction in transaction.instructions:
@@ -73,5 +89,8 @@ class ExportInstructionsJob(BaseJob):
             self.item_exporter.export_item(instruction_dict)
 
     def _end(self):
+        if self.is_async:
+            self.batch_work_executor.run_until_complete(
+                self.batch_web3_provider.close_async())
         self.batch_work_executor.shutdown()
         self.item_exporter.close()
@@ -15,7 +15,7 @@
 # THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
 # TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
-from blockchainetl_common.jobs.exporters.composite_item_exporter import \
+from solanaetl.jobs.exporters.composite_item_exporter import \
     CompositeItemExporter
 from solanaetl.jobs.exporters.instructions_item_exporter import \
     INSTRUCTION_FIELDS_TO_EXPORT
@@ -0,0 +1,34 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import time
+
+from blockchainetl_common.jobs.exporters import composite_item_exporter
+
+from solanaetl.metrics import EXPORT_ITEM_SECONDS, ITEMS_EXPORTED
+
+
+class CompositeItemExporter(composite_item_exporter.CompositeItemExporter):
+    """Reports the exported items and the time spent writing them to the metrics"""
+
+    def export_item(self, item):
+        start_time = time.perf_counter()
+        super().export_item(item)
+        item_type = item.get('type')
+        EXPORT_ITEM_SECONDS.labels(item_type).observe(time.perf_counter() - start_time)
+        ITEMS_EXPORTED.labels(item_type).inc()
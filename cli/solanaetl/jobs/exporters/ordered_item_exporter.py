@@ -0,0 +1,120 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import logging
+import pickle
+import tempfile
+import threading
+
+# The buffered items of the keys after the first missing one, the furthest keys are spilled to disk beyond it
+DEFAULT_MAX_BUFFER_BYTES = 256 * 1024 * 1024
+
+_END = object()
+
+
+class OrderedItemExporter(object):
+    """Exports the items of the keys completing out of order, e.g. the slots of the batches, in the order of the keys.
+
+    The items of a key are exported as soon as the keys before it are, the others wait in a reorder buffer
+    which spills to a temporary file when a straggler holds up the window for more than max_buffer_bytes.
+    """
+    logger = logging.getLogger('OrderedItemExporter')
+
+    def __init__(self, item_exporter, keys, max_buffer_bytes=DEFAULT_MAX_BUFFER_BYTES, spill_dir=None):
+        self.item_exporter = item_exporter
+        self.keys = iter(keys)
+        self.next_key = next(self.keys, _END)
+        self.max_buffer_bytes = max_buffer_bytes
+        self.spill_dir = spill_dir
+
+        self.buffer = {}
+        self.buffer_bytes = 0
+        self.spilled = {}
+        self.spill_file = None
+        self.spilled_bytes = 0
+        self.lock = threading.Lock()
+
+    def open(self):
+        self.item_exporter.open()
+
+    def get_next_key(self):
+        """The first key whose items are not exported yet, None once all are"""
+        return self.next_key if self.next_key is not _END else None
+
+    def export_items(self, key, items):
+        with self.lock:
+            if key != self.next_key:
+                self._buffer(key, items)
+                return
+            self._export(items)
+            self._advance()
+
+    def _buffer(self, key, items):
+        data = pickle.dumps(list(items), pickle.HIGHEST_PROTOCOL)
+        self.buffer[key] = data
+        self.buffer_bytes += len(data)
+        if self.buffer_bytes > self.max_buffer_bytes:
+            self._spill()
+
+    def _spill(self):
+        if self.spill_file is None:
+            self.spill_file = tempfile.TemporaryFile(dir=self.spill_dir)
+        # The furthest keys are exported last, half of the buffer is spilled so that spills stay rare
+        for key in sorted(self.buffer, reverse=True):
+            if self.buffer_bytes <= self.max_buffer_bytes // 2:
+                break
+            data = self.buffer.pop(key)
+            self.spill_file.seek(0, 2)
+            self.spilled[key] = (self.spill_file.tell(), len(data))
+            self.spill_file.write(data)
+            self.buffer_bytes -= len(data)
+            self.spilled_bytes += len(data)
+
+    def _advance(self):
+        self.next_key = next(self.keys, _END)
+        while self.next_key in self.buffer or self.next_key in self.spilled:
+            self._export(self._pop(self.next_key))
+            self.next_key = next(self.keys, _END)
+
+    def _pop(self, key):
+        data = self.buffer.pop(key, None)
+        if data is not None:
+            self.buffer_bytes -= len(data)
+        else:
+            offset, length = self.spilled.pop(key)
+            self.spill_file.seek(offset)
+            data = self.spill_file.read(length)
+        return pickle.loads(data)
+
+    def _export(self, items):
+        for item in items:
+            self.item_exporter.export_item(item)
+
+    def close(self):
+        with self.lock:
+            # The keys which never completed, e.g. dead lettered blocks, no longer hold up the others
+            remaining_keys = sorted(list(self.buffer) + list(self.spilled))
+            if remaining_keys:
+                self.logger.warning('{} keys completed after a missing key {}, exporting them in order.'.format(
+                    len(remaining_keys), self.get_next_key()))
+            for key in remaining_keys:
+                self._export(self._pop(key))
+            if self.spill_file is not None:
+                self.logger.info('The reorder buffer spilled {} bytes to disk.'.format(self.spilled_bytes))
+                self.spill_file.close()
+                self.spill_file = None
+        self.item_exporter.close()
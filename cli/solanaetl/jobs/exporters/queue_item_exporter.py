@@ -0,0 +1,80 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import threading
+from collections import deque
+
+from solanaetl.misc.export_stopped_error import ExportStoppedError
+
+_END = object()
+
+
+class QueueItemExporter(object):
+    """Hands the exported items to a job iterating over the exporter on another thread, e.g. to extract more items
+    from them while they are still being exported. The iteration ends once the exporter is closed. With maxsize the
+    exporting job waits while the queue is full, and fails if the iterating job cancelled it."""
+
+    def __init__(self, maxsize=0):
+        self.maxsize = maxsize
+        self._items = deque()
+        self._cancelled = False
+        lock = threading.Lock()
+        self._not_empty = threading.Condition(lock)
+        self._not_full = threading.Condition(lock)
+
+    def open(self):
+        pass
+
+    def export_items(self, items):
+        for item in items:
+            self.export_item(item)
+
+    def export_item(self, item):
+        if not self._put(item):
+            raise ExportStoppedError('The job iterating over the exported items stopped')
+
+    def close(self):
+        self._put(_END)
+
+    def cancel(self):
+        """Called by the iterating job when it fails, the exports waiting on the queue fail"""
+        with self._not_full:
+            self._cancelled = True
+            self._items.clear()
+            self._not_full.notify_all()
+
+    def _put(self, item):
+        with self._not_full:
+            while not self._cancelled and 0 < self.maxsize <= len(self._items):
+                self._not_full.wait()
+            if self._cancelled:
+                return False
+            self._items.append(item)
+            self._not_empty.notify()
+            return True
+
+    def __iter__(self):
+        while True:
+            with self._not_empty:
+                while len(self._items) == 0:
+                    self._not_empty.wait()
+                item = self._items.popleft()
+                self._not_full.notify()
+            if item is _END:
+                return
+            yield item
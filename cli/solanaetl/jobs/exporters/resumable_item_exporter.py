@@ -0,0 +1,88 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+
+from blockchainetl_common.atomic_counter import AtomicCounter
+from blockchainetl_common.exporters import CsvItemExporter, JsonLinesItemExporter
+from blockchainetl_common.file_utils import get_file_handle
+from blockchainetl_common.jobs.exporters.composite_item_exporter import \
+    CompositeItemExporter
+
+
+class ResumableItemExporter(object):
+    """Opens the output files of a CompositeItemExporter at the given offsets, truncating what was written after them,
+    and returns the offsets the files are flushed up to."""
+
+    def __init__(self, item_exporter: CompositeItemExporter):
+        self.item_exporter = item_exporter
+
+    def get_output_files(self):
+        return [filename for filename in self.item_exporter.filename_mapping.values() if is_file(filename)]
+
+    def can_resume(self, offsets):
+        """Whether the output files still hold what was written up to the offsets"""
+        for filename in self.get_output_files():
+            offset = offsets.get(filename, 0)
+            if offset > 0 and (not os.path.exists(filename) or os.path.getsize(filename) < offset):
+                return False
+        return True
+
+    def open(self, offsets=None):
+        if not offsets:
+            self.item_exporter.open()
+            return
+
+        for item_type, filename in self.item_exporter.filename_mapping.items():
+            offset = offsets.get(filename, 0) if is_file(filename) else 0
+            if offset > 0:
+                with open(filename, 'r+b') as file:
+                    file.truncate(offset)
+                file = get_file_handle(filename, mode='a', binary=True)
+            else:
+                file = get_file_handle(filename, binary=True)
+            fields = self.item_exporter.field_mapping.get(item_type)
+            self.item_exporter.file_mapping[item_type] = file
+            if str(filename).endswith('.json'):
+                exporter = JsonLinesItemExporter(file, fields_to_export=fields)
+            else:
+                # The headers are already written
+                exporter = CsvItemExporter(file, fields_to_export=fields, include_headers_line=offset == 0)
+            self.item_exporter.exporter_mapping[item_type] = exporter
+            self.item_exporter.counter_mapping[item_type] = AtomicCounter()
+
+    def export_item(self, item):
+        self.item_exporter.export_item(item)
+
+    def get_offsets(self):
+        """Flushes the output files to disk, returns their sizes"""
+        offsets = {}
+        for item_type, file in self.item_exporter.file_mapping.items():
+            filename = self.item_exporter.filename_mapping[item_type]
+            if not is_file(filename):
+                continue
+            file.flush()
+            os.fsync(file.fileno())
+            offsets[filename] = file.tell()
+        return offsets
+
+    def close(self):
+        self.item_exporter.close()
+
+
+def is_file(filename):
+    return filename is not None and filename != '-'
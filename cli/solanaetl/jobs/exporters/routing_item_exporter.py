@@ -0,0 +1,43 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+class RoutingItemExporter(object):
+    """Exports the items of the types in item_exporters_by_type to their exporter, the other items to item_exporter"""
+
+    def __init__(self, item_exporter, item_exporters_by_type):
+        self.item_exporter = item_exporter
+        self.item_exporters_by_type = item_exporters_by_type
+
+    def open(self):
+        self.item_exporter.open()
+        for item_exporter in self.item_exporters_by_type.values():
+            item_exporter.open()
+
+    def export_items(self, items):
+        for item in items:
+            self.export_item(item)
+
+    def export_item(self, item):
+        self.item_exporters_by_type.get(item.get('type'), self.item_exporter).export_item(item)
+
+    def close(self):
+        try:
+            self.item_exporter.close()
+        finally:
+            for item_exporter in self.item_exporters_by_type.values():
+                item_exporter.close()
@@ -16,7 +16,7 @@
 # TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
-from blockchainetl_common.jobs.exporters.composite_item_exporter import \
+from solanaetl.jobs.exporters.composite_item_exporter import \
     CompositeItemExporter
 
 TOKEN_TRANFER_FIELDS_TO_EXPORT = [
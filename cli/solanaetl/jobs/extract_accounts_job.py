@@ -16,21 +16,24 @@
 # TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
-import json
-from typing import List
+from itertools import count
+from typing import List, Tuple
 
 from blockchainetl_common.jobs.base_job import BaseJob
 from blockchainetl_common.jobs.exporters.composite_item_exporter import \
     CompositeItemExporter
 from solanaetl.domain.account import Account
+from solanaetl.executors.async_batch_work_executor import \
+    AsyncBatchWorkExecutor
 from solanaetl.executors.batch_work_executor import BatchWorkExecutor
-from solanaetl.json_rpc_requests import generate_get_multiple_accounts_json_rpc
+from solanaetl.jobs.exporters.ordered_item_exporter import OrderedItemExporter
 from solanaetl.mappers.account_mapper import AccountMapper
 from solanaetl.mappers.instruction_mapper import InstructionMapper
-from solanaetl.providers.batch import BatchProvider
+from solanaetl.misc.partial_batch_error import PartialBatchError
+from solanaetl.providers.batch import AsyncBatchProvider, BatchProvider
 from solanaetl.services.account_extractor import \
     extract_account_pubkey_from_instruction
-from solanaetl.utils import rpc_response_batch_to_results
+from solanaetl.services.account_fetcher import AccountFetcher, MAX_GET_MULTIPLE_ACCOUNTS_PUBKEYS
 
 
 class ExtractAccountsJob(BaseJob):
@@ -40,13 +43,30 @@ class ExtractAccountsJob(BaseJob):
             instructions_iterable,
             batch_size,
             max_workers,
-            item_exporter: CompositeItemExporter):
+            item_exporter: CompositeItemExporter,
+            ordered=False,
+            created_accounts_iterable=None):
         self.batch_web3_provider = batch_web3_provider
         self.instructions_iterable = instructions_iterable
-
-        self.batch_work_executor = BatchWorkExecutor(batch_size, max_workers)
-        self.item_exporter = item_exporter
-
+        # The created_account items of ExportBlocksJob, used instead of the instructions.
+        # Consumed as they come, so that the accounts are requested while the blocks are still being exported
+        self.created_accounts_iterable = created_accounts_iterable
+        self.is_async = isinstance(batch_web3_provider, AsyncBatchProvider)
+
+        # batch_size is the number of requests in JSON RPC batches. A getMultipleAccounts request takes up to 100
+        # accounts, the batches of accounts are sized to fill that many requests
+        starting_batch_size = batch_size * MAX_GET_MULTIPLE_ACCOUNTS_PUBKEYS
+        if self.is_async:
+            self.batch_work_executor = AsyncBatchWorkExecutor(
+                starting_batch_size, max_workers)
+        else:
+            self.batch_work_executor = BatchWorkExecutor(
+                starting_batch_size, max_workers)
+        # Exports the accounts in the order of the instructions
+        self.ordered = ordered
+        self.item_exporter = OrderedItemExporter(item_exporter, count()) if ordered else item_exporter
+
+        self.account_fetcher = AccountFetcher(batch_web3_provider)
         self.instruction_mapper = InstructionMapper()
         self.account_mapper = AccountMapper()
 
@@ -54,6 +74,14 @@ class ExtractAccountsJob(BaseJob):
         self.item_exporter.open()
 
     def _export(self):
+        if self.created_accounts_iterable is not None:
+            created_accounts = (self.account_mapper.from_dict(created_account)
+                                for created_account in self.created_accounts_iterable)
+            self.batch_work_executor.execute(
+                enumerate(created_accounts),
+                self._extract_accounts_async if self.is_async else self._extract_accounts)
+            return
+
         # Only extract created account on block
         created_accounts = [extract_account_pubkey_from_instruction(
             self.instruction_mapper.from_dict(instruction)) for instruction in self.instructions_iterable]
@@ -61,33 +89,45 @@ class ExtractAccountsJob(BaseJob):
             account for account in created_accounts if account.pubkey is not None]
 
         self.batch_work_executor.execute(
-            created_accounts, self._extract_accounts)
-
-    def _extract_accounts(self, accounts: List[Account]):
-        account_keys = [account.pubkey for account in accounts]
-        rpc_requests = list(
-            generate_get_multiple_accounts_json_rpc([account_keys]))
-
-        response = self.batch_web3_provider.make_batch_request(
-            json.dumps(rpc_requests))
-        results = rpc_response_batch_to_results(response)
-
-        accounts = [
-            self.account_mapper.from_json_dict(
-                json_dict,
-                pubkey=accounts[idx].pubkey,
-                tx_signature=accounts[idx].tx_signature)
-            for result in results
-            for idx, json_dict in enumerate(result.get('value'))
-        ]
-
-        for account in accounts:
-            self._extract_account(account)
-
-    def _extract_account(self, account: Account):
-        self.item_exporter.export_item(
-            self.account_mapper.to_dict(account))
+            list(enumerate(created_accounts)),
+            self._extract_accounts_async if self.is_async else self._extract_accounts)
+
+    def _extract_accounts(self, indexed_accounts: List[Tuple[int, Account]]):
+        self._export_accounts(self.account_fetcher.fetch(indexed_accounts, get_pubkey=get_account_pubkey))
+
+    async def _extract_accounts_async(self, indexed_accounts: List[Tuple[int, Account]]):
+        self._export_accounts(await self.account_fetcher.fetch_async(indexed_accounts, get_pubkey=get_account_pubkey))
+
+    def _export_accounts(self, indexed_account_values):
+        indexed_accounts = []
+        partial_batch_error = None
+        try:
+            for (index, account), json_dict in indexed_account_values:
+                indexed_accounts.append((index, self.account_mapper.from_json_dict(
+                    json_dict, pubkey=account.pubkey, tx_signature=account.tx_signature)))
+        except PartialBatchError as e:
+            # The accounts of the successful calls are exported, only the failed ones are retried
+            partial_batch_error = e
+
+        for index, account in indexed_accounts:
+            self._export_items(index, [self.account_mapper.to_dict(account)])
+        if partial_batch_error is not None:
+            raise partial_batch_error
+
+    def _export_items(self, index, items):
+        if self.ordered:
+            self.item_exporter.export_items(index, items)
+            return
+        for item in items:
+            self.item_exporter.export_item(item)
 
     def _end(self):
+        if self.is_async:
+            self.batch_work_executor.run_until_complete(
+                self.batch_web3_provider.close_async())
         self.batch_work_executor.shutdown()
         self.item_exporter.close()
+
+
+def get_account_pubkey(indexed_account: Tuple[int, Account]):
+    return indexed_account[1].pubkey
@@ -16,10 +16,13 @@
 # TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
+from itertools import count
+
 from blockchainetl_common.jobs.base_job import BaseJob
 from blockchainetl_common.jobs.exporters.composite_item_exporter import \
     CompositeItemExporter
 from solanaetl.executors.batch_work_executor import BatchWorkExecutor
+from solanaetl.jobs.exporters.ordered_item_exporter import OrderedItemExporter
 from solanaetl.mappers.instruction_mapper import InstructionMapper
 from solanaetl.mappers.token_transfer_mapper import TokenTransferMapper
 from solanaetl.providers.batch import BatchProvider
@@ -33,11 +36,14 @@ class ExtractTokenTransfersJob(BaseJob):
             instructions_iterable,
             batch_size,
             max_workers,
-            item_exporter: CompositeItemExporter):
+            item_exporter: CompositeItemExporter,
+            ordered=False):
         self.instructions_iterable = instructions_iterable
 
         self.batch_work_executor = BatchWorkExecutor(batch_size, max_workers)
-        self.item_exporter = item_exporter
+        # Exports the token transfers in the order of the instructions
+        self.ordered = ordered
+        self.item_exporter = OrderedItemExporter(item_exporter, count()) if ordered else item_exporter
 
         self.instruction_mapper = InstructionMapper()
         self.token_transfer_mapper = TokenTransferMapper()
@@ -47,20 +53,26 @@ class ExtractTokenTransfersJob(BaseJob):
 
     def _export(self):
         self.batch_work_executor.execute(
-            self.instructions_iterable, self._extract_transfers)
+            enumerate(self.instructions_iterable), self._extract_transfers)
 
-    def _extract_transfers(self, instruction_dicts):
-        for instruction_dict in instruction_dicts:
-            self._extract_transfer(instruction_dict)
+    def _extract_transfers(self, indexed_instruction_dicts):
+        for index, instruction_dict in indexed_instruction_dicts:
+            self._extract_transfer(index, instruction_dict)
 
-    def _extract_transfer(self, instruction_dict):
+    def _extract_transfer(self, index, instruction_dict):
         instruction = self.instruction_mapper.from_dict(
             instruction_dict)
         token_transfer = extract_transfer_from_instruction(
             instruction)
-        if token_transfer is not None:
-            self.item_exporter.export_item(
-                self.token_transfer_mapper.to_dict(token_transfer))
+        items = [self.token_transfer_mapper.to_dict(token_transfer)] if token_transfer is not None else []
+        self._export_items(index, items)
+
+    def _export_items(self, index, items):
+        if self.ordered:
+            self.item_exporter.export_items(index, items)
+            return
+        for item in items:
+            self.item_exporter.export_item(item)
 
     def _end(self):
         self.batch_work_executor.shutdown()
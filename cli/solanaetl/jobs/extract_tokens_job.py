@@ -17,8 +17,8 @@
 
 
 import base64
-import json
-from typing import List
+from itertools import count
+from typing import List, Tuple
 
 from blockchainetl_common.jobs.base_job import BaseJob
 from blockchainetl_common.jobs.exporters.composite_item_exporter import \
@@ -26,12 +26,15 @@ from blockchainetl_common.jobs.exporters.composite_item_exporter import \
 from solanaetl.decoder.metaplex.metadata import (get_metadata_account,
                                                  unpack_metadata_account)
 from solanaetl.domain.account import Account
+from solanaetl.executors.async_batch_work_executor import \
+    AsyncBatchWorkExecutor
 from solanaetl.executors.batch_work_executor import BatchWorkExecutor
-from solanaetl.json_rpc_requests import generate_get_multiple_accounts_json_rpc
+from solanaetl.jobs.exporters.ordered_item_exporter import OrderedItemExporter
 from solanaetl.mappers.account_mapper import AccountMapper
 from solanaetl.mappers.token_mapper import TokenMapper
-from solanaetl.providers.batch import BatchProvider
-from solanaetl.utils import rpc_response_batch_to_results
+from solanaetl.misc.partial_batch_error import PartialBatchError
+from solanaetl.providers.batch import AsyncBatchProvider, BatchProvider
+from solanaetl.services.account_fetcher import AccountFetcher, MAX_GET_MULTIPLE_ACCOUNTS_PUBKEYS
 
 
 class ExtractTokensJob(BaseJob):
@@ -41,13 +44,26 @@ class ExtractTokensJob(BaseJob):
             accounts_iterable,
             batch_size,
             max_workers,
-            item_exporter: CompositeItemExporter):
+            item_exporter: CompositeItemExporter,
+            ordered=False):
         self.batch_web3_provider = batch_web3_provider
         self.accounts_iterable = accounts_iterable
-
-        self.batch_work_executor = BatchWorkExecutor(batch_size, max_workers)
-        self.item_exporter = item_exporter
-
+        self.is_async = isinstance(batch_web3_provider, AsyncBatchProvider)
+
+        # batch_size is the number of requests in JSON RPC batches. A getMultipleAccounts request takes up to 100
+        # metadata accounts, the batches of metadata accounts are sized to fill that many requests
+        starting_batch_size = batch_size * MAX_GET_MULTIPLE_ACCOUNTS_PUBKEYS
+        if self.is_async:
+            self.batch_work_executor = AsyncBatchWorkExecutor(
+                starting_batch_size, max_workers)
+        else:
+            self.batch_work_executor = BatchWorkExecutor(
+                starting_batch_size, max_workers)
+        # Exports the tokens in the order of the accounts
+        self.ordered = ordered
+        self.item_exporter = OrderedItemExporter(item_exporter, count()) if ordered else item_exporter
+
+        self.account_fetcher = AccountFetcher(batch_web3_provider, encoding='base64')
         self.account_mapper = AccountMapper()
         self.token_mapper = TokenMapper()
 
@@ -56,44 +72,63 @@ class ExtractTokensJob(BaseJob):
 
     def _export(self):
         # only extract mint nft on block
-        accounts = [
+        # Consumed as they come, the accounts may still be being extracted
+        accounts = (
             self.account_mapper.from_dict(account_dict)
             for account_dict in self.accounts_iterable
             if account_dict.get('token_amount_decimals') is not None and account_dict.get('account_type') == 'mint'
-        ]
+        )
 
         self.batch_work_executor.execute(
-            accounts, self._extract_tokens)
-
-    def _extract_tokens(self, accounts: List[Account]):
-        metadata_accounts = [
-            str(get_metadata_account(account.pubkey))
-            for account in accounts
-        ]
-        rpc_requests = list(
-            generate_get_multiple_accounts_json_rpc([metadata_accounts], encoding='base64'))
-
-        response = self.batch_web3_provider.make_batch_request(
-            json.dumps(rpc_requests))
-        results = rpc_response_batch_to_results(response)
-
-        tokens = []
-
-        for result in results:
-            for idx, value in enumerate(result.get('value')):
+            enumerate(accounts),
+            self._extract_tokens_async if self.is_async else self._extract_tokens)
+
+    def _extract_tokens(self, indexed_accounts: List[Tuple[int, Account]]):
+        self._export_tokens(self.account_fetcher.fetch(indexed_accounts, get_pubkey=get_metadata_account_pubkey))
+
+    async def _extract_tokens_async(self, indexed_accounts: List[Tuple[int, Account]]):
+        self._export_tokens(
+            await self.account_fetcher.fetch_async(indexed_accounts, get_pubkey=get_metadata_account_pubkey))
+
+    def _export_tokens(self, indexed_metadata_values):
+        indexed_tokens = []
+        partial_batch_error = None
+        try:
+            for (index, account), value in indexed_metadata_values:
+                tokens = []
                 if value is not None:
                     data = base64.b64decode(value.get('data')[0])
                     metadata = unpack_metadata_account(data)
                     tokens.append(
                         self.token_mapper.from_metaplex_metadata(
                             metadata,
-                            token_type='nft' if accounts[idx].token_amount_decimals == '0' else 'spl-token',
-                            tx_signature=accounts[idx].tx_signature))
-
-        for token in tokens:
-            self.item_exporter.export_item(
-                self.token_mapper.to_dict(token))
+                            # A string when read from a file, an int when extracted in the same run
+                            token_type='nft' if str(account.token_amount_decimals) == '0' else 'spl-token',
+                            tx_signature=account.tx_signature))
+                indexed_tokens.append((index, tokens))
+        except PartialBatchError as e:
+            # The tokens of the successful calls are exported, only the failed accounts are retried
+            partial_batch_error = e
+
+        for index, tokens in indexed_tokens:
+            self._export_items(index, [self.token_mapper.to_dict(token) for token in tokens])
+        if partial_batch_error is not None:
+            raise partial_batch_error
+
+    def _export_items(self, index, items):
+        if self.ordered:
+            self.item_exporter.export_items(index, items)
+            return
+        for item in items:
+            self.item_exporter.export_item(item)
 
     def _end(self):
+        if self.is_async:
+            self.batch_work_executor.run_until_complete(
+                self.batch_web3_provider.close_async())
         self.batch_work_executor.shutdown()
         self.item_exporter.close()
+
+
+def get_metadata_account_pubkey(indexed_account: Tuple[int, Account]):
+    return str(get_metadata_account(indexed_account[1].pubkey))
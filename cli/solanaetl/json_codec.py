@@ -0,0 +1,76 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Picks the fastest JSON library installed: orjson, then ujson, then the standard library.
+# loads decodes RPC responses and the JSON fields of exported items,
+# dumps_compact encodes RPC requests, its output differs between the libraries.
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+def _loads_orjson(data):
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        # e.g. lone surrogates, which the standard library accepts. Raises if the document is invalid.
+        return json.loads(data)
+
+
+def _loads_ujson(data):
+    if isinstance(data, bytearray):
+        data = bytes(data)
+    try:
+        return ujson.loads(data)
+    except ValueError:
+        return json.loads(data)
+
+
+if orjson is not None:
+    CODEC = 'orjson'
+    loads = _loads_orjson
+
+    def dumps_compact(obj):
+        return orjson.dumps(obj).decode('utf-8')
+elif ujson is not None:
+    CODEC = 'ujson'
+    loads = _loads_ujson
+
+    def dumps_compact(obj):
+        return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False)
+else:
+    CODEC = 'json'
+    loads = json.loads
+
+    def dumps_compact(obj):
+        return json.dumps(obj, separators=(',', ':'), ensure_ascii=False)
+
+
+def dumps(obj):
+    """Encodes the JSON fields of exported items.
+    Always the standard library: neither orjson nor ujson reproduce its separators, ascii escaping
+    and float exponents (1e-07) byte for byte, and the exported files must not depend on what is installed"""
+    return json.dumps(obj)
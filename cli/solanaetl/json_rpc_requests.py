@@ -16,19 +16,41 @@
 # TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
-def generate_get_block_by_number_json_rpc(block_numbers, include_transactions: bool, encoding='jsonParsed'):
+def generate_get_block_by_number_json_rpc(block_numbers, include_transactions: bool, encoding='jsonParsed',
+                                          commitment=None):
     for idx, block_number in enumerate(block_numbers):
+        config = {
+            'encoding': encoding,
+            'transactionDetails': 'full' if include_transactions else 'signatures',
+            'rewards': True
+        }
+        if commitment is not None:
+            config['commitment'] = commitment
         yield generate_json_rpc(
             method='getBlock',
-            params=[block_number, {
-                'encoding': encoding,
-                'transactionDetails': 'full' if include_transactions else 'signatures',
-                'rewards': True
-            }],
+            params=[block_number, config],
             request_id=idx
         )
 
 
+def generate_get_blocks_json_rpc(start_slot, end_slot, commitment=None, request_id=1):
+    params = [start_slot, end_slot]
+    if commitment is not None:
+        params.append({'commitment': commitment})
+    return generate_json_rpc(
+        method='getBlocks',
+        params=params,
+        request_id=request_id,
+    )
+
+
+def generate_get_slot_json_rpc(commitment=None):
+    return generate_json_rpc(
+        method='getSlot',
+        params=[{'commitment': commitment}] if commitment is not None else [],
+    )
+
+
 def generate_get_transaction_json_rpc(tranaction_signatures, encoding='jsonParsed'):
     for idx, tranaction_signature in enumerate(tranaction_signatures):
         yield generate_json_rpc(
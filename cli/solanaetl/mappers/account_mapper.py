@@ -15,9 +15,9 @@
 # THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
 # TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
-import json
 from typing import Dict
 
+from solanaetl import json_codec
 from solanaetl.domain.account import Account
 
 
@@ -59,20 +59,20 @@ class AccountMapper(object):
                             account.token_amount_decimals = token_amount.get(
                                 'decimals')
                     elif account.account_type == 'vote':
-                        account.authorized_voters = json.dumps(
+                        account.authorized_voters = json_codec.dumps(
                             account_info.get('authorizedVoters'))
                         account.authorized_withdrawer = account_info.get(
                             'authorizedWithdrawer')
                         account.commission = account_info.get('commission')
-                        account.epoch_credits = json.dumps(
+                        account.epoch_credits = json_codec.dumps(
                             account_info.get('epochCredits'))
-                        account.last_timestamp = json.dumps(
+                        account.last_timestamp = json_codec.dumps(
                             account_info.get('lastTimestamp'))
                         account.node_pubkey = account_info.get('nodePubkey')
-                        account.prior_voters = json.dumps(
+                        account.prior_voters = json_codec.dumps(
                             account_info.get('priorVoters'))
                         account.root_slot = account_info.get('rootSlot')
-                        account.votes = json.dumps(account_info.get('votes'))
+                        account.votes = json_codec.dumps(account_info.get('votes'))
                     elif account.account_type == 'mint':
                         account.token_amount_decimals = account_info.get(
                             'decimals')
@@ -82,7 +82,7 @@ class AccountMapper(object):
 
         if account.account_type is None:
             # save raw data for unclassified account type
-            account.data = json.dumps(json_dict.get('data'))
+            account.data = json_codec.dumps(json_dict.get('data'))
 
         return account
 
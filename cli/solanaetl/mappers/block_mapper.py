@@ -16,9 +16,9 @@
 # TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
-import json
 from typing import Dict
 
+from solanaetl import json_codec
 from solanaetl.domain.block import Block
 from solanaetl.mappers.transaction_mapper import TransactionMapper
 
@@ -73,7 +73,7 @@ class BlockMapper(object):
             'previous_block_hash': block.previous_block_hash,
             'timestamp': block.timestamp,
             'transaction_count': block.transaction_count,
-            'rewards': json.dumps(block.rewards),
+            'rewards': json_codec.dumps(block.rewards),
             'leader_reward': block.leader_reward,
             'leader': block.leader,
         }
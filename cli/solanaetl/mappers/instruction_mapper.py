@@ -16,9 +16,9 @@
 # TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
-import json
 from typing import Dict
 
+from solanaetl import json_codec
 from solanaetl.domain.instruction import Instruction
 
 
@@ -49,12 +49,12 @@ class InstructionMapper(object):
             'tx_signature': instruction.tx_signature,
             'index': instruction.index,
             'parent_index': instruction.parent_index,
-            'accounts': json.dumps(instruction.accounts),
+            'accounts': json_codec.dumps(instruction.accounts),
             'data': instruction.data,
             'program': instruction.program,
             'program_id': instruction.program_id,
             'instruction_type': instruction.instruction_type,
-            'params': json.dumps(instruction.params),
+            'params': json_codec.dumps(instruction.params),
         }
 
     def from_dict(self, dict: Dict) -> Instruction:
@@ -63,11 +63,11 @@ class InstructionMapper(object):
         instruction.tx_signature = dict.get('tx_signature')
         instruction.index = dict.get('index')
         instruction.parent_index = dict.get('parent_index')
-        instruction.accounts = json.loads(dict.get('accounts'))
+        instruction.accounts = json_codec.loads(dict.get('accounts'))
         instruction.data = dict.get('data')
         instruction.program = dict.get('program')
         instruction.program_id = dict.get('program_id')
         instruction.instruction_type = dict.get('instruction_type')
-        instruction.params = json.loads(dict.get('params'))
+        instruction.params = json_codec.loads(dict.get('params'))
 
         return instruction
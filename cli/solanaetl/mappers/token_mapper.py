@@ -16,9 +16,9 @@
 # TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
-import json
 from typing import Dict
 
+from solanaetl import json_codec
 from solanaetl.domain.token import Token
 
 
@@ -61,7 +61,7 @@ class TokenMapper(object):
             'symbol': token.symbol,
             'uri': token.uri,
             'seller_fee_basis_points': token.seller_fee_basis_points,
-            'creators': json.dumps(token.creators),
+            'creators': json_codec.dumps(token.creators),
             'primary_sale_happened': token.primary_sale_happened,
             'is_mutable': token.is_mutable,
         }
@@ -16,9 +16,9 @@
 # TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
-import json
 from typing import Dict, List
 
+from solanaetl import json_codec
 from solanaetl.domain.instruction import Instruction
 from solanaetl.domain.transaction import BalanceChange, Transaction
 from solanaetl.mappers.account_mapper import AccountMapper
@@ -115,15 +115,15 @@ class TransactionMapper(object):
             'block_timestamp': transaction.block_timestamp,
             'fee': transaction.fee,
             'status': transaction.status,
-            'err': json.dumps(transaction.err),
-            'accounts': json.dumps(transaction.accounts),
-            'log_messages': json.dumps(transaction.log_messages),
-            'balance_changes': json.dumps([
+            'err': json_codec.dumps(transaction.err),
+            'accounts': json_codec.dumps(transaction.accounts),
+            'log_messages': json_codec.dumps(transaction.log_messages),
+            'balance_changes': json_codec.dumps([
                 self.balance_change_to_dict(e)
                 for e in transaction.balance_changes
             ]),
-            'pre_token_balances': json.dumps(transaction.pre_token_balances),
-            'post_token_balances': json.dumps(transaction.post_token_balances),
+            'pre_token_balances': json_codec.dumps(transaction.pre_token_balances),
+            'post_token_balances': json_codec.dumps(transaction.post_token_balances),
         }
 
     def from_dict(self, dict: Dict) -> Transaction:
@@ -136,6 +136,6 @@ class TransactionMapper(object):
         transaction.block_timestamp = dict.get('block_timestamp')
         transaction.fee = dict.get('fee')
         transaction.status = dict.get('status')
-        transaction.accounts = json.loads(dict.get('accounts'))
+        transaction.accounts = json_codec.loads(dict.get('accounts'))
 
         return transaction
@@ -0,0 +1,264 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import atexit
+import bisect
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from solanaetl import json_codec
+
+# Seconds, from a cached response to a slow batch of large blocks
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Writing an item to a file
+WRITE_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.1)
+
+
+class _Value(object):
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+    def get_sample(self):
+        return {'value': self.value}
+
+
+class _HistogramValue(object):
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.bucket_counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def get_sample(self):
+        with self._lock:
+            bucket_counts = list(self.bucket_counts)
+            sample = {'sum': self.sum, 'count': self.count}
+        cumulative_counts = []
+        total = 0
+        for bucket_count in bucket_counts:
+            total += bucket_count
+            cumulative_counts.append(total)
+        sample['buckets'] = dict(zip([str(bucket) for bucket in self.buckets] + ['+Inf'], cumulative_counts))
+        return sample
+
+
+class Metric(object):
+    """A counter, gauge or histogram with a value per combination of label values"""
+
+    def __init__(self, name, documentation, metric_type, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.metric_type = metric_type
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *label_values):
+        value = self._values.get(label_values)
+        if value is None:
+            with self._lock:
+                value = self._values.get(label_values)
+                if value is None:
+                    value = _HistogramValue(self.buckets) if self.metric_type == 'histogram' else _Value()
+                    self._values[label_values] = value
+        return value
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def get_samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [dict(value.get_sample(), labels=dict(zip(self.label_names, label_values)))
+                for label_values, value in values]
+
+
+class MetricsRegistry(object):
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, documentation, label_names=()):
+        return self._add(Metric(name, documentation, 'counter', label_names))
+
+    def gauge(self, name, documentation, label_names=()):
+        return self._add(Metric(name, documentation, 'gauge', label_names))
+
+    def histogram(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Metric(name, documentation, 'histogram', label_names, buckets))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def to_dict(self):
+        return {
+            'time': time.time(),
+            'metrics': {metric.name: {
+                'type': metric.metric_type,
+                'help': metric.documentation,
+                'samples': metric.get_samples(),
+            } for metric in self.metrics},
+        }
+
+    def to_text(self):
+        """The Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.append('# HELP {} {}'.format(metric.name, metric.documentation))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.metric_type))
+            for sample in metric.get_samples():
+                labels = sample['labels']
+                if metric.metric_type != 'histogram':
+                    lines.append(format_sample(metric.name, labels, sample['value']))
+                    continue
+                for bucket, count in sample['buckets'].items():
+                    lines.append(format_sample(metric.name + '_bucket', dict(labels, le=bucket), count))
+                lines.append(format_sample(metric.name + '_sum', labels, sample['sum']))
+                lines.append(format_sample(metric.name + '_count', labels, sample['count']))
+        return '\n'.join(lines) + '\n'
+
+
+def format_sample(name, labels, value):
+    if len(labels) == 0:
+        return '{} {}'.format(name, value)
+    formatted_labels = ','.join('{}="{}"'.format(
+        label, str(label_value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for label, label_value in labels.items())
+    return '{}{{{}}} {}'.format(name, formatted_labels, value)
+
+
+REGISTRY = MetricsRegistry()
+
+ITEMS_EXPORTED = REGISTRY.counter(
+    'solanaetl_items_exported_total', 'Items written to the outputs, by type.', ['type'])
+EXPORT_ITEM_SECONDS = REGISTRY.histogram(
+    'solanaetl_export_item_seconds', 'Time spent writing an item to the outputs, by type.', ['type'], WRITE_BUCKETS)
+RPC_REQUEST_SECONDS = REGISTRY.histogram(
+    'solanaetl_rpc_request_seconds', 'Latency of the RPC requests, by method and endpoint host.',
+    ['method', 'endpoint'])
+RPC_REQUESTS = REGISTRY.counter(
+    'solanaetl_rpc_requests_total', 'RPC requests, by method, endpoint host and HTTP status.',
+    ['method', 'endpoint', 'status'])
+RPC_RECEIVED_BYTES = REGISTRY.counter(
+    'solanaetl_rpc_received_bytes_total', 'Bytes of the RPC responses on the wire, by endpoint host.', ['endpoint'])
+BATCH_SECONDS = REGISTRY.histogram(
+    'solanaetl_batch_seconds', 'Time spent fetching and exporting a successful batch.')
+RETRIED_ITEMS = REGISTRY.counter(
+    'solanaetl_retried_items_total', 'Items of failed batches retried, by exception type.', ['exception'])
+DEAD_LETTERED_ITEMS = REGISTRY.counter(
+    'solanaetl_dead_lettered_items_total', 'Items written to the dead letter file, by exception type.', ['exception'])
+BATCH_SIZE = REGISTRY.gauge(
+    'solanaetl_batch_size', 'The current size of the batches.')
+CONCURRENCY = REGISTRY.gauge(
+    'solanaetl_concurrency', 'The current number of batches in flight.')
+
+_METHOD_PATTERN = re.compile(rb'"method"\s*:\s*"(\w+)"')
+
+
+def observe_rpc_request(endpoint_uri, request_data, status, response_bytes, latency_seconds):
+    """Records a batch request, by the method of its first request"""
+    if isinstance(request_data, str):
+        request_data = request_data[:256].encode('utf-8')
+    method_match = _METHOD_PATTERN.search(request_data[:256])
+    method = method_match.group(1).decode('ascii') if method_match is not None else 'unknown'
+    endpoint = get_endpoint_label(endpoint_uri)
+    RPC_REQUEST_SECONDS.labels(method, endpoint).observe(latency_seconds)
+    RPC_REQUESTS.labels(method, endpoint, str(status)).inc()
+    RPC_RECEIVED_BYTES.labels(endpoint).inc(response_bytes)
+
+
+def get_endpoint_label(endpoint_uri):
+    # The host only, the path and the query of the providers often hold API keys
+    return urlparse(endpoint_uri).hostname or 'unknown'
+
+
+def start_metrics_server(address):
+    """Serves the metrics at /metrics, address being a port or host:port, the host defaulting to localhost"""
+    host, _, port = str(address).rpartition(':')
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = REGISTRY.to_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    http_server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), Handler)
+    http_server.daemon_threads = True
+    threading.Thread(target=http_server.serve_forever, name='MetricsServer', daemon=True).start()
+    logging.info('Serving the metrics on http://{}:{}/metrics'.format(*http_server.server_address[:2]))
+    return http_server
+
+
+def start_metrics_dumps(path, interval_seconds=60):
+    """Writes the metrics as JSON to the file periodically and on exit"""
+    def dump_periodically():
+        while True:
+            time.sleep(interval_seconds)
+            dump_metrics(path)
+
+    threading.Thread(target=dump_periodically, name='MetricsDumps', daemon=True).start()
+    atexit.register(dump_metrics, path)
+
+
+def dump_metrics(path):
+    directory = os.path.dirname(os.path.abspath(path))
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(file_descriptor, 'w') as temporary_file:
+            temporary_file.write(json_codec.dumps(REGISTRY.to_dict()))
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
@@ -0,0 +1,35 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from solanaetl.misc.retriable_value_error import RetriableValueError
+
+
+# Raised once the successful items of a batch are done, only the failed items need to be retried
+class PartialBatchError(RetriableValueError):
+    def __init__(self, failed_items, errors):
+        self.failed_items = failed_items
+        self.errors = errors
+        super().__init__('{} items of the batch failed: {}'.format(
+            len(failed_items), dict(zip(failed_items, self.error_codes))))
+
+    # Returned by the processes of PipelineWorkExecutor
+    def __reduce__(self):
+        return PartialBatchError, (self.failed_items, self.errors)
+
+    @property
+    def error_codes(self):
+        return [error.get('code') if error is not None else None for error in self.errors]
@@ -0,0 +1,151 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+
+DEFAULT_SAMPLE_INTERVAL_SECONDS = 0.005
+
+
+class SamplingProfiler(object):
+    """Samples the stacks of all the threads from a background thread. The samples are wall clock time, so a thread
+    waiting on I/O or a lock shows up in the frames it waits in."""
+
+    def __init__(self, interval_seconds=DEFAULT_SAMPLE_INTERVAL_SECONDS):
+        self.interval_seconds = interval_seconds
+        self.stack_counts = Counter()
+        self.sample_count = 0
+        self._frame_labels = {}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample_periodically, name='SamplingProfiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _sample_periodically(self):
+        sampler_thread_id = threading.get_ident()
+        while not self._stopped.wait(self.interval_seconds):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == sampler_thread_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._get_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(thread_names.get(thread_id, str(thread_id)))
+                self.stack_counts[tuple(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def _get_frame_label(self, code):
+        label = self._frame_labels.get(code)
+        if label is None:
+            label = '{} ({}:{})'.format(
+                getattr(code, 'co_qualname', code.co_name), shorten_path(code.co_filename), code.co_firstlineno)
+            # ; separates the frames of collapsed stacks
+            label = label.replace(';', ':')
+            self._frame_labels[code] = label
+        return label
+
+    def write_collapsed_stacks(self, path):
+        """One line per stack, its frames from the thread name down separated by ; then the number of samples. The
+        input of flamegraph.pl, speedscope and most flame graph viewers."""
+        with open(path, 'w') as file:
+            for stack, count in sorted(self.stack_counts.items()):
+                file.write('{} {}\n'.format(';'.join(stack), count))
+
+    def write_thread_report(self, path, top=30):
+        """The functions most often on top of the stack, i.e. running or waiting, for each thread"""
+        self_counts_by_thread = {}
+        for stack, count in self.stack_counts.items():
+            self_counts_by_thread.setdefault(stack[0], Counter())[stack[-1]] += count
+        with open(path, 'w') as file:
+            file.write('{} samples every {} seconds\n'.format(self.sample_count, self.interval_seconds))
+            for thread_name, self_counts in sorted(self_counts_by_thread.items(),
+                                                   key=lambda item: -sum(item[1].values())):
+                thread_count = sum(self_counts.values())
+                file.write('\n{}: {} samples\n'.format(thread_name, thread_count))
+                for label, count in self_counts.most_common(top):
+                    file.write('{:>8} {:>6.1%}  {}\n'.format(count, count / thread_count, label))
+
+
+class AllocationProfiler(object):
+    """Traces the allocations with tracemalloc and keeps a snapshot taken when the traced memory was the highest,
+    checked every interval_seconds and at the end. tracemalloc doesn't record the allocating thread, the snapshot
+    covers the whole process. Child processes aren't traced."""
+
+    def __init__(self, frame_count, interval_seconds=1):
+        self.frame_count = frame_count
+        self.interval_seconds = interval_seconds
+        self.peak_snapshot = None
+        self.peak_snapshot_bytes = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        tracemalloc.start(self.frame_count)
+        self._thread = threading.Thread(target=self._snapshot_periodically, name='AllocationProfiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self._take_snapshot_if_peak()
+        tracemalloc.stop()
+
+    def _snapshot_periodically(self):
+        while not self._stopped.wait(self.interval_seconds):
+            self._take_snapshot_if_peak()
+
+    def _take_snapshot_if_peak(self):
+        current_bytes, _ = tracemalloc.get_traced_memory()
+        if current_bytes > self.peak_snapshot_bytes:
+            self.peak_snapshot = tracemalloc.take_snapshot()
+            self.peak_snapshot_bytes = current_bytes
+
+    def write_report(self, path, top=30):
+        """The allocation sites holding the most memory at the peak, by traceback, most recent call last"""
+        with open(path, 'w') as file:
+            file.write('Snapshot taken with {:.1f} MB traced, all threads\n'.format(self.peak_snapshot_bytes / 2 ** 20))
+            if self.peak_snapshot is None:
+                return
+            # The stacks of the sampling profiler are left out, filtered here as it takes much longer than a snapshot
+            snapshot = self.peak_snapshot.filter_traces([
+                tracemalloc.Filter(False, __file__, all_frames=True),
+                tracemalloc.Filter(False, tracemalloc.__file__),
+            ])
+            for statistic in snapshot.statistics('traceback')[:top]:
+                file.write('\n{:.1f} KB in {} blocks\n'.format(statistic.size / 1024, statistic.count))
+                for frame in statistic.traceback:
+                    file.write('    {}:{}\n'.format(shorten_path(frame.filename), frame.lineno))
+
+
+def shorten_path(filename):
+    # The longest, most specific path first
+    for path in sorted(sys.path, key=len, reverse=True):
+        if len(path) > 1 and filename.startswith(path + os.sep):
+            return filename[len(path) + 1:]
+    return filename
@@ -0,0 +1,137 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import asyncio
+import logging
+import threading
+import time
+
+import httpx
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.exceptions import HTTPError
+from requests.exceptions import Timeout as RequestsTimeout
+from solanaetl import metrics
+from solanaetl.providers.batch import AsyncBatchProvider
+from solanaetl.providers.json_stream import decode_json_chunks_async
+from solanaetl.providers.response_stats import record_response
+from solanaetl.tracing import span
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# With HTTP/2 all in-flight requests are multiplexed over a handful of connections.
+# Over HTTP/1.1 every in-flight request needs its own connection, the number of which is bounded by the executor.
+DEFAULT_HTTP2_MAX_CONNECTIONS = 4
+
+
+class AsyncBatchHTTPProvider(AsyncBatchProvider):
+    logger = logging.getLogger('AsyncBatchHTTPProvider')
+
+    def __init__(self, endpoint_uri, request_kwargs=None, max_connections=None, rate_limiter=None):
+        self.endpoint_uri = endpoint_uri
+        self.request_kwargs = request_kwargs or {}
+        self.rate_limiter = rate_limiter
+        if max_connections is None and HTTP2_AVAILABLE:
+            max_connections = DEFAULT_HTTP2_MAX_CONNECTIONS
+        self.max_connections = max_connections
+
+        self._client = None
+        self._client_loop = None
+        self._sync_loop = None
+        self._sync_loop_lock = threading.Lock()
+
+    async def make_batch_request_async(self, text):
+        self.logger.debug("Making request HTTP. URI: %s, Request: %s",
+                          self.endpoint_uri, text)
+        client = self._get_client()
+        request_data = text.encode('utf-8')
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async(len(request_data))
+        start_time = time.time()
+        try:
+            with span('http_request', request_bytes=len(request_data)):
+                # The body is decompressed and decoded while it is downloaded
+                async with client.stream(
+                        'POST',
+                        self.endpoint_uri,
+                        content=request_data,
+                        headers={'Content-Type': 'application/json'}) as raw_response:
+                    try:
+                        if raw_response.is_error:
+                            await raw_response.aread()
+                            raw_response.raise_for_status()
+                        with span('json_decode'):
+                            response = await decode_json_chunks_async(raw_response.aiter_bytes())
+                    finally:
+                        record_response(raw_response.num_bytes_downloaded, time.time() - start_time)
+                        metrics.observe_rpc_request(
+                            self.endpoint_uri, request_data, raw_response.status_code,
+                            raw_response.num_bytes_downloaded, time.time() - start_time)
+                        if self.rate_limiter is not None:
+                            self.rate_limiter.observe_response(
+                                raw_response.status_code, raw_response.headers, raw_response.num_bytes_downloaded)
+        # Translated to the exceptions raised by the requests based providers, so the retry logic stays the same
+        except httpx.HTTPStatusError as e:
+            self.logger.error(
+                'Exception occurred while making a post request, response body was: ' + (e.response.text or ''))
+            raise HTTPError(str(e), response=e.response) from e
+        except httpx.TimeoutException as e:
+            raise RequestsTimeout(str(e)) from e
+        except httpx.RequestError as e:
+            raise RequestsConnectionError(str(e)) from e
+
+        self.logger.debug("Getting response HTTP. URI: %s, "
+                          "Request: %s, Response: %s",
+                          self.endpoint_uri, text, response)
+        return response
+
+    def make_batch_request(self, text):
+        # Allows using the provider with the thread based executors
+        future = asyncio.run_coroutine_threadsafe(
+            self.make_batch_request_async(text), self._get_sync_loop())
+        return future.result()
+
+    async def close_async(self):
+        if self._client is not None and self._client_loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client = None
+        self._client_loop = None
+
+    # httpx clients are bound to the event loop they are first used in
+    def _get_client(self):
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                # Requests waiting for a free connection are bounded by the executor, not by a timeout
+                timeout=httpx.Timeout(self.request_kwargs.get('timeout', 10), pool=None))
+            self._client_loop = loop
+        return self._client
+
+    def _get_sync_loop(self):
+        with self._sync_loop_lock:
+            if self._sync_loop is None:
+                self._sync_loop = asyncio.new_event_loop()
+                threading.Thread(target=self._sync_loop.run_forever,
+                                 name='AsyncBatchHTTPProvider', daemon=True).start()
+            return self._sync_loop
@@ -18,19 +18,104 @@
 
 from urllib.parse import urlparse
 
+from solanaetl.providers.async_rpc import AsyncBatchHTTPProvider
+from solanaetl.providers.balanced import AsyncLoadBalancedBatchProvider, LoadBalancedBatchProvider
+from solanaetl.providers.cache import AsyncCachingBatchProvider, CachingBatchProvider
+from solanaetl.providers.concurrency import AsyncConcurrencyLimitedBatchProvider, ConcurrencyLimitedBatchProvider
+from solanaetl.providers.replay import (AsyncReplayBatchProvider, ReplayBatchProvider, get_recordings_dir,
+                                        is_replay_uri)
 from solanaetl.providers.rpc import BatchHTTPProvider
+from solanaetl.thread_local_proxy import ThreadLocalProxy
 from web3 import HTTPProvider
 
 DEFAULT_TIMEOUT = 600
 
+# e.g. async+https://api.mainnet-beta.solana.com
+ASYNC_URI_SCHEME_PREFIX = 'async+'
+
+# e.g. https://rpc1.example.com,https://rpc2.example.com
+PROVIDER_URI_SEPARATOR = ','
+
+
+def get_provider_from_uri(uri_string, timeout=DEFAULT_TIMEOUT, batch=False, use_async=False, rate_limiter=None):
+    if is_async_uri(uri_string):
+        uri_string = uri_string[len(ASYNC_URI_SCHEME_PREFIX):]
+        use_async = True
+
+    if is_replay_uri(uri_string):
+        if not batch:
+            raise ValueError('Replay providers only support batch requests')
+        if use_async:
+            return AsyncReplayBatchProvider(get_recordings_dir(uri_string))
+        return ReplayBatchProvider(get_recordings_dir(uri_string))
 
-def get_provider_from_uri(uri_string, timeout=DEFAULT_TIMEOUT, batch=False):
     uri = urlparse(uri_string)
     if uri.scheme == 'http' or uri.scheme == 'https':
         request_kwargs = {'timeout': timeout}
-        if batch:
-            return BatchHTTPProvider(uri_string, request_kwargs=request_kwargs)
+        if rate_limiter is not None:
+            # Each endpoint has its own quota
+            rate_limiter = rate_limiter.for_key(uri_string)
+        if use_async:
+            if not batch:
+                raise ValueError('Async providers only support batch requests')
+            return AsyncBatchHTTPProvider(uri_string, request_kwargs=request_kwargs, rate_limiter=rate_limiter)
+        elif batch:
+            return BatchHTTPProvider(uri_string, request_kwargs=request_kwargs, rate_limiter=rate_limiter)
         else:
             return HTTPProvider(uri_string, request_kwargs=request_kwargs)
     else:
         raise ValueError('Unknown uri scheme {}'.format(uri_string))
+
+
+def get_batch_provider_from_uri(uri_string, timeout=DEFAULT_TIMEOUT, use_async=False, rate_limiter=None,
+                                response_cache=None, concurrency_limiter=None):
+    """Returns a batch provider which can be shared by all the workers of a job"""
+    endpoint_uris = split_provider_uris(uri_string)
+    use_async = use_async or any(is_async_uri(endpoint_uri) for endpoint_uri in endpoint_uris)
+    if len(endpoint_uris) > 1:
+        provider = get_load_balanced_provider_from_uris(
+            endpoint_uris, timeout=timeout, use_async=use_async, rate_limiter=rate_limiter)
+    elif use_async:
+        # A single async provider serves all the batches in flight on one event loop
+        provider = get_provider_from_uri(
+            endpoint_uris[0], timeout=timeout, batch=True, use_async=True, rate_limiter=rate_limiter)
+    else:
+        # The rate limiter is shared by the thread local providers
+        provider = ThreadLocalProxy(lambda: get_provider_from_uri(
+            endpoint_uris[0], timeout=timeout, batch=True, rate_limiter=rate_limiter))
+
+    if concurrency_limiter is not None:
+        # Inside the cache, the cached responses don't take a slot
+        if use_async:
+            provider = AsyncConcurrencyLimitedBatchProvider(provider, concurrency_limiter)
+        else:
+            provider = ConcurrencyLimitedBatchProvider(provider, concurrency_limiter)
+
+    if response_cache is not None:
+        if use_async:
+            provider = AsyncCachingBatchProvider(provider, response_cache)
+        else:
+            provider = CachingBatchProvider(provider, response_cache)
+    return provider
+
+
+def get_load_balanced_provider_from_uris(endpoint_uris, timeout=DEFAULT_TIMEOUT, use_async=False, rate_limiter=None):
+    use_async = use_async or any(is_async_uri(endpoint_uri) for endpoint_uri in endpoint_uris)
+    # The endpoint providers are thread safe, the balancer itself is shared so that
+    # all the workers see the same endpoint health
+    endpoint_providers = [
+        (endpoint_uri, get_provider_from_uri(
+            endpoint_uri, timeout=timeout, batch=True, use_async=use_async, rate_limiter=rate_limiter))
+        for endpoint_uri in endpoint_uris]
+    if use_async:
+        return AsyncLoadBalancedBatchProvider(endpoint_providers)
+    else:
+        return LoadBalancedBatchProvider(endpoint_providers)
+
+
+def split_provider_uris(uri_string):
+    return [uri.strip() for uri in uri_string.split(PROVIDER_URI_SEPARATOR) if uri.strip() != '']
+
+
+def is_async_uri(uri_string):
+    return uri_string.startswith(ASYNC_URI_SCHEME_PREFIX)
@@ -0,0 +1,238 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import logging
+import random
+import re
+import threading
+import time
+from json.decoder import JSONDecodeError
+
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.exceptions import HTTPError, Timeout as RequestsTimeout
+from solanaetl import json_codec
+from solanaetl.providers.batch import AsyncBatchProvider, BatchProvider
+
+# Errors returned by nodes which are behind the cluster. Other endpoints may already have the data.
+# -32009 is left out on purpose, every node returns it for skipped slots.
+LAG_ERRORS = [
+    -32004,  # Block not available for slot {}
+    -32014,  # Block status not yet available for slot {}
+    -32016,  # Minimum context slot has not been reached
+]
+RAW_LAG_ERROR = re.compile(rb'"code"\s*:\s*(?:' + '|'.join(str(code) for code in LAG_ERRORS).encode() + rb')\b')
+
+FAILOVER_EXCEPTIONS = (ConnectionError, RequestsConnectionError, HTTPError, RequestsTimeout, OSError,
+                       JSONDecodeError)
+
+# Exponentially weighted moving averages
+LATENCY_SMOOTHING = 0.2
+ERROR_RATE_SMOOTHING = 0.1
+ERROR_RATE_PENALTY = 20
+
+# Endpoints without measurements are assumed to be fast, so they get probed early
+DEFAULT_ITEM_LATENCY_SECONDS = 0.01
+
+MIN_DRAIN_SECONDS = 5
+MAX_DRAIN_SECONDS = 5 * 60
+LAG_DRAIN_SECONDS = 10
+
+
+class EndpointHealth(object):
+    def __init__(self, endpoint_uri, provider):
+        self.endpoint_uri = endpoint_uri
+        self.provider = provider
+        self.item_latency = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.drained_until = 0
+
+    def weight(self):
+        item_latency = self.item_latency if self.item_latency is not None else DEFAULT_ITEM_LATENCY_SECONDS
+        return 1.0 / (max(item_latency, 1e-6) * (1 + ERROR_RATE_PENALTY * self.error_rate))
+
+    def is_drained(self, now):
+        return self.drained_until > now
+
+    def record_success(self, latency_seconds, item_count):
+        item_latency = latency_seconds / max(item_count, 1)
+        if self.item_latency is None:
+            self.item_latency = item_latency
+        else:
+            self.item_latency += LATENCY_SMOOTHING * \
+                (item_latency - self.item_latency)
+        self.error_rate -= ERROR_RATE_SMOOTHING * self.error_rate
+        self.consecutive_failures = 0
+
+    def record_failure(self, drain_seconds=None):
+        self.error_rate += ERROR_RATE_SMOOTHING * (1 - self.error_rate)
+        self.consecutive_failures += 1
+        if drain_seconds is None:
+            drain_seconds = min(
+                MIN_DRAIN_SECONDS * 2 ** (self.consecutive_failures - 1), MAX_DRAIN_SECONDS)
+        self.drained_until = max(self.drained_until, time.time() + drain_seconds)
+
+    def __repr__(self):
+        return '{}(item_latency={}, error_rate={:.3f}, drained_until={})'.format(
+            self.endpoint_uri, self.item_latency, self.error_rate, self.drained_until)
+
+
+# Spreads batches over all the endpoints, weighted by their observed latency and error rate.
+# Endpoints failing with 429/5xx, connection errors or lag errors are drained for a while
+# and the batch is retried on another endpoint.
+class LoadBalancedBatchProvider(BatchProvider):
+    logger = logging.getLogger('LoadBalancedBatchProvider')
+
+    def __init__(self, endpoint_providers):
+        """:param endpoint_providers: list of (endpoint_uri, batch_provider) tuples, one provider per endpoint"""
+        if len(endpoint_providers) == 0:
+            raise ValueError('At least one endpoint is required')
+        self.endpoints = [EndpointHealth(endpoint_uri, provider)
+                          for endpoint_uri, provider in endpoint_providers]
+        self._lock = threading.Lock()
+
+    def make_batch_request(self, text):
+        return self._make_request(lambda provider: provider.make_batch_request(text), count_lag_errors, len)
+
+    def make_raw_batch_request(self, text):
+        item_count = len(json_codec.loads(text))
+        return self._make_request(
+            lambda provider: provider.make_raw_batch_request(text), count_raw_lag_errors, lambda _: item_count)
+
+    def _make_request(self, request, count_response_lag_errors, count_response_items):
+        tried = []
+        lagging_response = None
+        while True:
+            endpoint = self._choose_endpoint(exclude=tried)
+            tried.append(endpoint)
+            start_time = time.time()
+            try:
+                response = request(endpoint.provider)
+            except FAILOVER_EXCEPTIONS as e:
+                if not should_fail_over(e):
+                    raise
+                self._record_failure(endpoint, e)
+                if len(tried) >= len(self.endpoints):
+                    raise
+                continue
+
+            response, lagging_response, done = self._handle_response(
+                endpoint, response, time.time() - start_time, lagging_response, tried,
+                count_response_lag_errors, count_response_items)
+            if done:
+                return response
+
+    def _choose_endpoint(self, exclude):
+        now = time.time()
+        with self._lock:
+            candidates = [endpoint for endpoint in self.endpoints if endpoint not in exclude]
+            healthy = [endpoint for endpoint in candidates if not endpoint.is_drained(now)]
+            if len(healthy) == 0:
+                # Everything is drained, go with the endpoint that recovers first
+                return min(candidates, key=lambda endpoint: endpoint.drained_until)
+            return random.choices(healthy, weights=[endpoint.weight() for endpoint in healthy])[0]
+
+    def _handle_response(self, endpoint, response, latency_seconds, lagging_response, tried,
+                         count_response_lag_errors, count_response_items):
+        """Returns the response to keep, the lagging response to fall back to and whether the request is done"""
+        lag_error_count = count_response_lag_errors(response)
+        with self._lock:
+            if lag_error_count == 0:
+                endpoint.record_success(latency_seconds, count_response_items(response))
+            else:
+                self.logger.warning('Endpoint {} is lagging, {} lag errors in the response. Draining it.'.format(
+                    endpoint.endpoint_uri, lag_error_count))
+                endpoint.record_failure(LAG_DRAIN_SECONDS)
+
+        if lag_error_count == 0:
+            return response, None, True
+        if lagging_response is not None and count_response_lag_errors(lagging_response) <= lag_error_count:
+            response = lagging_response
+        if len(tried) >= len(self.endpoints):
+            return response, None, True
+        # Ask another endpoint, it may be further ahead
+        return None, response, False
+
+    def _record_failure(self, endpoint, exception):
+        drain_seconds = get_drain_seconds(exception)
+        with self._lock:
+            endpoint.record_failure(drain_seconds)
+            self.logger.warning('Request to {} failed with {}. Draining it. Endpoints: {}'.format(
+                endpoint.endpoint_uri, repr(exception), self.endpoints))
+
+
+class AsyncLoadBalancedBatchProvider(LoadBalancedBatchProvider, AsyncBatchProvider):
+
+    async def make_batch_request_async(self, text):
+        tried = []
+        lagging_response = None
+        while True:
+            endpoint = self._choose_endpoint(exclude=tried)
+            tried.append(endpoint)
+            start_time = time.time()
+            try:
+                response = await endpoint.provider.make_batch_request_async(text)
+            except FAILOVER_EXCEPTIONS as e:
+                if not should_fail_over(e):
+                    raise
+                self._record_failure(endpoint, e)
+                if len(tried) >= len(self.endpoints):
+                    raise
+                continue
+
+            response, lagging_response, done = self._handle_response(
+                endpoint, response, time.time() - start_time, lagging_response, tried, count_lag_errors, len)
+            if done:
+                return response
+
+    async def close_async(self):
+        for endpoint in self.endpoints:
+            await endpoint.provider.close_async()
+
+
+def count_lag_errors(response):
+    if not isinstance(response, list):
+        return 0
+    return sum(1 for response_item in response
+               if isinstance(response_item.get('error'), dict) and response_item['error'].get('code') in LAG_ERRORS)
+
+
+def should_fail_over(exception):
+    """Client errors other than 429 would fail on every endpoint"""
+    response = getattr(exception, 'response', None)
+    if isinstance(exception, HTTPError) and response is not None:
+        return response.status_code == 429 or response.status_code >= 500
+    return True
+
+
+def get_drain_seconds(exception):
+    """Honors Retry-After on 429 responses, otherwise backs off exponentially"""
+    response = getattr(exception, 'response', None)
+    if response is None or response.status_code != 429:
+        return None
+    retry_after = response.headers.get('Retry-After')
+    if retry_after is not None and retry_after.isdigit():
+        return int(retry_after)
+    return None
+
+
+def count_raw_lag_errors(body):
+    # The body is only decoded when it may hold lag errors
+    if RAW_LAG_ERROR.search(body) is None:
+        return 0
+    return count_lag_errors(json_codec.loads(body))
@@ -18,8 +18,24 @@
 
 from abc import abstractmethod
 
+from solanaetl import json_codec
+
 
 class BatchProvider:
     @abstractmethod
     def make_batch_request(self, text):
         raise NotImplementedError
+
+    def make_raw_batch_request(self, text):
+        """Returns the response body undecoded, e.g. to be decoded in another process.
+        Providers which only have the decoded response encode it again."""
+        return json_codec.dumps_compact(self.make_batch_request(text)).encode('utf-8')
+
+
+class AsyncBatchProvider(BatchProvider):
+    @abstractmethod
+    async def make_batch_request_async(self, text):
+        raise NotImplementedError
+
+    async def close_async(self):
+        pass
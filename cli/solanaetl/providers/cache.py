@@ -0,0 +1,213 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import gzip
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from solanaetl import json_codec
+from solanaetl.providers.batch import AsyncBatchProvider, BatchProvider
+
+# Finalized blocks and transactions never change
+IMMUTABLE_METHODS = ['getBlock', 'getTransaction']
+# Account states do change, they are only reused by re-runs shortly after the first run
+MUTABLE_METHOD_MAX_AGE_SECONDS = {
+    'getMultipleAccounts': 24 * 60 * 60,
+}
+
+DEFAULT_MAX_SIZE_BYTES = 10 * 1024 ** 3
+# Evicts down to this fraction of the max size, so that eviction doesn't run on every write
+EVICTION_TARGET_RATIO = 0.9
+CACHE_FILE_EXTENSION = '.json.gz'
+
+
+# Content addressed cache of RPC results. The results are stored gzipped in a directory per
+# hash prefix, together with the method and params so that the cache can also be replayed.
+# Reads touch the file, the least recently used files are evicted when the cache is over its size.
+class ResponseCache(object):
+    logger = logging.getLogger('ResponseCache')
+
+    def __init__(self, cache_dir, max_size_bytes=DEFAULT_MAX_SIZE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()
+        self._size_bytes = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, method, params, check_age=True):
+        max_age_seconds = get_max_age_seconds(method, params) if check_age else None
+        if max_age_seconds == 0:
+            return None
+        path = self._get_path(method, params)
+        try:
+            with gzip.open(path, 'rb') as cache_file:
+                entry = json_codec.loads(cache_file.read())
+            if max_age_seconds is not None and time.time() - entry.get('fetched_at', 0) > max_age_seconds:
+                return None
+            # Keeps track of the last use for the eviction
+            os.utime(path)
+        except (OSError, EOFError, ValueError):
+            return None
+        return entry.get('result')
+
+    def put(self, method, params, result):
+        if get_max_age_seconds(method, params) == 0 or result is None:
+            return
+        path = self._get_path(method, params)
+        content = gzip.compress(json_codec.dumps_compact(
+            {'method': method, 'params': params, 'result': result, 'fetched_at': time.time()}).encode('utf-8'), compresslevel=5)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Written to a temporary file and renamed, so concurrent readers never see partial files
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(file_descriptor, 'wb') as temporary_file:
+            temporary_file.write(content)
+        # A response fetched again, e.g. an expired account state, replaces the cached one
+        try:
+            replaced_size = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced_size = 0
+        os.replace(temporary_path, path)
+
+        with self._lock:
+            if self._size_bytes is None:
+                self._size_bytes = self._compute_size()
+            else:
+                self._size_bytes += len(content) - replaced_size
+            if self._size_bytes > self.max_size_bytes:
+                self._evict()
+
+    def _get_path(self, method, params):
+        key = hashlib.sha256(json_codec.dumps([method, params]).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key[2:4], key + CACHE_FILE_EXTENSION)
+
+    def _list_files(self):
+        for directory, _, file_names in os.walk(self.cache_dir):
+            for file_name in file_names:
+                if file_name.endswith(CACHE_FILE_EXTENSION):
+                    path = os.path.join(directory, file_name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def _compute_size(self):
+        return sum(size for _, size, _ in self._list_files())
+
+    def _evict(self):
+        # Other processes may share the directory, the size is recomputed from the files
+        files = sorted(self._list_files(), key=lambda file: file[2])
+        size_bytes = sum(size for _, size, _ in files)
+        target_size_bytes = self.max_size_bytes * EVICTION_TARGET_RATIO
+        evicted_count = 0
+        for path, size, _ in files:
+            if size_bytes <= target_size_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size_bytes -= size
+            evicted_count += 1
+        self._size_bytes = size_bytes
+        self.logger.info('Evicted {} responses from the cache, {} bytes left'.format(evicted_count, size_bytes))
+
+
+def get_max_age_seconds(method, params):
+    """Returns None if the result never changes, 0 if it must not be cached"""
+    commitment = get_commitment(params)
+    if commitment is not None and commitment != 'finalized':
+        return 0
+    if method in IMMUTABLE_METHODS:
+        return None
+    return MUTABLE_METHOD_MAX_AGE_SECONDS.get(method, 0)
+
+
+def get_commitment(params):
+    for param in params or []:
+        if isinstance(param, dict) and 'commitment' in param:
+            return param['commitment']
+    return None
+
+
+# Serves the cached results and only sends the missing requests of a batch to the provider.
+class CachingBatchProvider(BatchProvider):
+
+    def __init__(self, batch_provider, response_cache):
+        self.batch_provider = batch_provider
+        self.response_cache = response_cache
+
+    def make_batch_request(self, text):
+        requests, cached_response_items, missing_requests = self._get_cached(text)
+        response = []
+        if len(missing_requests) > 0:
+            response = self.batch_provider.make_batch_request(json_codec.dumps_compact(missing_requests))
+        return self._merge(requests, cached_response_items, response)
+
+    def _get_cached(self, text):
+        requests = json_codec.loads(text)
+        cached_response_items = {}
+        missing_requests = []
+        for request in requests:
+            result = self.response_cache.get(request['method'], request['params'])
+            if result is not None:
+                cached_response_items[request['id']] = {'jsonrpc': '2.0', 'result': result, 'id': request['id']}
+            else:
+                missing_requests.append(request)
+        return requests, cached_response_items, missing_requests
+
+    def _merge(self, requests, cached_response_items, response):
+        if not isinstance(response, list):
+            # An error for the whole batch
+            return response
+        requests_by_id = {request['id']: request for request in requests}
+        response_items = dict(cached_response_items)
+        for response_item in response:
+            request = requests_by_id.get(response_item.get('id'))
+            if request is not None and response_item.get('result') is not None:
+                self.response_cache.put(request['method'], request['params'], response_item['result'])
+            response_items[response_item.get('id')] = response_item
+        if len(cached_response_items) == 0:
+            return response
+        return [response_items[request['id']] for request in requests if request['id'] in response_items]
+
+
+class AsyncCachingBatchProvider(CachingBatchProvider, AsyncBatchProvider):
+
+    async def make_batch_request_async(self, text):
+        requests, cached_response_items, missing_requests = self._get_cached(text)
+        response = []
+        if len(missing_requests) > 0:
+            response = await self.batch_provider.make_batch_request_async(
+                json_codec.dumps_compact(missing_requests))
+        return self._merge(requests, cached_response_items, response)
+
+    async def close_async(self):
+        await self.batch_provider.close_async()
+
+
+def build_response_cache(cache_dir=None, max_size_megabytes=None):
+    if cache_dir is None:
+        return None
+    max_size_bytes = max_size_megabytes * 1024 ** 2 if max_size_megabytes is not None else DEFAULT_MAX_SIZE_BYTES
+    return ResponseCache(cache_dir, max_size_bytes)
@@ -0,0 +1,108 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager
+
+from solanaetl.providers.batch import AsyncBatchProvider, BatchProvider
+
+
+class ConcurrencyLimiter(object):
+    """Caps the requests in flight across the providers sharing it, e.g. the jobs of the partitions exported at once.
+    The threads and event loops waiting for a request are queued in order, a released slot is handed to the first."""
+
+    def __init__(self, max_requests):
+        if max_requests < 1:
+            raise ValueError('max_requests must be greater than 0')
+        self.max_requests = max_requests
+        self._available = max_requests
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self):
+        waiter = self._acquire()
+        if waiter is not None:
+            waiter.result()
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def slot_async(self):
+        waiter = self._acquire()
+        if waiter is not None:
+            try:
+                await asyncio.wrap_future(waiter)
+            except asyncio.CancelledError:
+                # Too late to cancel once the slot was handed over
+                if not waiter.cancel():
+                    self._release()
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _acquire(self):
+        """Returns None if a slot is free, otherwise a future resolved once a released slot is handed over"""
+        with self._lock:
+            if self._available > 0:
+                self._available -= 1
+                return None
+            waiter = Future()
+            self._waiters.append(waiter)
+            return waiter
+
+    def _release(self):
+        with self._lock:
+            while len(self._waiters) > 0:
+                waiter = self._waiters.popleft()
+                # False if the waiter was cancelled
+                if waiter.set_running_or_notify_cancel():
+                    waiter.set_result(None)
+                    return
+            self._available += 1
+
+
+class ConcurrencyLimitedBatchProvider(BatchProvider):
+
+    def __init__(self, batch_provider, concurrency_limiter):
+        self.batch_provider = batch_provider
+        self.concurrency_limiter = concurrency_limiter
+
+    def make_batch_request(self, text):
+        with self.concurrency_limiter.slot():
+            return self.batch_provider.make_batch_request(text)
+
+    def make_raw_batch_request(self, text):
+        with self.concurrency_limiter.slot():
+            return self.batch_provider.make_raw_batch_request(text)
+
+
+class AsyncConcurrencyLimitedBatchProvider(ConcurrencyLimitedBatchProvider, AsyncBatchProvider):
+
+    async def make_batch_request_async(self, text):
+        async with self.concurrency_limiter.slot_async():
+            return await self.batch_provider.make_batch_request_async(text)
+
+    async def close_async(self):
+        await self.batch_provider.close_async()
@@ -0,0 +1,96 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import re
+
+from solanaetl import json_codec
+
+# Solana nodes write the id last: {"jsonrpc":"2.0","result":...,"id":0}
+ITEM_END = re.compile(rb'"id"\s*:\s*(?:-?\d+|null|"[^"\\]*")\s*}')
+MAX_ITEM_END_LENGTH = 64
+WHITESPACE = re.compile(rb'[ \t\r\n]*')
+WHITESPACE_AND_SEPARATORS = re.compile(rb'[ \t\r\n,]*')
+
+
+# Decodes a batch response one item at a time while the body is being downloaded,
+# so the whole body is never held in memory, only the item being received.
+# Responses which aren't batches, or whose items don't end with the id, are decoded at the end.
+class BatchResponseDecoder(object):
+
+    def __init__(self, loads=json_codec.loads):
+        self.loads = loads
+        self.items = []
+        self._buffer = bytearray()
+        self._is_batch = None
+        # The buffer is scanned from these offsets rather than stripped, which would copy it on every chunk
+        self._item_start = 0
+        self._search_position = 0
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        if self._is_batch is None:
+            start = WHITESPACE.match(self._buffer).end()
+            if start == len(self._buffer):
+                return
+            self._is_batch = self._buffer[start] == ord('[')
+            if self._is_batch:
+                del self._buffer[:start + 1]
+        if self._is_batch:
+            self._decode_items()
+
+    def close(self):
+        if not self._is_batch:
+            return self.loads(self._buffer)
+        remaining = self._buffer[WHITESPACE_AND_SEPARATORS.match(self._buffer, self._item_start).end():]
+        if remaining.rstrip() != b']':
+            self.items.extend(self.loads(b'[' + remaining))
+        return self.items
+
+    def _decode_items(self):
+        while True:
+            start = WHITESPACE_AND_SEPARATORS.match(self._buffer, self._item_start).end()
+            self._item_start = start
+            match = ITEM_END.search(self._buffer, max(start, self._search_position))
+            if match is None:
+                self._search_position = max(start, len(self._buffer) - MAX_ITEM_END_LENGTH)
+                return
+            try:
+                item = self.loads(self._buffer[start:match.end()])
+            except ValueError:
+                # The end of a nested object with an id field
+                self._search_position = match.end()
+                continue
+            self.items.append(item)
+            # Deleting the head of a bytearray doesn't move the rest
+            del self._buffer[:match.end()]
+            self._item_start = 0
+            self._search_position = 0
+
+
+def decode_json_chunks(chunks, loads=json_codec.loads):
+    decoder = BatchResponseDecoder(loads)
+    for chunk in chunks:
+        decoder.feed(chunk)
+    return decoder.close()
+
+
+async def decode_json_chunks_async(chunks, loads=json_codec.loads):
+    decoder = BatchResponseDecoder(loads)
+    async for chunk in chunks:
+        decoder.feed(chunk)
+    return decoder.close()
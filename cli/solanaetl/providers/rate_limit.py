@@ -0,0 +1,232 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+DEFAULT_KEY = 'default'
+
+# Used when a 429 response doesn't say how long to back off
+DEFAULT_RATE_LIMITED_SECONDS = 1
+MAX_BLOCKED_SECONDS = 5 * 60
+
+RETRY_AFTER_HEADERS = ['Retry-After']
+RESET_HEADERS = ['RateLimit-Reset', 'X-RateLimit-Reset', 'X-Rate-Limit-Reset']
+REMAINING_HEADERS = ['RateLimit-Remaining', 'X-RateLimit-Remaining', 'X-Rate-Limit-Remaining']
+
+
+class InMemoryTokenStore(object):
+    """Shares the buckets between the threads of a process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states = {}
+
+    @contextmanager
+    def transaction(self, key):
+        with self._lock:
+            yield self._states.setdefault(key, {})
+
+
+class FileTokenStore(object):
+    """Shares the buckets between the processes on a machine, e.g. parallel Airflow tasks on one worker"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+    @contextmanager
+    def transaction(self, key):
+        with self._lock, open(self.path, 'a+') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                file.seek(0)
+                content = file.read()
+                states = json.loads(content) if content else {}
+                state = states.setdefault(key, {})
+                yield state
+                file.seek(0)
+                file.truncate()
+                json.dump(states, file)
+                file.flush()
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+
+# Token buckets for requests and payload bytes per second. Request bytes are taken before sending,
+# response bytes are debited afterwards, so a burst of large responses delays the following requests.
+# 429 responses and exhausted quota headers block all the requests until the provider resets the quota.
+class RateLimiter(object):
+    logger = logging.getLogger('RateLimiter')
+
+    def __init__(self, requests_per_second=None, bytes_per_second=None, store=None, key=DEFAULT_KEY):
+        self.requests_per_second = requests_per_second
+        self.bytes_per_second = bytes_per_second
+        self.store = store if store is not None else InMemoryTokenStore()
+        self.key = key
+
+    def for_key(self, key):
+        """Returns a limiter with the same limits and store, e.g. one per endpoint"""
+        return RateLimiter(self.requests_per_second, self.bytes_per_second, self.store, key)
+
+    def acquire(self, byte_count=0):
+        while True:
+            wait_seconds = self._try_acquire(byte_count)
+            if wait_seconds <= 0:
+                return
+            time.sleep(wait_seconds)
+
+    async def acquire_async(self, byte_count=0):
+        while True:
+            wait_seconds = self._try_acquire(byte_count)
+            if wait_seconds <= 0:
+                return
+            await asyncio.sleep(wait_seconds)
+
+    def observe_response(self, status_code, headers, byte_count=0):
+        now = time.time()
+        blocked_seconds = get_rate_limited_seconds(status_code, headers, now)
+        with self.store.transaction(self.key) as state:
+            if self.bytes_per_second is not None and byte_count > 0:
+                self._refill(state, 'bytes', self.bytes_per_second, now)
+                state['bytes'] -= byte_count
+            if blocked_seconds is not None:
+                blocked_until = now + min(blocked_seconds, MAX_BLOCKED_SECONDS)
+                if blocked_until > state.get('blocked_until', 0):
+                    self.logger.warning('Rate limited by the provider, pausing requests for {:.1f} seconds'.format(
+                        blocked_until - now))
+                    state['blocked_until'] = blocked_until
+
+    def _try_acquire(self, byte_count):
+        """Takes the tokens and returns 0 or returns the number of seconds to wait before trying again"""
+        now = time.time()
+        with self.store.transaction(self.key) as state:
+            blocked_until = state.get('blocked_until', 0)
+            if blocked_until > now:
+                return blocked_until - now
+
+            wait_seconds = 0
+            if self.requests_per_second is not None:
+                self._refill(state, 'requests', self.requests_per_second, now)
+                wait_seconds = max(wait_seconds, get_wait_seconds(
+                    state['requests'], 1, self.requests_per_second))
+            if self.bytes_per_second is not None:
+                self._refill(state, 'bytes', self.bytes_per_second, now)
+                wait_seconds = max(wait_seconds, get_wait_seconds(
+                    state['bytes'], byte_count, self.bytes_per_second))
+            if wait_seconds > 0:
+                return wait_seconds
+
+            if self.requests_per_second is not None:
+                state['requests'] -= 1
+            if self.bytes_per_second is not None:
+                state['bytes'] -= byte_count
+            return 0
+
+    @staticmethod
+    def _refill(state, name, rate, now):
+        # Allows bursts of up to one second worth of tokens
+        capacity = max(rate, 1)
+        updated_at = state.get(name + '_updated_at', now)
+        tokens = state.get(name, capacity)
+        state[name] = min(capacity, tokens + (now - updated_at) * rate)
+        state[name + '_updated_at'] = now
+
+
+def get_wait_seconds(tokens, cost, rate):
+    # Costs larger than the bucket go through once the bucket is full
+    capacity = max(rate, 1)
+    required = min(cost, capacity)
+    if tokens >= required:
+        return 0
+    return (required - tokens) / rate
+
+
+def get_rate_limited_seconds(status_code, headers, now=None):
+    """Returns how long the provider asks to back off or None if the requests can go on"""
+    if headers is None:
+        return None
+    now = now if now is not None else time.time()
+
+    if status_code == 429 or status_code == 503:
+        retry_after = parse_retry_after(get_header(headers, RETRY_AFTER_HEADERS), now)
+        if retry_after is not None:
+            return retry_after
+
+    reset = parse_reset(get_header(headers, RESET_HEADERS), now)
+    if status_code == 429:
+        return reset if reset is not None else DEFAULT_RATE_LIMITED_SECONDS
+
+    remaining = get_header(headers, REMAINING_HEADERS)
+    if remaining is not None and remaining.strip() == '0' and reset is not None:
+        return reset
+    return None
+
+
+def get_header(headers, names):
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            return value
+    return None
+
+
+def parse_retry_after(value, now):
+    """Retry-After is either a number of seconds or an HTTP date"""
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - now, 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_reset(value, now):
+    """Reset headers hold either the seconds until the reset or a unix timestamp in seconds or milliseconds"""
+    if value is None:
+        return None
+    try:
+        reset = float(value)
+    except ValueError:
+        return None
+    if reset > 1e12:
+        reset = reset / 1000 - now
+    elif reset > 1e9:
+        reset = reset - now
+    return max(reset, 0)
+
+
+def build_rate_limiter(requests_per_second=None, bytes_per_second=None, store_file=None):
+    if requests_per_second is None and bytes_per_second is None:
+        return None
+    store = FileTokenStore(store_file) if store_file is not None else InMemoryTokenStore()
+    return RateLimiter(requests_per_second, bytes_per_second, store)
@@ -0,0 +1,64 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import os
+
+from solanaetl import json_codec
+from solanaetl.providers.batch import AsyncBatchProvider, BatchProvider
+from solanaetl.providers.cache import ResponseCache
+
+# Not retriable, replaying the same recordings again won't help
+NOT_RECORDED_ERROR_CODE = -32602
+
+# e.g. replay:///data/solanaetl/cache
+REPLAY_URI_SCHEME_PREFIX = 'replay://'
+
+
+# Serves the responses recorded with --rpc-cache-dir, without any network.
+class ReplayBatchProvider(BatchProvider):
+
+    def __init__(self, recordings_dir):
+        self.recordings_dir = recordings_dir
+        self.response_cache = ResponseCache(recordings_dir)
+
+    def make_batch_request(self, text):
+        return [self._replay(request) for request in json_codec.loads(text)]
+
+    def _replay(self, request):
+        # Recordings are replayed whatever their age
+        result = self.response_cache.get(request['method'], request['params'], check_age=False)
+        if result is None:
+            return {'jsonrpc': '2.0', 'id': request['id'], 'error': {
+                'code': NOT_RECORDED_ERROR_CODE,
+                'message': 'No recorded response for {} {} in {}'.format(
+                    request['method'], request['params'], self.recordings_dir)}}
+        return {'jsonrpc': '2.0', 'result': result, 'id': request['id']}
+
+
+class AsyncReplayBatchProvider(ReplayBatchProvider, AsyncBatchProvider):
+
+    async def make_batch_request_async(self, text):
+        return self.make_batch_request(text)
+
+
+def is_replay_uri(uri_string):
+    return uri_string.startswith(REPLAY_URI_SCHEME_PREFIX)
+
+
+def get_recordings_dir(uri_string):
+    return os.path.expanduser(uri_string[len(REPLAY_URI_SCHEME_PREFIX):])
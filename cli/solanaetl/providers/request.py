@@ -17,10 +17,15 @@
 
 
 import logging
+import time
 
 import lru
 import requests
 from requests.adapters import HTTPAdapter
+from solanaetl import metrics
+from solanaetl.providers.json_stream import decode_json_chunks
+from solanaetl.providers.response_stats import record_response
+from solanaetl.tracing import span
 from web3._utils.caching import generate_cache_key
 
 
@@ -33,6 +38,9 @@ _session_cache = lru.LRU(8, callback=_remove_session)
 
 MAX_POOL_SIZE = 40
 
+# Responses are decompressed and decoded in chunks of this size
+CHUNK_SIZE = 64 * 1024
+
 
 def _get_session(*args, **kwargs) -> requests.Session:
     cache_key = generate_cache_key((args, kwargs))
@@ -44,10 +52,19 @@ def _get_session(*args, **kwargs) -> requests.Session:
     return _session_cache[cache_key]
 
 
-def make_post_request(endpoint_uri, data, *args, **kwargs):
+def make_post_request(endpoint_uri, data, *args, rate_limiter=None, **kwargs):
     kwargs.setdefault('timeout', 10)
     session = _get_session(endpoint_uri)
-    response = session.post(endpoint_uri, data=data, *args, **kwargs)
+    if rate_limiter is not None:
+        rate_limiter.acquire(len(data))
+    start_time = time.time()
+    with span('http_request', request_bytes=len(data)):
+        response = session.post(endpoint_uri, data=data, *args, **kwargs)
+    record_response(len(response.content), time.time() - start_time)
+    metrics.observe_rpc_request(
+        endpoint_uri, data, response.status_code, len(response.content), time.time() - start_time)
+    if rate_limiter is not None:
+        rate_limiter.observe_response(response.status_code, response.headers, len(response.content))
     try:
         response.raise_for_status()
     except Exception as e:
@@ -56,3 +73,33 @@ def make_post_request(endpoint_uri, data, *args, **kwargs):
         raise e
 
     return response.content
+
+
+def make_streaming_post_request(endpoint_uri, data, *args, rate_limiter=None, **kwargs):
+    """Returns the decoded JSON response. The body is decompressed and decoded while it is downloaded.
+    Any content encoding supported by urllib3 is negotiated, e.g. br and zstd when brotli and zstandard are installed"""
+    kwargs.setdefault('timeout', 10)
+    session = _get_session(endpoint_uri)
+    if rate_limiter is not None:
+        rate_limiter.acquire(len(data))
+    start_time = time.time()
+    # Returns once the headers are received
+    with span('http_wait', request_bytes=len(data)):
+        response = session.post(endpoint_uri, data=data, *args, stream=True, **kwargs)
+    with response:
+        try:
+            response.raise_for_status()
+            # Includes downloading the body
+            with span('json_decode'):
+                return decode_json_chunks(response.iter_content(CHUNK_SIZE))
+        except requests.HTTPError as e:
+            logging.error(
+                'Exception occurred while making a post request, response body was: ' + (response.text or ''))
+            raise e
+        finally:
+            # The number of bytes on the wire, before decompression
+            record_response(response.raw.tell(), time.time() - start_time)
+            metrics.observe_rpc_request(
+                endpoint_uri, data, response.status_code, response.raw.tell(), time.time() - start_time)
+            if rate_limiter is not None:
+                rate_limiter.observe_response(response.status_code, response.headers, response.raw.tell())
@@ -0,0 +1,46 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from contextvars import ContextVar
+
+_response_stats = ContextVar('response_stats', default=None)
+
+
+# The responses received by the requests made in a context, i.e. by a work handler call on a thread or asyncio task
+class ResponseStats(object):
+    def __init__(self):
+        self.response_count = 0
+        self.response_bytes = 0
+        self.latency_seconds = 0.0
+
+    def record(self, response_bytes, latency_seconds):
+        self.response_count += 1
+        self.response_bytes += response_bytes
+        self.latency_seconds += latency_seconds
+
+
+def start_response_stats():
+    response_stats = ResponseStats()
+    _response_stats.set(response_stats)
+    return response_stats
+
+
+def record_response(response_bytes, latency_seconds):
+    response_stats = _response_stats.get()
+    if response_stats is not None:
+        response_stats.record(response_bytes, latency_seconds)
@@ -19,23 +19,35 @@
 # Mostly copied from web3.py/providers/rpc.py. Supports batch requests.
 # Will be removed once batch feature is added to web3.py https://github.com/ethereum/web3.py/issues/832
 from solanaetl.providers.batch import BatchProvider
-from solanaetl.providers.request import make_post_request
+from solanaetl.providers.request import make_post_request, make_streaming_post_request
 from web3 import HTTPProvider
 
 
 class BatchHTTPProvider(HTTPProvider, BatchProvider):
 
+    def __init__(self, endpoint_uri=None, request_kwargs=None, rate_limiter=None):
+        super().__init__(endpoint_uri, request_kwargs)
+        self.rate_limiter = rate_limiter
+
     def make_batch_request(self, text):
         self.logger.debug("Making request HTTP. URI: %s, Request: %s",
                           self.endpoint_uri, text)
         request_data = text.encode('utf-8')
-        raw_response = make_post_request(
+        response = make_streaming_post_request(
             self.endpoint_uri,
             request_data,
+            rate_limiter=self.rate_limiter,
             **self.get_request_kwargs()
         )
-        response = self.decode_rpc_response(raw_response)
         self.logger.debug("Getting response HTTP. URI: %s, "
                           "Request: %s, Response: %s",
                           self.endpoint_uri, text, response)
         return response
+
+    def make_raw_batch_request(self, text):
+        return make_post_request(
+            self.endpoint_uri,
+            text.encode('utf-8'),
+            rate_limiter=self.rate_limiter,
+            **self.get_request_kwargs()
+        )
@@ -0,0 +1,90 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from solanaetl import json_codec
+from solanaetl.json_rpc_requests import generate_get_multiple_accounts_json_rpc
+from solanaetl.misc.partial_batch_error import PartialBatchError
+from solanaetl.misc.retriable_value_error import RetriableValueError
+from solanaetl.utils import chunk, rpc_response_batch_to_partial_item_results
+
+# The maximum number of pubkeys of getMultipleAccounts
+MAX_GET_MULTIPLE_ACCOUNTS_PUBKEYS = 100
+# The getMultipleAccounts calls in a JSON RPC batch by default, a jsonParsed call of 100 accounts is a heavy request
+DEFAULT_GET_MULTIPLE_ACCOUNTS_BATCH_SIZE = 1
+
+
+# Requests the accounts of a batch of items with getMultipleAccounts. The pubkeys are deduplicated and split in calls
+# of up to 100 pubkeys, all sent in a single JSON RPC batch, and the results are matched to the calls by id.
+class AccountFetcher(object):
+
+    def __init__(self, batch_web3_provider, encoding='jsonParsed',
+                 max_pubkeys_per_call=MAX_GET_MULTIPLE_ACCOUNTS_PUBKEYS):
+        self.batch_web3_provider = batch_web3_provider
+        self.encoding = encoding
+        self.max_pubkeys_per_call = max_pubkeys_per_call
+
+    def fetch(self, items, get_pubkey=None):
+        """Yields the items with the values of their accounts, None for the missing accounts, in the order of the items.
+        The items of the failed calls are raised in a PartialBatchError after all the other items are yielded."""
+        pubkeys, pubkey_chunks = self._get_pubkey_chunks(items, get_pubkey)
+        response = []
+        if len(pubkey_chunks) > 0:
+            response = self.batch_web3_provider.make_batch_request(self._get_request(pubkey_chunks))
+        return self._map_response(items, pubkeys, pubkey_chunks, response)
+
+    async def fetch_async(self, items, get_pubkey=None):
+        pubkeys, pubkey_chunks = self._get_pubkey_chunks(items, get_pubkey)
+        response = []
+        if len(pubkey_chunks) > 0:
+            response = await self.batch_web3_provider.make_batch_request_async(self._get_request(pubkey_chunks))
+        return self._map_response(items, pubkeys, pubkey_chunks, response)
+
+    def _get_pubkey_chunks(self, items, get_pubkey):
+        pubkeys = [get_pubkey(item) if get_pubkey is not None else item for item in items]
+        unique_pubkeys = list(dict.fromkeys(pubkeys))
+        # Tuples, the failed chunks are raised in a PartialBatchError keyed by them
+        return pubkeys, [tuple(pubkey_chunk) for pubkey_chunk in chunk(unique_pubkeys, self.max_pubkeys_per_call)]
+
+    def _get_request(self, pubkey_chunks):
+        rpc_requests = list(generate_get_multiple_accounts_json_rpc(pubkey_chunks, encoding=self.encoding))
+        return json_codec.dumps_compact(rpc_requests)
+
+    def _map_response(self, items, pubkeys, pubkey_chunks, response):
+        values = {}
+        errors = {}
+        try:
+            for pubkey_chunk, result in rpc_response_batch_to_partial_item_results(response, pubkey_chunks):
+                chunk_values = result.get('value')
+                if chunk_values is None or len(chunk_values) != len(pubkey_chunk):
+                    raise RetriableValueError('getMultipleAccounts returned {} values for {} pubkeys'.format(
+                        len(chunk_values) if chunk_values is not None else None, len(pubkey_chunk)))
+                values.update(zip(pubkey_chunk, chunk_values))
+        except PartialBatchError as e:
+            for pubkey_chunk, error in zip(e.failed_items, e.errors):
+                errors.update((pubkey, error) for pubkey in pubkey_chunk)
+
+        failed_items = []
+        failed_errors = []
+        for item, pubkey in zip(items, pubkeys):
+            if pubkey in values:
+                yield item, values[pubkey]
+            else:
+                failed_items.append(item)
+                failed_errors.append(errors.get(pubkey))
+
+        if len(failed_items) > 0:
+            raise PartialBatchError(failed_items, failed_errors)
@@ -0,0 +1,125 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import bisect
+import logging
+import os
+import signal
+import sys
+import tempfile
+import threading
+
+from solanaetl import json_codec
+from solanaetl.services.skipped_slot_registry import merge_intervals
+
+DEFAULT_SAVE_INTERVAL_SECONDS = 30
+
+
+# The exported slots of a range and the sizes of the output files holding them. A restarted export truncates the
+# outputs to the recorded sizes, dropping the items written after the last save, and skips the exported slots.
+class ExportJournal(object):
+    logger = logging.getLogger('ExportJournal')
+
+    def __init__(self, path, start_block, end_block, output_files):
+        self.path = path
+        self.start_block = start_block
+        self.end_block = end_block
+        self.output_files = sorted(output_files)
+
+        self.exported_intervals = []
+        self.offsets = {}
+        self.finished = False
+
+    def load(self):
+        """Loads the journal of a previous run of the same export, returns whether there is one"""
+        try:
+            with open(self.path, 'r') as journal_file:
+                content = json_codec.loads(journal_file.read())
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError):
+            self.logger.warning('Ignoring the unreadable journal {}'.format(self.path))
+            return False
+
+        if (content.get('start_block'), content.get('end_block'), sorted(content.get('offsets', {}))) != \
+                (self.start_block, self.end_block, self.output_files):
+            self.logger.warning('Ignoring the journal {} of another export'.format(self.path))
+            return False
+
+        self.exported_intervals = [tuple(interval) for interval in content.get('exported', [])]
+        self.offsets = content['offsets']
+        self.finished = content.get('finished', False)
+        return True
+
+    def is_exported(self, slot):
+        index = bisect.bisect_right(self.exported_intervals, (slot, float('inf'))) - 1
+        return index >= 0 and self.exported_intervals[index][1] >= slot
+
+    def get_exported_slot_count(self):
+        return sum(end - start + 1 for start, end in self.exported_intervals)
+
+    def save(self, exported_intervals, offsets, finished=False):
+        """Adds the exported intervals, the output files holding them being flushed up to the offsets"""
+        self.exported_intervals = merge_intervals(self.exported_intervals + list(exported_intervals))
+        self.offsets = dict(offsets)
+        self.finished = finished
+
+        content = json_codec.dumps_compact({
+            'start_block': self.start_block,
+            'end_block': self.end_block,
+            'exported': [list(interval) for interval in self.exported_intervals],
+            'offsets': self.offsets,
+            'finished': self.finished,
+        })
+        # Written to a temporary file and renamed, a run killed while saving keeps the previous journal
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'w') as temporary_file:
+                temporary_file.write(content)
+                temporary_file.flush()
+                os.fsync(temporary_file.fileno())
+            os.replace(temporary_path, self.path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+    def finish(self):
+        self.save([(self.start_block, self.end_block)], self.offsets, finished=True)
+
+    def reset(self):
+        self.exported_intervals = []
+        self.offsets = {}
+        self.finished = False
+
+
+def slots_to_intervals(slots):
+    return merge_intervals((slot, slot) for slot in slots)
+
+
+def exit_on_sigterm():
+    """Raises SystemExit on SIGTERM so that the job saves its journal while ending. The handlers installed by the
+    caller, e.g. Airflow's raising in the task, are kept. The exit status is the shell's 128 + SIGTERM, a terminated
+    export must not look like a finished one to the supervisor."""
+    if threading.current_thread() is threading.main_thread() and \
+            signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+        signal.signal(signal.SIGTERM, _raise_system_exit)
+
+
+def _raise_system_exit(signum, frame):
+    sys.exit(128 + signum)
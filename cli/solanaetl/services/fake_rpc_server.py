@@ -0,0 +1,368 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# A local JSON RPC server serving recorded or synthetic Solana responses, with configurable latency,
+# injected faults and batch limits. Used to benchmark and tune the executors and providers offline.
+import hashlib
+import logging
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import base58
+from solanaetl import json_codec
+from solanaetl.providers.cache import ResponseCache
+
+SLOT_DURATION_SECONDS = 0.4
+# Around the slot of the test fixtures
+DEFAULT_FIRST_SLOT = 138802069
+GENESIS_TIMESTAMP = 1584368940
+
+SYSTEM_PROGRAM_ID = '11111111111111111111111111111111'
+TOKEN_PROGRAM_ID = 'TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA'
+VOTE_PROGRAM_ID = 'Vote111111111111111111111111111111111111111'
+
+METHOD_NOT_FOUND_ERROR = {'code': -32601, 'message': 'Method not found'}
+NOT_RECORDED_ERROR = {'code': -32004, 'message': 'Block not available for slot'}
+SKIPPED_SLOT_ERROR_MESSAGE = 'Slot {} was skipped, or missing in long-term storage'
+
+
+def parse_latency_distribution(spec):
+    """Returns a function returning latencies in seconds. The spec is in milliseconds, e.g. constant:50,
+    uniform:20,200, normal:100,30, lognormal:80,0.5 (median and sigma), exponential:100 (mean)"""
+    name, _, args = spec.partition(':')
+    values = [float(value) for value in args.split(',')] if args else []
+    if name == 'constant':
+        latency = lambda: values[0]  # noqa: E731
+    elif name == 'uniform':
+        latency = lambda: random.uniform(values[0], values[1])  # noqa: E731
+    elif name == 'normal':
+        latency = lambda: random.normalvariate(values[0], values[1])  # noqa: E731
+    elif name == 'lognormal':
+        latency = lambda: values[0] * random.lognormvariate(0, values[1])  # noqa: E731
+    elif name == 'exponential':
+        latency = lambda: random.expovariate(1 / values[0])  # noqa: E731
+    else:
+        raise ValueError('Unknown latency distribution {}'.format(spec))
+    return lambda: max(latency(), 0) / 1000
+
+
+def fake_hash(*parts):
+    return base58.b58encode(hashlib.sha256(repr(parts).encode('utf-8')).digest()).decode('utf-8')
+
+
+def fraction(*parts):
+    """A deterministic number in [0, 1), e.g. so that skipped slots stay skipped"""
+    return int.from_bytes(hashlib.sha256(repr(parts).encode('utf-8')).digest()[:8], 'big') / 2 ** 64
+
+
+# Deterministic responses which go through the mappers of every job
+class SyntheticResponses(object):
+
+    def __init__(self, transactions_per_block=20, skipped_slot_rate=0.0, first_slot=DEFAULT_FIRST_SLOT,
+                 skipped_slot_error_code=-32009):
+        self.transactions_per_block = transactions_per_block
+        self.skipped_slot_rate = skipped_slot_rate
+        # -32009 for the slots in long-term storage, nodes answer -32007 for the recent ones
+        self.skipped_slot_error_code = skipped_slot_error_code
+        self.first_slot = first_slot
+        self.start_time = time.time()
+
+    def get_response_item(self, method, params):
+        if method == 'getBlock':
+            slot = params[0]
+            if self.is_skipped(slot):
+                return {'error': {'code': self.skipped_slot_error_code,
+                                  'message': SKIPPED_SLOT_ERROR_MESSAGE.format(slot)}}
+            config = params[1] if len(params) > 1 else {}
+            return {'result': self.block(slot, config.get('transactionDetails', 'full'))}
+        elif method == 'getBlocks':
+            end_slot = params[1] if len(params) > 1 and isinstance(params[1], int) else self.latest_slot()
+            return {'result': [slot for slot in range(params[0], end_slot + 1) if not self.is_skipped(slot)]}
+        elif method == 'getBlocksWithLimit':
+            slots = []
+            slot = params[0]
+            while len(slots) < params[1] and slot <= self.latest_slot():
+                if not self.is_skipped(slot):
+                    slots.append(slot)
+                slot += 1
+            return {'result': slots}
+        elif method == 'getBlockTime':
+            if self.is_skipped(params[0]):
+                return {'error': {'code': -32009, 'message': SKIPPED_SLOT_ERROR_MESSAGE.format(params[0])}}
+            return {'result': self.block_time(params[0])}
+        elif method == 'getFirstAvailableBlock':
+            return {'result': 0}
+        elif method == 'getTransaction':
+            slot, index = self.find_transaction(params[0])
+            return {'result': self.transaction(slot, index, with_slot=True)}
+        elif method == 'getMultipleAccounts':
+            config = params[1] if len(params) > 1 else {}
+            return {'result': {
+                'context': {'slot': self.latest_slot()},
+                'value': [self.account(pubkey) if config.get('encoding') == 'jsonParsed' else None
+                          for pubkey in params[0]]}}
+        elif method == 'getSlot' or method == 'getBlockHeight':
+            return {'result': self.latest_slot()}
+        return {'error': METHOD_NOT_FOUND_ERROR}
+
+    def latest_slot(self):
+        # The chain moves on while the server runs
+        return self.first_slot + int((time.time() - self.start_time) / SLOT_DURATION_SECONDS)
+
+    def is_skipped(self, slot):
+        return fraction('skipped', slot) < self.skipped_slot_rate
+
+    def block_time(self, slot):
+        return GENESIS_TIMESTAMP + int(slot * SLOT_DURATION_SECONDS)
+
+    def block(self, slot, transaction_details):
+        leader = fake_hash('leader', slot % 100)
+        block = {
+            'blockHeight': slot - self.first_slot // 20,
+            'blockTime': self.block_time(slot),
+            'blockhash': fake_hash('block', slot),
+            'parentSlot': slot - 1,
+            'previousBlockhash': fake_hash('block', slot - 1),
+            'rewards': [{
+                'commission': None,
+                'lamports': 5000 * self.transactions_per_block,
+                'postBalance': 1000000000 + slot,
+                'pubkey': leader,
+                'rewardType': 'Fee',
+            }],
+        }
+        if transaction_details == 'full':
+            block['transactions'] = [self.transaction(slot, index) for index in range(self.transactions_per_block)]
+        elif transaction_details == 'signatures':
+            block['signatures'] = [fake_hash('signature', slot, index) for index in range(self.transactions_per_block)]
+        return block
+
+    def transaction(self, slot, index, with_slot=False):
+        signature = fake_hash('signature', slot, index)
+        payer = fake_hash('payer', index)
+        new_account = fake_hash('account', slot, index)
+        recipient = fake_hash('recipient', slot, index)
+        lamports = 1000 + index
+        transaction = {
+            'meta': {
+                'err': None,
+                'fee': 5000,
+                'innerInstructions': [],
+                'logMessages': [
+                    'Program {} invoke [1]'.format(SYSTEM_PROGRAM_ID),
+                    'Program {} success'.format(SYSTEM_PROGRAM_ID),
+                ],
+                'postBalances': [1000000000 - 5000 - 1461600 - lamports, 1461600, lamports, 1],
+                'postTokenBalances': [],
+                'preBalances': [1000000000, 0, 0, 1],
+                'preTokenBalances': [],
+                'rewards': [],
+                'status': {'Ok': None},
+            },
+            'transaction': {
+                'message': {
+                    'accountKeys': [
+                        {'pubkey': payer, 'signer': True, 'source': 'transaction', 'writable': True},
+                        {'pubkey': new_account, 'signer': True, 'source': 'transaction', 'writable': True},
+                        {'pubkey': recipient, 'signer': False, 'source': 'transaction', 'writable': True},
+                        {'pubkey': SYSTEM_PROGRAM_ID, 'signer': False, 'source': 'transaction', 'writable': False},
+                    ],
+                    'instructions': [
+                        {
+                            'parsed': {'info': {'lamports': 1461600, 'newAccount': new_account, 'owner': TOKEN_PROGRAM_ID,
+                                                'source': payer, 'space': 82}, 'type': 'createAccount'},
+                            'program': 'system',
+                            'programId': SYSTEM_PROGRAM_ID,
+                        },
+                        {
+                            'parsed': {'info': {'destination': recipient, 'lamports': lamports, 'source': payer},
+                                       'type': 'transfer'},
+                            'program': 'system',
+                            'programId': SYSTEM_PROGRAM_ID,
+                        },
+                    ],
+                    'recentBlockhash': fake_hash('block', slot - 2),
+                },
+                'signatures': [signature, fake_hash('signature', slot, index, 'new_account')],
+            },
+            'version': 'legacy',
+        }
+        if with_slot:
+            transaction['slot'] = slot
+            transaction['blockTime'] = self.block_time(slot)
+        return transaction
+
+    def find_transaction(self, signature):
+        # Signatures are hashes, transactions requested by signature are generated for an arbitrary slot
+        return self.first_slot, int(fraction('index', signature) * max(self.transactions_per_block, 1))
+
+    def account(self, pubkey):
+        return {
+            'data': {
+                'parsed': {
+                    'info': {
+                        'decimals': int(fraction('decimals', pubkey) * 10),
+                        'freezeAuthority': None,
+                        'isInitialized': True,
+                        'mintAuthority': fake_hash('authority', pubkey),
+                        'supply': str(int(fraction('supply', pubkey) * 10 ** 12)),
+                    },
+                    'type': 'mint',
+                },
+                'program': 'spl-token',
+                'space': 82,
+            },
+            'executable': False,
+            'lamports': 1461600,
+            'owner': TOKEN_PROGRAM_ID,
+            'rentEpoch': 0,
+        }
+
+
+# Responses recorded with --rpc-cache-dir
+class RecordedResponses(object):
+
+    def __init__(self, recordings_dir):
+        self.response_cache = ResponseCache(recordings_dir)
+
+    def get_response_item(self, method, params):
+        result = self.response_cache.get(method, params, check_age=False)
+        if result is None:
+            return None
+        return {'result': result}
+
+
+class FakeRpcServer(object):
+    logger = logging.getLogger('FakeRpcServer')
+
+    def __init__(self,
+                 host='127.0.0.1',
+                 port=0,
+                 recorded_responses=None,
+                 synthetic_responses=None,
+                 latency=None,
+                 latency_per_item=None,
+                 max_batch_size=None,
+                 rate_limited_rate=0.0,
+                 timeout_rate=0.0,
+                 truncated_rate=0.0,
+                 timeout_seconds=60):
+        self.recorded_responses = recorded_responses
+        self.synthetic_responses = synthetic_responses
+        self.latency = latency
+        self.latency_per_item = latency_per_item
+        self.max_batch_size = max_batch_size
+        self.rate_limited_rate = rate_limited_rate
+        self.timeout_rate = timeout_rate
+        self.truncated_rate = truncated_rate
+        self.timeout_seconds = timeout_seconds
+
+        self.request_count = 0
+        self.item_count = 0
+        self._lock = threading.Lock()
+        self._http_server = ThreadingHTTPServer((host, port), self._build_handler())
+        self._http_server.daemon_threads = True
+
+    @property
+    def endpoint_uri(self):
+        host, port = self._http_server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def serve_forever(self):
+        self._http_server.serve_forever()
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='FakeRpcServer', daemon=True).start()
+        return self
+
+    def shutdown(self):
+        self._http_server.shutdown()
+        self._http_server.server_close()
+
+    def get_response_item(self, request):
+        response_item = None
+        if self.recorded_responses is not None:
+            response_item = self.recorded_responses.get_response_item(request['method'], request['params'])
+        if response_item is None and self.synthetic_responses is not None:
+            response_item = self.synthetic_responses.get_response_item(request['method'], request['params'])
+        if response_item is None:
+            response_item = {'error': NOT_RECORDED_ERROR}
+        return dict(response_item, jsonrpc='2.0', id=request.get('id'))
+
+    def _build_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                request = json_codec.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                requests = request if isinstance(request, list) else [request]
+                with server._lock:
+                    server.request_count += 1
+                    server.item_count += len(requests)
+
+                if random.random() < server.rate_limited_rate:
+                    return self._send(429, b'{"jsonrpc":"2.0","error":{"code":429,"message":"Too many requests"}}',
+                                      {'Retry-After': '1'})
+                if random.random() < server.timeout_rate:
+                    # The client gives up first
+                    time.sleep(server.timeout_seconds)
+                    self.close_connection = True
+                    return
+                if server.max_batch_size is not None and len(requests) > server.max_batch_size:
+                    return self._send(413, 'Batch of {} requests is over the limit of {}'.format(
+                        len(requests), server.max_batch_size).encode('utf-8'))
+
+                latency = server.latency() if server.latency is not None else 0
+                if server.latency_per_item is not None:
+                    latency += sum(server.latency_per_item() for _ in requests)
+                time.sleep(latency)
+
+                response_items = [server.get_response_item(request) for request in requests]
+                body = json_codec.dumps_compact(
+                    response_items if isinstance(request, list) else response_items[0]).encode('utf-8')
+                if random.random() < server.truncated_rate:
+                    return self._send(200, body, truncate=True)
+                self._send(200, body)
+
+            def _send(self, status, body, headers=None, truncate=False):
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                try:
+                    if truncate:
+                        self.wfile.write(body[:len(body) // 2])
+                        self.wfile.flush()
+                        self.connection.shutdown(socket.SHUT_RDWR)
+                        self.close_connection = True
+                    else:
+                        self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+
+            def log_message(self, format, *args):
+                server.logger.debug(format, *args)
+
+        return Handler
@@ -0,0 +1,251 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import contextlib
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+
+from solanaetl import json_codec
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_POLL_SECONDS = 30
+
+
+class Lease(object):
+    def __init__(self, partition, token, generation=0):
+        self.partition = partition
+        self.token = token
+        self.generation = generation
+        # Set by the heartbeat when another worker took the partition over
+        self.lost = threading.Event()
+
+    def __repr__(self):
+        return 'Lease({}, {})'.format(self.partition[0], self.partition[1])
+
+
+# Hands out the partitions of an export to workers through a directory they share, e.g. on NFS. Every claim of a
+# partition links a new generation of its lease file in place, which fails if another worker created that generation
+# first, so a single worker claims a partition or takes an expired lease over. The holder renews its generation in the
+# background while the partition is exported and finds out it lost the lease when a later generation exists. Lease
+# files are never moved away, the clocks of the workers must agree within a fraction of the lease duration.
+class LeaseCoordinator(object):
+    logger = logging.getLogger('LeaseCoordinator')
+
+    def __init__(self, coordinator_dir, worker_id=None, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.coordinator_dir = coordinator_dir
+        self.worker_id = worker_id if worker_id is not None else get_default_worker_id()
+        self.lease_seconds = lease_seconds
+        self._partitions = None
+        os.makedirs(os.path.join(coordinator_dir, 'leases'), exist_ok=True)
+        os.makedirs(os.path.join(coordinator_dir, 'done'), exist_ok=True)
+
+    def has_partitions(self):
+        return os.path.exists(self._get_partitions_path())
+
+    def add_partitions(self, partitions):
+        """Publishes the partitions to export, unless a worker already did"""
+        partitions = [list(partition) for partition in partitions]
+        if not self._link_file(self._get_partitions_path(), json_codec.dumps_compact(partitions)):
+            self.logger.info('The partitions were already published by another worker')
+
+    def get_partitions(self):
+        if self._partitions is None:
+            with open(self._get_partitions_path(), 'r') as partitions_file:
+                self._partitions = [tuple(partition) for partition in json_codec.loads(partitions_file.read())]
+        return self._partitions
+
+    def claim(self):
+        """Returns a lease on a partition which is neither exported nor leased, None if there is none"""
+        for partition in self.get_partitions():
+            if self._is_done(partition):
+                continue
+            generation = self._get_lease_generation(partition)
+            if generation is None:
+                generation = 0
+            else:
+                stored_lease = self._read_lease(self._get_lease_path(partition, generation))
+                if stored_lease['expires_at'] > time.time():
+                    continue
+                if stored_lease['token'] is not None:
+                    self.logger.info('Taking over the expired lease of {} from {}'.format(
+                        partition, stored_lease['worker_id']))
+                generation += 1
+            lease = Lease(partition, uuid.uuid4().hex, generation)
+            if self._link_file(self._get_lease_path(partition, generation), self._get_lease_content(lease)):
+                return lease
+        return None
+
+    def renew(self, lease):
+        """Extends the lease, returns False if another worker took it over"""
+        return self._rewrite_lease(lease, self._get_lease_content(lease))
+
+    def release(self, lease):
+        self._rewrite_lease(lease, json_codec.dumps_compact({
+            'worker_id': self.worker_id,
+            'token': None,
+            'expires_at': 0,
+        }))
+
+    def complete(self, lease):
+        """Marks the partition as exported, returns False if another worker took the lease over"""
+        if not self.renew(lease):
+            return False
+        self._replace_file(self._get_done_path(lease.partition), json_codec.dumps_compact({
+            'worker_id': self.worker_id,
+            'completed_at': time.time(),
+        }))
+        self.release(lease)
+        return True
+
+    def is_finished(self):
+        return all(self._is_done(partition) for partition in self.get_partitions())
+
+    @contextlib.contextmanager
+    def hold(self, lease):
+        """Renews the lease in the background"""
+        stopped = threading.Event()
+
+        def renew_until_stopped():
+            while not stopped.wait(self.lease_seconds / 3):
+                try:
+                    if not self.renew(lease):
+                        self.logger.warning('{} was taken over by another worker'.format(lease))
+                        lease.lost.set()
+                        return
+                except OSError:
+                    self.logger.exception('Renewing {} failed'.format(lease))
+
+        heartbeat = threading.Thread(target=renew_until_stopped, name='LeaseHeartbeat', daemon=True)
+        heartbeat.start()
+        try:
+            yield lease
+        finally:
+            stopped.set()
+            heartbeat.join()
+
+    def _is_done(self, partition):
+        return os.path.exists(self._get_done_path(partition))
+
+    def _get_lease_generation(self, partition):
+        """The latest generation of the lease of the partition, None if it was never claimed"""
+        generation = None
+        while os.path.exists(self._get_lease_path(partition, 0 if generation is None else generation + 1)):
+            generation = 0 if generation is None else generation + 1
+        return generation
+
+    def _rewrite_lease(self, lease, content):
+        """Only the holder writes to its generation, it is still the holder after the write unless a later generation
+        was claimed meanwhile"""
+        lease_path = self._get_lease_path(lease.partition, lease.generation)
+        stored_lease = self._read_lease(lease_path)
+        if stored_lease is None or stored_lease['token'] != lease.token:
+            return False
+        if self._is_lease_taken_over(lease):
+            return False
+        self._replace_file(lease_path, content)
+        return not self._is_lease_taken_over(lease)
+
+    def _is_lease_taken_over(self, lease):
+        return os.path.exists(self._get_lease_path(lease.partition, lease.generation + 1))
+
+    def _read_lease(self, lease_path):
+        try:
+            with open(lease_path, 'r') as lease_file:
+                return json_codec.loads(lease_file.read())
+        except FileNotFoundError:
+            return None
+
+    def _get_lease_content(self, lease):
+        return json_codec.dumps_compact({
+            'worker_id': self.worker_id,
+            'token': lease.token,
+            'expires_at': time.time() + self.lease_seconds,
+        })
+
+    def _link_file(self, path, content):
+        """Creates the file with the content unless it exists, readers never see a partial file"""
+        temporary_path = self._write_temporary_file(content)
+        try:
+            os.link(temporary_path, path)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(temporary_path)
+
+    def _replace_file(self, path, content):
+        os.replace(self._write_temporary_file(content), path)
+
+    def _write_temporary_file(self, content):
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.coordinator_dir, suffix='.tmp')
+        with os.fdopen(file_descriptor, 'w') as temporary_file:
+            temporary_file.write(content)
+        return temporary_path
+
+    def _get_partitions_path(self):
+        return os.path.join(self.coordinator_dir, 'partitions.json')
+
+    def _get_lease_path(self, partition, generation):
+        return os.path.join(self.coordinator_dir, 'leases', '{}_{}.{}.json'.format(
+            partition[0], partition[1], generation))
+
+    def _get_done_path(self, partition):
+        return os.path.join(self.coordinator_dir, 'done', get_partition_name(partition))
+
+
+def get_partition_name(partition):
+    return '{}_{}.json'.format(partition[0], partition[1])
+
+
+def get_default_worker_id():
+    return '{}-{}'.format(socket.gethostname(), os.getpid())
+
+
+def run_worker(coordinator, export_partition, poll_seconds=DEFAULT_POLL_SECONDS):
+    """Exports the partitions claimed from the coordinator until all are exported. The partitions leased by other
+    workers are waited for, their leases are taken over if the workers die. export_partition is called with the
+    partition and an event set when the lease is lost, it should stop exporting then."""
+    exported_partition_count = 0
+    while True:
+        lease = coordinator.claim()
+        if lease is None:
+            if coordinator.is_finished():
+                break
+            time.sleep(poll_seconds)
+            continue
+        logging.info('Worker {} exporting partition {}'.format(coordinator.worker_id, lease.partition))
+        try:
+            with coordinator.hold(lease):
+                export_partition(lease.partition, lease.lost)
+        except BaseException as e:
+            if lease.lost.is_set() and isinstance(e, Exception):
+                logging.exception('Stopped exporting partition {}, its lease was lost'.format(lease.partition))
+                continue
+            # Another worker retries it right away
+            coordinator.release(lease)
+            raise
+        if not coordinator.complete(lease):
+            logging.warning('Partition {} was taken over by another worker before completing'.format(lease.partition))
+            continue
+        exported_partition_count += 1
+    logging.info('Worker {} exported {} partitions.'.format(coordinator.worker_id, exported_partition_count))
+    return exported_partition_count
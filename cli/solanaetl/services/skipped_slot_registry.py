@@ -0,0 +1,157 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import logging
+import os
+import tempfile
+import threading
+
+from solanaetl import json_codec
+
+# The registry is kept in a file per chunk of slots, ~0.5 days on mainnet
+CHUNK_SLOTS = 100000
+
+
+# Skipped slots found by getBlocks range scans. Only the slots between the first and last blocks returned by a scan are
+# known: the slots before the first one may be missing from a node without the full ledger, the slots after the last
+# one may not be produced yet. With a registry dir the chunks are kept across runs, so that re-runs and
+# gap fills never request known skipped slots.
+class SkippedSlotRegistry(object):
+    logger = logging.getLogger('SkippedSlotRegistry')
+
+    def __init__(self, registry_dir=None):
+        self.registry_dir = registry_dir
+        self._chunks = {}
+        self._dirty_chunk_starts = set()
+        self._lock = threading.Lock()
+        if registry_dir is not None:
+            os.makedirs(registry_dir, exist_ok=True)
+
+    def get_unscanned_intervals(self, start_slot, end_slot):
+        """Returns the (start, end) intervals of the range which were never scanned"""
+        scanned_intervals = [
+            interval for chunk_start in get_chunk_starts(start_slot, end_slot)
+            for interval in self._get_chunk(chunk_start)['scanned']]
+        return subtract_intervals((start_slot, end_slot), merge_intervals(scanned_intervals))
+
+    def is_skipped(self, slot):
+        return slot in self._get_chunk(get_chunk_start(slot))['skipped']
+
+    def record_scan(self, start_slot, end_slot, blocks):
+        """Records the blocks returned by getBlocks for the range, the slots between the first and last blocks which
+        were not returned were skipped"""
+        if len(blocks) == 0:
+            # Nothing produced yet or the node doesn't have the range, either way nothing is known
+            return
+        # A node returns the blocks from its first available slot, the real blocks before it are not returned
+        start_slot = max(start_slot, min(blocks))
+        end_slot = min(end_slot, max(blocks))
+        blocks = set(blocks)
+        with self._lock:
+            for chunk_start in get_chunk_starts(start_slot, end_slot):
+                chunk = self._get_chunk(chunk_start)
+                scan_start = max(start_slot, chunk_start)
+                scan_end = min(end_slot, chunk_start + CHUNK_SLOTS - 1)
+                chunk['scanned'] = merge_intervals(chunk['scanned'] + [(scan_start, scan_end)])
+                chunk['skipped'].update(slot for slot in range(scan_start, scan_end + 1) if slot not in blocks)
+                self._dirty_chunk_starts.add(chunk_start)
+
+    def flush(self):
+        if self.registry_dir is None:
+            return
+        with self._lock:
+            for chunk_start in sorted(self._dirty_chunk_starts):
+                self._write_chunk(chunk_start, self._chunks[chunk_start])
+            self._dirty_chunk_starts.clear()
+
+    def _get_chunk(self, chunk_start):
+        chunk = self._chunks.get(chunk_start)
+        if chunk is None:
+            chunk = self._read_chunk(chunk_start)
+            self._chunks[chunk_start] = chunk
+        return chunk
+
+    def _read_chunk(self, chunk_start):
+        chunk = {'scanned': [], 'skipped': set()}
+        if self.registry_dir is None:
+            return chunk
+        try:
+            with open(self._get_path(chunk_start), 'r') as chunk_file:
+                content = json_codec.loads(chunk_file.read())
+            chunk['scanned'] = [tuple(interval) for interval in content.get('scanned', [])]
+            chunk['skipped'] = set(content.get('skipped', []))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError):
+            self.logger.warning('Ignoring the unreadable skipped slots file {}'.format(self._get_path(chunk_start)))
+        return chunk
+
+    def _write_chunk(self, chunk_start, chunk):
+        # Another process may have scanned other intervals of the chunk meanwhile
+        stored_chunk = self._read_chunk(chunk_start)
+        chunk['scanned'] = merge_intervals(chunk['scanned'] + stored_chunk['scanned'])
+        chunk['skipped'].update(stored_chunk['skipped'])
+
+        content = json_codec.dumps_compact({
+            'scanned': [list(interval) for interval in chunk['scanned']],
+            'skipped': sorted(chunk['skipped']),
+        })
+        # Written to a temporary file and renamed, so concurrent readers never see partial files
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.registry_dir, suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'w') as temporary_file:
+                temporary_file.write(content)
+            os.replace(temporary_path, self._get_path(chunk_start))
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+    def _get_path(self, chunk_start):
+        return os.path.join(self.registry_dir, 'skipped_slots_{}.json'.format(chunk_start))
+
+
+def get_chunk_start(slot):
+    return slot - slot % CHUNK_SLOTS
+
+
+def get_chunk_starts(start_slot, end_slot):
+    return range(get_chunk_start(start_slot), end_slot + 1, CHUNK_SLOTS)
+
+
+def merge_intervals(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if len(merged) > 0 and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(interval, sorted_intervals):
+    start, end = interval
+    remaining = []
+    for other_start, other_end in sorted_intervals:
+        if other_end < start or other_start > end:
+            continue
+        if other_start > start:
+            remaining.append((start, other_start - 1))
+        start = max(start, other_end + 1)
+    if start <= end:
+        remaining.append((start, end))
+    return remaining
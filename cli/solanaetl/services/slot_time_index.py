@@ -0,0 +1,104 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import bisect
+import logging
+import os
+import tempfile
+import threading
+
+from solanaetl import json_codec
+
+
+# Sparse index of the block times of produced slots, plus the first slot at or after each timestamp already looked
+# up. Bounds the searches of later lookups, and the same lookups cost no RPC at all.
+class SlotTimeIndex(object):
+    logger = logging.getLogger('SlotTimeIndex')
+
+    def __init__(self, index_file=None):
+        self.index_file = index_file
+        self._slots = []
+        self._block_times = {}
+        self._first_slots = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if index_file is not None:
+            self._read()
+
+    def add(self, slot, block_time):
+        with self._lock:
+            if slot not in self._block_times:
+                bisect.insort(self._slots, slot)
+                self._block_times[slot] = block_time
+                self._dirty = True
+
+    def get_bounds(self, timestamp):
+        """Returns the last indexed (slot, block_time) before the timestamp and the first one at or after it"""
+        with self._lock:
+            lower = None
+            upper = None
+            for slot in self._slots:
+                block_time = self._block_times[slot]
+                if block_time < timestamp:
+                    lower = (slot, block_time)
+                elif upper is None:
+                    upper = (slot, block_time)
+            return lower, upper
+
+    def get_first_slot(self, timestamp):
+        return self._first_slots.get(timestamp)
+
+    def set_first_slot(self, timestamp, slot):
+        with self._lock:
+            self._first_slots[timestamp] = slot
+            self._dirty = True
+
+    def flush(self):
+        if self.index_file is None or not self._dirty:
+            return
+        with self._lock:
+            content = json_codec.dumps_compact({
+                'block_times': [[slot, self._block_times[slot]] for slot in self._slots],
+                'first_slots': [[timestamp, slot] for timestamp, slot in sorted(self._first_slots.items())],
+            })
+            directory = os.path.dirname(os.path.abspath(self.index_file))
+            os.makedirs(directory, exist_ok=True)
+            # Written to a temporary file and renamed, so concurrent readers never see partial files
+            file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(file_descriptor, 'w') as temporary_file:
+                    temporary_file.write(content)
+                os.replace(temporary_path, self.index_file)
+            except BaseException:
+                os.remove(temporary_path)
+                raise
+            self._dirty = False
+
+    def _read(self):
+        try:
+            with open(self.index_file, 'r') as index_file:
+                content = json_codec.loads(index_file.read())
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            self.logger.warning('Ignoring the unreadable slot time index {}'.format(self.index_file))
+            return
+        for slot, block_time in content.get('block_times', []):
+            self._block_times[slot] = block_time
+        self._slots = sorted(self._block_times)
+        self._first_slots = {timestamp: slot for timestamp, slot in content.get('first_slots', [])}
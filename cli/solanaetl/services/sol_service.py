@@ -0,0 +1,167 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import calendar
+import logging
+import time
+from datetime import timedelta
+from itertools import count
+
+from solanaetl import json_codec
+from solanaetl.executors.batch_work_executor import RETRY_EXCEPTIONS
+from solanaetl.executors.retry_queue import (DEFAULT_MAX_RETRY_DELAY_SECONDS, DEFAULT_RETRY_DELAY_SECONDS,
+                                             get_retry_delay)
+from solanaetl.json_rpc_requests import generate_get_slot_json_rpc, generate_json_rpc
+from solanaetl.services.slot_time_index import SlotTimeIndex
+from solanaetl.utils import rpc_response_batch_to_results
+
+# Consecutive slots probed in a single batch, so that a skipped slot doesn't cost another round trip
+PROBE_SLOTS = 4
+
+
+class SolService(object):
+    logger = logging.getLogger('SolService')
+
+    def __init__(self, batch_web3_provider, slot_time_index=None, max_retries=5,
+                 retry_delay_seconds=DEFAULT_RETRY_DELAY_SECONDS,
+                 max_retry_delay_seconds=DEFAULT_MAX_RETRY_DELAY_SECONDS):
+        self.batch_web3_provider = batch_web3_provider
+        self.slot_time_index = slot_time_index if slot_time_index is not None else SlotTimeIndex()
+        # The probes are sent one at a time, they are retried with the exceptions and backoff of the batch executors
+        self.max_retries = max_retries
+        self.retry_delay_seconds = retry_delay_seconds
+        self.max_retry_delay_seconds = max_retry_delay_seconds
+
+    def get_block_range_for_date(self, date):
+        start_timestamp = calendar.timegm(date.timetuple())
+        end_timestamp = calendar.timegm((date + timedelta(days=1)).timetuple()) - 1
+        return self.get_block_range_for_timestamps(start_timestamp, end_timestamp)
+
+    def get_block_range_for_timestamps(self, start_timestamp, end_timestamp):
+        """Returns the first and last slots with a block time within the timestamps, both inclusive"""
+        start_slot = self.get_first_slot_at_or_after(start_timestamp)
+        end_slot = self.get_first_slot_at_or_after(end_timestamp + 1) - 1
+        self.slot_time_index.flush()
+        if end_slot < start_slot:
+            raise ValueError('There are no blocks between {} and {}'.format(start_timestamp, end_timestamp))
+        return start_slot, end_slot
+
+    def get_first_slot_at_or_after(self, timestamp):
+        """Returns the first produced slot with a block time at or after the timestamp"""
+        first_slot = self.slot_time_index.get_first_slot(timestamp)
+        if first_slot is not None:
+            return first_slot
+
+        lower, upper = self.slot_time_index.get_bounds(timestamp)
+        if upper is None:
+            upper = self._probe_latest_slot()
+            if upper[1] < timestamp:
+                raise ValueError('Timestamp {} is after the latest finalized block {} at {}'.format(
+                    timestamp, upper[0], upper[1]))
+        if lower is None:
+            lower = self._probe_first_available_slot()
+            if lower[1] >= timestamp:
+                self.logger.warning('Timestamp {} is before the first block {} available on the node'.format(
+                    timestamp, lower[0]))
+                return lower[0]
+
+        # Interpolation search as slots are produced at an almost constant rate, falling back to bisection
+        # whenever an interpolation doesn't halve the interval. The lower bound is a produced slot before the
+        # timestamp, the upper bound a slot whose next produced slot is at or after it.
+        low_slot, low_time = lower
+        high, high_slot, high_time = upper[0], upper[0], upper[1]
+        use_bisection = False
+        probe_count = 0
+        while high - low_slot > 1:
+            if use_bisection or high_time == low_time:
+                guess = (low_slot + high) // 2
+            else:
+                guess = low_slot + int((timestamp - low_time) * (high - low_slot) / (high_time - low_time))
+            guess = min(max(guess, low_slot + 1), high - 1)
+
+            width = high - low_slot
+            probe_count += 1
+            probed = self._probe(guess, high - 1)
+            if probed is None:
+                # All skipped up to the upper bound
+                high = guess
+            elif probed[1] >= timestamp:
+                high, high_slot, high_time = guess, probed[0], probed[1]
+            else:
+                low_slot, low_time = probed
+            use_bisection = high - low_slot > width / 2
+
+        self.logger.info('Found the first slot {} at or after {} in {} probes'.format(
+            high_slot, timestamp, probe_count))
+        self.slot_time_index.set_first_slot(timestamp, high_slot)
+        return high_slot
+
+    def _probe(self, slot, max_slot):
+        """Returns the first produced (slot, block_time) from slot to max_slot in a batch, None if all are skipped"""
+        slots = list(range(slot, min(slot + PROBE_SLOTS, max_slot + 1)))
+        block_times = dict(zip(slots, self._request_batch([
+            generate_json_rpc('getBlockTime', [probed_slot], request_id=idx)
+            for idx, probed_slot in enumerate(slots)])))
+        for probed_slot in slots:
+            if block_times[probed_slot] is not None:
+                self.slot_time_index.add(probed_slot, block_times[probed_slot])
+                return probed_slot, block_times[probed_slot]
+        if slots[-1] >= max_slot:
+            return None
+        # A long run of skipped slots
+        next_slots = self._request('getBlocksWithLimit', [slots[-1] + 1, 1])
+        if len(next_slots) == 0 or next_slots[0] > max_slot:
+            return None
+        return self._probe(next_slots[0], max_slot)
+
+    def _probe_latest_slot(self):
+        slot = self._request_json_rpc(generate_get_slot_json_rpc('finalized'))
+        return self._probe_backwards(slot)
+
+    def _probe_first_available_slot(self):
+        slot = self._request('getFirstAvailableBlock', [])
+        return self._probe(slot, slot + PROBE_SLOTS - 1)
+
+    def _probe_backwards(self, slot):
+        # The latest finalized slot may be skipped
+        while True:
+            probed = self._probe(max(slot - PROBE_SLOTS + 1, 0), slot)
+            if probed is not None:
+                return probed
+            slot = slot - PROBE_SLOTS
+
+    def _request(self, method, params):
+        return self._request_json_rpc(generate_json_rpc(method, params))
+
+    def _request_json_rpc(self, request):
+        return self._request_batch([request])[0]
+
+    def _request_batch(self, requests):
+        """Returns the results in the order of the request ids"""
+        text = json_codec.dumps_compact(requests)
+        for attempt in count():
+            try:
+                response = self.batch_web3_provider.make_batch_request(text)
+                return list(rpc_response_batch_to_results(sorted(response, key=lambda item: item['id'])))
+            except RETRY_EXCEPTIONS as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay_seconds = get_retry_delay(attempt, self.retry_delay_seconds, self.max_retry_delay_seconds)
+                self.logger.warning('The request will be retried in {:.1f} seconds. Retry #{}: {}'.format(
+                    delay_seconds, attempt, repr(e)))
+                time.sleep(delay_seconds)
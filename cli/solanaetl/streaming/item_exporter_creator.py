@@ -0,0 +1,52 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from blockchainetl_common.jobs.exporters.console_item_exporter import ConsoleItemExporter
+
+
+def create_item_exporter(output):
+    item_exporter_type = determine_item_exporter_type(output)
+    if item_exporter_type == ItemExporterType.PUBSUB:
+        from blockchainetl_common.jobs.exporters.google_pubsub_item_exporter import GooglePubSubItemExporter
+        item_exporter = GooglePubSubItemExporter(
+            item_type_to_topic_mapping={
+                'block': output + '.blocks',
+                'transaction': output + '.transactions',
+                'instruction': output + '.instructions',
+            })
+    elif item_exporter_type == ItemExporterType.CONSOLE:
+        item_exporter = ConsoleItemExporter()
+    else:
+        raise ValueError('Unable to determine item exporter type for output ' + output)
+
+    return item_exporter
+
+
+def determine_item_exporter_type(output):
+    if output is None:
+        return ItemExporterType.CONSOLE
+    elif output.startswith('projects'):
+        return ItemExporterType.PUBSUB
+    else:
+        return ItemExporterType.UNKNOWN
+
+
+class ItemExporterType:
+    PUBSUB = 'pubsub'
+    CONSOLE = 'console'
+    UNKNOWN = 'unknown'
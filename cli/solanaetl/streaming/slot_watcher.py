@@ -0,0 +1,135 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import asyncio
+import logging
+import threading
+import time
+from urllib.parse import urlparse, urlunparse
+
+from solanaetl import json_codec
+from solanaetl.json_rpc_requests import generate_json_rpc
+
+# No notification for this long means the subscription is stuck, the streamer polls getSlot meanwhile
+STALE_SLOT_SECONDS = 10
+RECONNECT_SECONDS = 5
+
+# The subscription notifying the latest slot for each commitment level supported by getBlock
+SUBSCRIPTIONS = {
+    # Roots are finalized
+    'finalized': ('rootSubscribe', []),
+    # Unstable but widely available, slotSubscribe only notifies processed slots
+    'confirmed': ('slotsUpdatesSubscribe', []),
+}
+
+
+def get_notified_slot(commitment, result):
+    if commitment == 'finalized':
+        return result
+    elif result.get('type') == 'optimisticConfirmation':
+        return result.get('slot')
+    return None
+
+
+def get_ws_uri(provider_uri):
+    """https://api.mainnet-beta.solana.com -> wss://api.mainnet-beta.solana.com"""
+    uri = urlparse(provider_uri)
+    if uri.scheme == 'https':
+        return urlunparse(uri._replace(scheme='wss'))
+    elif uri.scheme == 'http':
+        return urlunparse(uri._replace(scheme='ws'))
+    return None
+
+
+# Keeps track of the latest slot at the given commitment with a WebSocket subscription, on a background thread
+class SlotWatcher(object):
+    logger = logging.getLogger('SlotWatcher')
+
+    def __init__(self, ws_uri, commitment='finalized'):
+        if commitment not in SUBSCRIPTIONS:
+            raise ValueError('Unsupported commitment {}'.format(commitment))
+        self.ws_uri = ws_uri
+        self.commitment = commitment
+
+        self._latest_slot = None
+        self._latest_slot_time = None
+        self._stopped = False
+        self._loop = None
+        self._task = None
+        self._thread = None
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        self._task = self._loop.create_task(self._watch())
+        self._thread = threading.Thread(target=self._run, name='SlotWatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        if self._thread is not None and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+            self._thread.join(timeout=RECONNECT_SECONDS)
+
+    def get_latest_slot(self):
+        """Returns None unless a slot was notified recently"""
+        latest_slot_time = self._latest_slot_time
+        if latest_slot_time is None or time.monotonic() - latest_slot_time > STALE_SLOT_SECONDS:
+            return None
+        return self._latest_slot
+
+    def _run(self):
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    async def _watch(self):
+        import websockets
+
+        method, params = SUBSCRIPTIONS[self.commitment]
+        while not self._stopped:
+            try:
+                async with websockets.connect(self.ws_uri, max_size=None) as connection:
+                    await connection.send(json_codec.dumps_compact(generate_json_rpc(method, params)))
+                    self.logger.info('Subscribed with {} to {}'.format(method, self.ws_uri))
+                    async for message in connection:
+                        self._on_message(json_codec.loads(message))
+            except SubscriptionError as e:
+                self.logger.warning('{}, polling getSlot instead.'.format(e))
+                return
+            except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+                self.logger.warning('Slot subscription to {} failed, reconnecting in {} seconds. {}'.format(
+                    self.ws_uri, RECONNECT_SECONDS, repr(e)))
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    def _on_message(self, message):
+        if message.get('error') is not None:
+            raise SubscriptionError('Slot subscription to {} failed {}'.format(self.ws_uri, message.get('error')))
+        params = message.get('params')
+        if params is None:
+            return
+        slot = get_notified_slot(self.commitment, params.get('result'))
+        if slot is not None and (self._latest_slot is None or slot > self._latest_slot):
+            self._latest_slot = slot
+        self._latest_slot_time = time.monotonic()
+
+
+class SubscriptionError(Exception):
+    pass
@@ -0,0 +1,111 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import logging
+
+from blockchainetl_common.jobs.exporters.console_item_exporter import ConsoleItemExporter
+from blockchainetl_common.jobs.exporters.in_memory_item_exporter import InMemoryItemExporter
+from solanaetl import json_codec
+from solanaetl.enumeration.entity_type import EntityType
+from solanaetl.jobs.export_blocks_job import ExportBlocksJob
+from solanaetl.json_rpc_requests import generate_get_slot_json_rpc
+from solanaetl.utils import rpc_response_to_result
+
+# The skipped slots at the start of a range are only known from a block before it
+SKIPPED_SLOT_SCAN_LOOKBACK_SLOTS = 1000
+
+
+class SolanaStreamerAdapter:
+    def __init__(
+            self,
+            batch_web3_provider,
+            item_exporter=ConsoleItemExporter(),
+            batch_size=5,
+            max_workers=5,
+            entity_types=tuple(EntityType.ALL_FOR_STREAMING),
+            commitment='finalized',
+            slot_watcher=None):
+        self.batch_web3_provider = batch_web3_provider
+        self.item_exporter = item_exporter
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.entity_types = entity_types
+        self.commitment = commitment
+        self.slot_watcher = slot_watcher
+        self.current_block_number = None
+
+    def open(self):
+        self.item_exporter.open()
+        if self.slot_watcher is not None:
+            self.slot_watcher.start()
+
+    def get_current_block_number(self):
+        # Notified slots save a request per sync cycle
+        slot = self.slot_watcher.get_latest_slot() if self.slot_watcher is not None else None
+        if slot is None:
+            response = self.batch_web3_provider.make_batch_request(
+                json_codec.dumps_compact([generate_get_slot_json_rpc(self.commitment)]))
+            slot = rpc_response_to_result(response[0])
+        self.current_block_number = slot
+        return slot
+
+    def export_all(self, start_block, end_block):
+        blocks, transactions, instructions = self._export_blocks_and_transactions(start_block, end_block)
+
+        logging.info('Exporting with ' + type(self.item_exporter).__name__)
+
+        all_items = \
+            (blocks if EntityType.BLOCK in self.entity_types else []) + \
+            (transactions if EntityType.TRANSACTION in self.entity_types else []) + \
+            (instructions if EntityType.INSTRUCTION in self.entity_types else [])
+        self.item_exporter.export_items(all_items)
+
+    def _export_blocks_and_transactions(self, start_block, end_block):
+        blocks_and_transactions_item_exporter = InMemoryItemExporter(
+            item_types=['block', 'transaction', 'instruction'])
+        blocks_and_transactions_job = ExportBlocksJob(
+            start_block=start_block,
+            end_block=end_block,
+            batch_size=self.batch_size,
+            batch_web3_provider=self.batch_web3_provider,
+            max_workers=self.max_workers,
+            item_exporter=blocks_and_transactions_item_exporter,
+            export_blocks=self._should_export(EntityType.BLOCK),
+            export_transactions=self._should_export(EntityType.TRANSACTION),
+            export_instructions=self._should_export(EntityType.INSTRUCTION),
+            commitment=self.commitment,
+            # The notified slot has a block at the commitment, the scan up to it finds the skipped slots at the end
+            skipped_slot_scan_start_block=max(start_block - SKIPPED_SLOT_SCAN_LOOKBACK_SLOTS, 0),
+            skipped_slot_scan_end_block=self.current_block_number,
+        )
+        blocks_and_transactions_job.run()
+        blocks = blocks_and_transactions_item_exporter.get_items('block')
+        transactions = blocks_and_transactions_item_exporter.get_items('transaction')
+        instructions = blocks_and_transactions_item_exporter.get_items('instruction')
+        return blocks, transactions, instructions
+
+    def _should_export(self, entity_type):
+        if entity_type == EntityType.TRANSACTION:
+            # Instructions are exported along with their transactions
+            return EntityType.TRANSACTION in self.entity_types or EntityType.INSTRUCTION in self.entity_types
+        return entity_type in self.entity_types
+
+    def close(self):
+        if self.slot_watcher is not None:
+            self.slot_watcher.stop()
+        self.item_exporter.close()
@@ -0,0 +1,184 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from multiprocessing import util
+
+# The spans are written to the file once this many are buffered
+FLUSH_SPAN_COUNT = 1000
+
+_tracer = None
+_current_span = ContextVar('current_span', default=None)
+
+
+class _NullSpan(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+# Returned while tracing is off, so that a span costs a function call and a global lookup
+_NULL_SPAN = _NullSpan()
+
+
+class Span(object):
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start_ns = None
+        self.token = None
+
+    def __enter__(self):
+        self.token = _current_span.set(self)
+        self.start_ns = time.monotonic_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end_ns = time.monotonic_ns()
+        _current_span.reset(self.token)
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer.record(self.name, self.start_ns, end_ns, self.args)
+        return False
+
+
+class Phase(object):
+    def __init__(self, span, name):
+        self.span = span
+        self.name = name
+        self.start_ns = None
+
+    def __enter__(self):
+        self.start_ns = time.monotonic_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        milliseconds = (time.monotonic_ns() - self.start_ns) / 1e6
+        self.span.args[self.name] = self.span.args.get(self.name, 0) + milliseconds
+        return False
+
+
+# Writes the spans in the Chrome trace event format: an opening bracket, then an event per line, each followed by
+# a comma. The closing bracket is optional in the format, so the file loads in a trace viewer while being written,
+# after a crash, and with the events of several processes appended to it.
+class Tracer(object):
+    def __init__(self, path):
+        self.path = path
+        self.pid = os.getpid()
+        self._file_descriptor = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._lines = []
+        self._named_threads = set()
+        self._lock = threading.Lock()
+
+    def record(self, name, start_ns, end_ns, args):
+        thread_id = threading.get_native_id()
+        event = {'name': name, 'ph': 'X', 'ts': start_ns / 1000, 'dur': (end_ns - start_ns) / 1000,
+                 'pid': self.pid, 'tid': thread_id}
+        if len(args) > 0:
+            event['args'] = {key: round(value, 3) if isinstance(value, float) else value
+                             for key, value in args.items()}
+        line = json.dumps(event) + ',\n'
+        with self._lock:
+            if thread_id not in self._named_threads:
+                self._named_threads.add(thread_id)
+                self._lines.append(json.dumps({'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': thread_id,
+                                               'args': {'name': threading.current_thread().name}}) + ',\n')
+            self._lines.append(line)
+            if len(self._lines) >= FLUSH_SPAN_COUNT:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        # A single write per flush, appends of the processes sharing the file don't interleave
+        if len(self._lines) > 0:
+            os.write(self._file_descriptor, ''.join(self._lines).encode('utf-8'))
+            self._lines = []
+
+
+def span(name, **args):
+    """A span of the trace, timing the code it wraps. A no-op unless tracing is started."""
+    tracer = _tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return Span(tracer, name, args)
+
+
+def phase(name):
+    """Times code interleaved with other code inside the current span, e.g. each instruction parsed while mapping a
+    block. The total milliseconds are added to the args of the span rather than recorded as spans of their own."""
+    if _tracer is None:
+        return _NULL_SPAN
+    current_span = _current_span.get()
+    if current_span is None:
+        return _NULL_SPAN
+    return Phase(current_span, name)
+
+
+def traced_phase(name, func):
+    """Wraps func so that its calls are timed as a phase, when tracing is started. Called once when setting up a hot
+    loop, so that the loop costs nothing more while tracing is off."""
+    if _tracer is None:
+        return func
+
+    def traced_func(*args, **kwargs):
+        with phase(name):
+            return func(*args, **kwargs)
+    return traced_func
+
+
+def start_tracing(path):
+    """Traces the hot paths of this process to the file, which is overwritten"""
+    global _tracer
+    with open(path, 'w') as file:
+        file.write('[\n')
+    _tracer = Tracer(path)
+    atexit.register(_tracer.flush)
+    logging.info('Writing the trace to {}'.format(path))
+
+
+def stop_tracing():
+    global _tracer
+    if _tracer is not None:
+        _tracer.flush()
+        _tracer = None
+
+
+def get_trace_file():
+    return _tracer.path if _tracer is not None else None
+
+
+def init_process(path):
+    """Traces a worker process to the file of its parent, passed to the initializer of the process pool"""
+    global _tracer
+    if path is None:
+        return
+    _tracer = Tracer(path)
+    # atexit handlers don't run in the worker processes of multiprocessing, its finalizers do
+    util.Finalize(_tracer, _tracer.flush, exitpriority=10)
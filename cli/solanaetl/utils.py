@@ -18,13 +18,14 @@
 
 import contextlib
 import csv
-import json
 import logging
 from typing import List
 
 from blockchainetl_common.csv_utils import set_max_field_size_limit
 from blockchainetl_common.file_utils import get_file_handle, smart_open
 
+from solanaetl import json_codec
+from solanaetl.misc.partial_batch_error import PartialBatchError
 from solanaetl.misc.retriable_value_error import RetriableValueError
 
 
@@ -76,6 +77,40 @@ def rpc_response_batch_to_results(response):
         yield rpc_response_to_result(response_item)
 
 
+def rpc_response_batch_to_partial_results(response, batch):
+    """Yields the results in the order of the batch, matching the response items by id, the request ids being the
+    indexes of the batch items. The items with retriable errors are raised in a PartialBatchError after all the other
+    results are yielded."""
+    for _, result in rpc_response_batch_to_partial_item_results(response, batch):
+        yield result
+
+
+def rpc_response_batch_to_partial_item_results(response, batch):
+    """Like rpc_response_batch_to_partial_results, yielding the batch items with their results."""
+    if not isinstance(response, list):
+        raise RetriableValueError('Batch response is not a list {}'.format(response))
+
+    response_items_by_id = {response_item.get('id'): response_item for response_item in response}
+    failed_items = []
+    errors = []
+    for request_id, item in enumerate(batch):
+        response_item = response_items_by_id.get(request_id)
+        if response_item is None:
+            failed_items.append(item)
+            errors.append(None)
+            continue
+        try:
+            result = rpc_response_to_result(response_item)
+        except RetriableValueError:
+            failed_items.append(item)
+            errors.append(response_item.get('error'))
+            continue
+        yield item, result
+
+    if len(failed_items) > 0:
+        raise PartialBatchError(failed_items, errors)
+
+
 def rpc_response_to_result(response):
     result = response.get('result')
     if result is None:
@@ -126,7 +161,7 @@ def get_item_iterable(input_file):
         set_max_field_size_limit()
         reader = csv.DictReader(fh)
     else:
-        reader = (json.loads(line) for line in fh)
+        reader = (json_codec.loads(line) for line in fh)
 
     try:
         yield reader
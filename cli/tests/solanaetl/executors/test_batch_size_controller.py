@@ -0,0 +1,108 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import pytest
+from requests import Response
+from requests.exceptions import ConnectionError, HTTPError, ReadTimeout
+from solanaetl.executors.batch_size_controller import BatchSizeController
+from solanaetl.executors.batch_work_executor import BatchWorkExecutor
+from solanaetl.providers.rpc import BatchHTTPProvider
+from solanaetl.services.fake_rpc_server import FakeRpcServer, SyntheticResponses
+
+
+def http_error(status_code):
+    response = Response()
+    response.status_code = status_code
+    return HTTPError('{} error'.format(status_code), response=response)
+
+
+def test_grows_additively_above_the_starting_batch_size():
+    controller = BatchSizeController(16, target_latency_seconds=1)
+
+    for _ in range(30):
+        controller.record_success(controller.batch_size, latency_seconds=0.1, response_bytes=1000)
+
+    # Steps of 2 up to 4 times the starting batch size
+    assert controller.batch_size == 64
+    assert controller.get_metrics()['increase'] == 24
+
+
+def test_holds_when_the_next_batch_would_exceed_the_budget():
+    controller = BatchSizeController(10, target_latency_seconds=1, max_response_bytes=1000, additive_increase=5)
+
+    controller.record_success(10, latency_seconds=0.8, response_bytes=100)
+    controller.record_success(10, latency_seconds=0.1, response_bytes=900)
+
+    assert controller.batch_size == 10
+    assert controller.get_metrics()['hold'] == 2
+
+
+@pytest.mark.parametrize('exception,decision', [
+    (ReadTimeout('read timed out'), 'decrease_timeout'),
+    (http_error(504), 'decrease_timeout'),
+    (http_error(413), 'decrease_oversized'),
+])
+def test_shrinks_multiplicatively_on_timeouts_and_oversized_responses(exception, decision):
+    controller = BatchSizeController(100)
+
+    controller.record_failure(100, exception)
+    # Sent before the change
+    controller.record_failure(100, exception)
+
+    assert controller.batch_size == 50
+    assert controller.get_metrics()[decision] == 1
+
+
+def test_shrinks_on_slow_and_large_responses_but_not_on_other_errors():
+    controller = BatchSizeController(100, target_latency_seconds=1, max_response_bytes=1000)
+
+    controller.record_failure(100, http_error(429))
+    controller.record_failure(100, ConnectionError('reset'))
+    assert controller.batch_size == 100
+
+    controller.record_success(100, latency_seconds=2)
+    controller.record_success(50, latency_seconds=0.1, response_bytes=2000)
+    assert controller.batch_size == 25
+    assert controller.get_metrics()['decrease_slow'] == 1
+    assert controller.get_metrics()['decrease_oversized'] == 1
+
+
+def test_executor_sizes_batches_from_http_responses(monkeypatch):
+    monkeypatch.setattr('time.sleep', lambda seconds: None)
+    server = FakeRpcServer(synthetic_responses=SyntheticResponses(transactions_per_block=1), max_batch_size=20)
+    server.start()
+    try:
+        provider = BatchHTTPProvider(server.endpoint_uri)
+        executor = BatchWorkExecutor(40, 1)
+        batch_sizes = []
+
+        def work_handler(batch):
+            batch_sizes.append(len(batch))
+            provider.make_batch_request('[' + ','.join(
+                '{{"jsonrpc":"2.0","method":"getBlockTime","params":[{}],"id":{}}}'.format(slot, i)
+                for i, slot in enumerate(batch)) + ']')
+
+        executor.execute(range(300), work_handler)
+        executor.shutdown()
+    finally:
+        server.shutdown()
+
+    # 413 above 20 requests, the failed batches are retried in halves instead of one item at a time
+    assert batch_sizes[:3] == [40, 20, 20]
+    assert min(batch_sizes) > 1
+    assert executor.batch_size_controller.get_metrics()['decrease_oversized'] >= 1
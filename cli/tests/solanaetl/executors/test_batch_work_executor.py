@@ -0,0 +1,173 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import asyncio
+import json
+
+import pytest
+from requests import Response
+from requests.exceptions import HTTPError
+from blockchainetl_common.jobs.exporters.in_memory_item_exporter import InMemoryItemExporter
+from solanaetl.executors.async_batch_work_executor import AsyncBatchWorkExecutor
+from solanaetl.executors.batch_size_controller import BatchSizeController
+from solanaetl.executors.batch_work_executor import BatchWorkExecutor
+from solanaetl.executors.dead_letter_file import DeadLetterFile
+from solanaetl.executors.pipeline_work_executor import PipelineWorkExecutor
+from solanaetl.jobs.export_blocks_job import ExportBlocksJob
+from solanaetl.misc.partial_batch_error import PartialBatchError
+from solanaetl.providers.batch import AsyncBatchProvider, BatchProvider
+from solanaetl.services.fake_rpc_server import SyntheticResponses
+
+
+# Fails the given slots with a lagging node error the given number of times
+class FlakyBatchProvider(BatchProvider):
+    def __init__(self, failures):
+        self.failures = dict(failures)
+        self.synthetic_responses = SyntheticResponses(transactions_per_block=1)
+        self.requested_slots = []
+
+    def make_batch_request(self, text):
+        response = []
+        for request in json.loads(text):
+            slot = request['params'][0]
+            if request['method'] == 'getBlock':
+                self.requested_slots.append(slot)
+            if request['method'] == 'getBlock' and self.failures.get(slot, 0) > 0:
+                self.failures[slot] -= 1
+                response_item = {'error': {'code': -32004, 'message': 'Block not available for slot {}'.format(slot)}}
+            else:
+                response_item = self.synthetic_responses.get_response_item(request['method'], request['params'])
+            response.append(dict(response_item, jsonrpc='2.0', id=request['id']))
+        # Batch responses can come in any order
+        return list(reversed(response))
+
+
+# Fails every batch holding the poison slot, e.g. a block too large for the node to serve
+class PoisonBatchProvider(FlakyBatchProvider):
+    def __init__(self, poison_slot):
+        super().__init__({})
+        self.poison_slot = poison_slot
+        self.batches = []
+
+    def make_batch_request(self, text):
+        slots = [request['params'][0] for request in json.loads(text) if request['method'] == 'getBlock']
+        if len(slots) > 0:
+            self.batches.append(slots)
+        if self.poison_slot in slots:
+            response = Response()
+            response.status_code = 500
+            raise HTTPError('500 Server Error', response=response)
+        return super().make_batch_request(text)
+
+
+# Serves the requests of the given provider on the event loop
+class AsyncAdapterBatchProvider(AsyncBatchProvider):
+    def __init__(self, provider):
+        self.provider = provider
+
+    def make_batch_request(self, text):
+        return self.provider.make_batch_request(text)
+
+    async def make_batch_request_async(self, text):
+        await asyncio.sleep(0)
+        return self.provider.make_batch_request(text)
+
+
+def export_blocks(provider, executor_type='threads', end_block=9, dead_letter_file=None, batch_size=None):
+    item_exporter = InMemoryItemExporter(item_types=['block', 'transaction', 'instruction'])
+    job = ExportBlocksJob(
+        start_block=0,
+        end_block=end_block,
+        batch_size=10,
+        batch_web3_provider=AsyncAdapterBatchProvider(provider) if executor_type == 'async' else provider,
+        max_workers=1,
+        item_exporter=item_exporter,
+        export_transactions=False,
+        export_instructions=False,
+        max_processes=2 if executor_type == 'pipeline' else None,
+    )
+    dead_letter_file = DeadLetterFile(dead_letter_file) if dead_letter_file is not None else None
+    # A single batch unless the batch size is given, which is then kept
+    batch_size_controller = BatchSizeController(batch_size, max_batch_size=batch_size) \
+        if batch_size is not None else None
+    batch_size = batch_size if batch_size is not None else end_block + 1
+    if executor_type == 'threads':
+        job.batch_work_executor = BatchWorkExecutor(
+            batch_size, 1, max_retries=2, batch_size_controller=batch_size_controller,
+            dead_letter_file=dead_letter_file, retry_delay_seconds=0)
+    elif executor_type == 'async':
+        job.batch_work_executor.shutdown()
+        job.batch_work_executor = AsyncBatchWorkExecutor(
+            batch_size, 1, max_retries=2, batch_size_controller=batch_size_controller,
+            dead_letter_file=dead_letter_file, retry_delay_seconds=0)
+    else:
+        job.batch_work_executor = PipelineWorkExecutor(
+            batch_size, 1, 2, max_retries=2, batch_size_controller=batch_size_controller,
+            dead_letter_file=dead_letter_file, retry_delay_seconds=0)
+    job.run()
+    return job.batch_work_executor, sorted(block['number'] for block in item_exporter.get_items('block'))
+
+
+@pytest.mark.parametrize('executor_type', ['threads', 'async', 'pipeline'])
+def test_only_failed_items_are_retried(executor_type):
+    provider = FlakyBatchProvider({3: 1, 7: 1})
+
+    executor, blocks = export_blocks(provider, executor_type)
+
+    assert blocks == list(range(10))
+    assert provider.requested_slots == list(range(10)) + [3, 7]
+    assert executor.error_counts == {-32004: 2}
+
+
+@pytest.mark.parametrize('executor_type', ['threads', 'async', 'pipeline'])
+def test_failed_items_are_raised_after_retries(executor_type):
+    provider = FlakyBatchProvider({3: 1, 7: 10})
+
+    with pytest.raises(PartialBatchError) as e:
+        export_blocks(provider, executor_type)
+
+    assert e.value.failed_items == [7]
+    assert provider.requested_slots == list(range(10)) + [3, 7, 7]
+
+
+@pytest.mark.parametrize('executor_type', ['threads', 'async', 'pipeline'])
+def test_retry_budget_grows_with_the_batches(executor_type):
+    # A slot out of 5 fails once, more retries than the reserve of the budget which the batches pay for
+    provider = FlakyBatchProvider({slot: 1 for slot in range(0, 200, 5)})
+
+    executor, blocks = export_blocks(provider, executor_type, end_block=199, batch_size=1)
+
+    assert blocks == list(range(200))
+    assert executor.error_counts == {-32004: 40}
+    assert executor.retry_budget.exhausted_count == 0
+
+
+@pytest.mark.parametrize('executor_type', ['threads', 'async', 'pipeline'])
+def test_failed_batches_are_bisected_and_dead_lettered(tmpdir, executor_type):
+    dead_letter_file = str(tmpdir.join('dead_letter.jsonl'))
+    provider = PoisonBatchProvider(poison_slot=37)
+
+    executor, blocks = export_blocks(provider, executor_type, end_block=63, dead_letter_file=dead_letter_file)
+
+    assert blocks == [block for block in range(64) if block != 37]
+    # Halves of 32, 16, 8, 4, 2 and 1 slots, then the poison slot is retried
+    assert sorted((len(batch) for batch in provider.batches), reverse=True) == \
+        [64, 32, 32, 16, 16, 8, 8, 4, 4, 2, 2, 1, 1, 1, 1]
+    with open(dead_letter_file) as file:
+        dead_letters = [json.loads(line) for line in file]
+    assert [(dead_letter['item'], dead_letter['error_type']) for dead_letter in dead_letters] == [(37, 'HTTPError')]
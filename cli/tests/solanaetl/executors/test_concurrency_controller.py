@@ -0,0 +1,83 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import threading
+import time
+
+import pytest
+from solanaetl.executors.batch_work_executor import BatchWorkExecutor
+from solanaetl.executors.concurrency_controller import ConcurrencyController
+
+
+# An endpoint serving up to capacity batches at a time, those above it are queued
+def simulate(controller, capacity, rounds=100, latency_seconds=0.1):
+    for _ in range(rounds):
+        concurrency = controller.concurrency
+        latency = latency_seconds * max(1.0, concurrency / capacity)
+        for _ in range(concurrency):
+            controller.record_success(10, latency)
+    return controller.concurrency
+
+
+@pytest.mark.parametrize('capacity', [4, 16, 40])
+def test_converges_to_the_capacity_of_the_endpoint(capacity):
+    controller = ConcurrencyController(1, 64, window_seconds=0)
+
+    concurrency = simulate(controller, capacity)
+
+    assert capacity / 2 <= concurrency <= capacity * 2
+    assert controller.get_metrics()['best_throughput_concurrency'] >= capacity
+
+
+def test_stays_within_bounds_and_backs_off_on_failures():
+    controller = ConcurrencyController(2, 8, window_seconds=0)
+    assert simulate(controller, capacity=100) == 8
+
+    controller = ConcurrencyController(2, 8, window_seconds=0)
+    controller.concurrency = 8
+    # A window closes once half of the batches in flight are done
+    for _ in range(4):
+        controller.record_failure()
+    assert controller.concurrency == 6
+
+    for _ in range(100):
+        controller.record_failure()
+    assert controller.concurrency == 2
+
+
+def test_executor_limits_the_workers_in_use():
+    executor = BatchWorkExecutor(1, 16, min_workers=2)
+    executor.concurrency_controller.window_seconds = 0
+    in_use = []
+    lock = threading.Lock()
+    in_flight = [0]
+
+    def work_handler(batch):
+        with lock:
+            in_flight[0] += 1
+            in_use.append(in_flight[0])
+        # The endpoint queues above 4 batches in flight
+        time.sleep(0.01 * max(1.0, in_flight[0] / 4))
+        with lock:
+            in_flight[0] -= 1
+
+    executor.execute(range(300), work_handler)
+    executor.shutdown()
+
+    assert max(in_use) <= 16
+    assert 2 <= executor.concurrency <= 16
@@ -0,0 +1,70 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import threading
+
+import pytest
+from solanaetl.executors.batch_work_executor import BatchWorkExecutor
+from solanaetl.executors.retry_queue import RetryBudget, get_retry_delay
+from solanaetl.misc.retriable_value_error import RetriableValueError
+
+
+class FlakyWorkHandler(object):
+    def __init__(self, failures):
+        self.failures = dict(failures)
+        self.done = []
+        self.lock = threading.Lock()
+
+    def __call__(self, batch):
+        with self.lock:
+            for item in batch:
+                if self.failures.get(item, 0) > 0:
+                    self.failures[item] -= 1
+                    raise RetriableValueError('Item {} failed'.format(item))
+            self.done.extend(batch)
+
+
+def test_workers_keep_executing_fresh_batches_while_retries_wait():
+    executor = BatchWorkExecutor(1, 1, retry_delay_seconds=0.2)
+    work_handler = FlakyWorkHandler({0: 2})
+
+    executor.execute(range(20), work_handler)
+    executor.shutdown()
+
+    # The single worker did not sleep on the retries of item 0
+    assert work_handler.done[:19] == list(range(1, 20))
+    assert work_handler.done[19] == 0
+
+
+def test_retries_beyond_the_budget_fail():
+    executor = BatchWorkExecutor(1, 2, retry_delay_seconds=0, retry_budget=RetryBudget(ratio=0, reserve=1))
+    work_handler = FlakyWorkHandler({3: 3})
+
+    with pytest.raises(RetriableValueError):
+        executor.execute(range(10), work_handler)
+        executor.shutdown()
+
+    assert executor.retry_budget.exhausted_count == 1
+
+
+def test_retry_delays_are_jittered():
+    delays = [get_retry_delay(3, retry_delay_seconds=1, max_retry_delay_seconds=60) for _ in range(100)]
+
+    assert all(4 <= delay <= 8 for delay in delays)
+    assert len(set(delays)) > 1
+    assert get_retry_delay(10, retry_delay_seconds=1, max_retry_delay_seconds=60) <= 60
@@ -18,10 +18,11 @@
 
 import json
 
+from solanaetl.providers.batch import BatchProvider
 from tests.solanaetl.job.mock_web3_provider import MockWeb3Provider, build_file_name
 
 
-class MockBatchWeb3Provider(MockWeb3Provider):
+class MockBatchWeb3Provider(MockWeb3Provider, BatchProvider):
     def __init__(self, read_resource):
         super().__init__(read_resource)
         self.read_resource = read_resource
@@ -34,5 +35,7 @@ class MockBatchWeb3Provider(MockWeb3Provider):
             params = req['params']
             file_name = build_file_name(method, params)
             file_content = self.read_resource(file_name)
-            web3_response.extend(json.loads(file_content))
+            # Like a node, answers with the id of the request
+            for response_item in json.loads(file_content):
+                web3_response.append(dict(response_item, id=req['id']))
         return web3_response
@@ -0,0 +1,137 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import glob
+import os
+import threading
+
+import pytest
+from solanaetl.jobs import export_all_common as export_all_common_module
+from solanaetl.jobs.export_all_common import export_all_common
+from solanaetl.jobs.extract_accounts_job import ExtractAccountsJob
+from solanaetl.jobs.extract_tokens_job import ExtractTokensJob
+from solanaetl.services.fake_rpc_server import FakeRpcServer, SyntheticResponses
+
+
+def read_outputs(output_dir):
+    outputs = {}
+    for path in glob.glob(os.path.join(output_dir, '*', '**', '*.csv'), recursive=True):
+        with open(path) as file:
+            outputs[os.path.relpath(path, output_dir)] = file.read().splitlines()
+    return outputs
+
+
+@pytest.mark.parametrize('ordered', [False, True])
+def test_fused_export_writes_the_same_items(tmpdir, ordered):
+    server = FakeRpcServer(synthetic_responses=SyntheticResponses(transactions_per_block=5))
+    server.start()
+    try:
+        for fused in [False, True]:
+            export_all_common([(300000000, 300000049, '/start_block=300000000/end_block=300000049')],
+                              str(tmpdir.join('fused' if fused else 'unfused')), server.endpoint_uri,
+                              max_workers=3, batch_size=10, ordered=ordered, fused=fused)
+    finally:
+        server.shutdown()
+
+    unfused_outputs = read_outputs(str(tmpdir.join('unfused')))
+    fused_outputs = read_outputs(str(tmpdir.join('fused')))
+
+    accounts_file = 'accounts/start_block=300000000/end_block=300000049/accounts_300000000_300000049.csv'
+    assert len(unfused_outputs[accounts_file]) > 1
+    assert unfused_outputs.keys() == fused_outputs.keys()
+    for path, lines in unfused_outputs.items():
+        if ordered:
+            assert fused_outputs[path] == lines
+        else:
+            assert sorted(fused_outputs[path]) == sorted(lines)
+
+
+@pytest.mark.parametrize('fused', [False, True])
+def test_partitions_exported_at_once_write_the_same_items(tmpdir, fused):
+    partitions = [(start, start + 19, '/start_block={}/end_block={}'.format(start, start + 19))
+                  for start in range(300000000, 300000080, 20)]
+    server = FakeRpcServer(synthetic_responses=SyntheticResponses(transactions_per_block=5))
+    server.start()
+    try:
+        for partition_workers in [1, 3]:
+            export_all_common(partitions, str(tmpdir.join(str(partition_workers))), server.endpoint_uri,
+                              max_workers=3, batch_size=10, ordered=True, fused=fused,
+                              partition_workers=partition_workers)
+    finally:
+        server.shutdown()
+
+    sequential_outputs = read_outputs(str(tmpdir.join('1')))
+    assert len(sequential_outputs) == 4 * 6
+    assert read_outputs(str(tmpdir.join('3'))) == sequential_outputs
+
+
+class FailingExtractTokensJob(ExtractTokensJob):
+    def _export(self):
+        raise ValueError('The tokens job failed')
+
+
+def test_a_failed_extract_job_stops_the_fused_export(tmpdir, monkeypatch):
+    monkeypatch.setattr(export_all_common_module, 'ExtractTokensJob', FailingExtractTokensJob)
+    monkeypatch.setattr(export_all_common_module, 'FUSED_QUEUE_SIZE', 1)
+    server = FakeRpcServer(synthetic_responses=SyntheticResponses(transactions_per_block=5))
+    server.start()
+    errors = []
+
+    def export():
+        try:
+            export_all_common([(300000000, 300000049, '/start_block=300000000/end_block=300000049')],
+                              str(tmpdir), server.endpoint_uri, max_workers=3, batch_size=10, fused=True)
+        except Exception as e:
+            errors.append(e)
+
+    # The blocks job would wait forever on the full queues
+    export_thread = threading.Thread(target=export, daemon=True)
+    export_thread.start()
+    export_thread.join(30)
+    server.shutdown()
+
+    assert not export_thread.is_alive()
+    assert [str(error) for error in errors] == ['The tokens job failed']
+
+
+@pytest.mark.parametrize('fused', [False, True])
+def test_the_accounts_and_tokens_batches_are_sized_separately(tmpdir, monkeypatch, fused):
+    batch_sizes = []
+
+    class RecordingExtractAccountsJob(ExtractAccountsJob):
+        def __init__(self, **kwargs):
+            batch_sizes.append(('accounts', kwargs['batch_size']))
+            super().__init__(**kwargs)
+
+    class RecordingExtractTokensJob(ExtractTokensJob):
+        def __init__(self, **kwargs):
+            batch_sizes.append(('tokens', kwargs['batch_size']))
+            super().__init__(**kwargs)
+
+    monkeypatch.setattr(export_all_common_module, 'ExtractAccountsJob', RecordingExtractAccountsJob)
+    monkeypatch.setattr(export_all_common_module, 'ExtractTokensJob', RecordingExtractTokensJob)
+    server = FakeRpcServer(synthetic_responses=SyntheticResponses(transactions_per_block=5))
+    server.start()
+    try:
+        # The blocks batch size would make batches of 1,000 accounts
+        export_all_common([(300000000, 300000009, '/start_block=300000000/end_block=300000009')],
+                          str(tmpdir), server.endpoint_uri, max_workers=3, batch_size=10, fused=fused)
+    finally:
+        server.shutdown()
+
+    assert sorted(batch_sizes) == [('accounts', 1), ('tokens', 1)]
@@ -34,16 +34,17 @@ def read_resource(resource_group, file_name):
 
 
 @pytest.mark.parametrize(
-    'start_block,end_block,batch_size,resource_group,web3_provider_type',
+    'start_block,end_block,batch_size,resource_group,web3_provider_type,max_processes',
     [
-        (138802069, 138802069, 1, 'blocks_only', 'mock'),
+        (138802069, 138802069, 1, 'blocks_only', 'mock', None),
+        (138802069, 138802069, 1, 'blocks_only', 'mock', 2),
         skip_if_slow_tests_disabled(
-            (138802069, 138802069, 1, 'blocks_only', 'online'),
+            (138802069, 138802069, 1, 'blocks_only', 'online', None),
         )
     ],
 )
 def test_export_blocks_job_blocks_only(
-    tmpdir, start_block, end_block, batch_size, resource_group, web3_provider_type
+    tmpdir, start_block, end_block, batch_size, resource_group, web3_provider_type, max_processes
 ):
     blocks_output_file = str(tmpdir.join('actual_blocks.csv'))
 
@@ -65,6 +66,7 @@ def test_export_blocks_job_blocks_only(
         export_blocks=blocks_output_file is not None,
         export_transactions=False,
         export_instructions=False,
+        max_processes=max_processes,
     )
     job.run()
 
@@ -0,0 +1,115 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import csv
+import json
+import os
+import signal
+import subprocess
+import sys
+
+import pytest
+from solanaetl.jobs.export_blocks_job import ExportBlocksJob
+from solanaetl.jobs.exporters.blocks_and_transactions_item_exporter import \
+    blocks_and_transactions_item_exporter
+from solanaetl.providers.batch import BatchProvider
+from solanaetl.services.fake_rpc_server import SyntheticResponses
+
+
+# Fails with a non retriable error after the given number of batches, like a killed export
+class InterruptedBatchProvider(BatchProvider):
+    def __init__(self, batch_count=None):
+        self.synthetic_responses = SyntheticResponses(transactions_per_block=1)
+        self.batch_count = batch_count
+        self.requested_slots = []
+
+    def make_batch_request(self, text):
+        if self.batch_count is not None:
+            if self.batch_count == 0:
+                raise ValueError('Interrupted')
+            self.batch_count -= 1
+        response = []
+        for request in json.loads(text):
+            if request['method'] == 'getBlock':
+                self.requested_slots.append(request['params'][0])
+            response_item = self.synthetic_responses.get_response_item(request['method'], request['params'])
+            response.append(dict(response_item, jsonrpc='2.0', id=request['id']))
+        return response
+
+
+SIGTERM_SCRIPT = '''
+import os
+import signal
+import time
+
+from solanaetl.services.export_journal import exit_on_sigterm
+
+exit_on_sigterm()
+os.kill(os.getpid(), signal.SIGTERM)
+time.sleep(10)
+'''
+
+
+def read_column(file_name, column):
+    with open(file_name) as file:
+        return [int(row[column]) for row in csv.DictReader(file)]
+
+
+@pytest.mark.parametrize('ordered', [False, True])
+def test_interrupted_export_resumes_from_the_journal(tmpdir, ordered):
+    blocks_output = str(tmpdir.join('blocks.csv'))
+    transactions_output = str(tmpdir.join('transactions.csv'))
+
+    def export_blocks(provider):
+        job = ExportBlocksJob(
+            start_block=0,
+            end_block=99,
+            batch_size=10,
+            batch_web3_provider=provider,
+            max_workers=2,
+            item_exporter=blocks_and_transactions_item_exporter(blocks_output, transactions_output),
+            export_instructions=False,
+            ordered=ordered,
+            journal_file=str(tmpdir.join('journal.json')),
+            journal_save_interval_seconds=0,
+        )
+        job.run()
+
+    with pytest.raises(ValueError):
+        export_blocks(InterruptedBatchProvider(batch_count=5))
+    assert 0 < len(read_column(blocks_output, 'number')) < 100
+
+    resumed_provider = InterruptedBatchProvider()
+    export_blocks(resumed_provider)
+    assert len(resumed_provider.requested_slots) < 100
+
+    assert sorted(read_column(blocks_output, 'number')) == list(range(100))
+    assert sorted(read_column(transactions_output, 'block_number')) == list(range(100))
+    if ordered:
+        assert read_column(blocks_output, 'number') == list(range(100))
+
+    finished_provider = InterruptedBatchProvider()
+    export_blocks(finished_provider)
+    assert finished_provider.requested_slots == []
+    assert sorted(read_column(blocks_output, 'number')) == list(range(100))
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='SIGTERM is delivered to the process on POSIX only')
+def test_sigterm_exits_with_non_zero_status():
+    cli_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    process = subprocess.run([sys.executable, '-c', SIGTERM_SCRIPT], cwd=cli_dir, timeout=30)
+    assert process.returncode == 128 + signal.SIGTERM
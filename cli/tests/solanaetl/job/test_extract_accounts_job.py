@@ -18,18 +18,22 @@
 
 import csv
 import io
+import json
 
 import pytest
+from blockchainetl_common.jobs.exporters.in_memory_item_exporter import InMemoryItemExporter
 from solanaetl.jobs.exporters.accounts_item_exporter import accounts_item_exporter
 import tests.resources
 from blockchainetl_common.csv_utils import set_max_field_size_limit
 from solanaetl.jobs.exporters.tokens_item_exporter import tokens_item_exporter
 from solanaetl.jobs.extract_accounts_job import ExtractAccountsJob
 from solanaetl.jobs.extract_tokens_job import ExtractTokensJob
+from solanaetl.services.fake_rpc_server import SyntheticResponses
 from solanaetl.thread_local_proxy import ThreadLocalProxy
 from tests.helpers import (compare_lines_ignore_order, read_file,
                            skip_if_slow_tests_disabled)
 from tests.solanaetl.job.helpers import get_web3_provider
+from tests.solanaetl.services.helpers import SyntheticBatchProvider
 
 RESOURCE_GROUP = 'test_extract_accounts_job'
 
@@ -74,3 +78,33 @@ def test_extract_accounts(
         read_resource(resource_group, 'expected_accounts.csv'),
         read_file(accounts_output_file),
     )
+
+
+class BatchCountingProvider(SyntheticBatchProvider):
+    def __init__(self, synthetic_responses):
+        super().__init__(synthetic_responses)
+        self.batches = []
+
+    def make_batch_request(self, text):
+        self.batches.append([len(request['params'][0]) for request in json.loads(text)])
+        return super().make_batch_request(text)
+
+
+def test_batch_size_is_the_number_of_get_multiple_accounts_requests():
+    provider = BatchCountingProvider(SyntheticResponses())
+    created_accounts = [{'pubkey': 'Pubkey{}'.format(index), 'tx_signature': 'Signature{}'.format(index)}
+                        for index in range(250)]
+    item_exporter = InMemoryItemExporter(item_types=['account'])
+
+    ExtractAccountsJob(
+        batch_web3_provider=provider,
+        instructions_iterable=None,
+        created_accounts_iterable=created_accounts,
+        batch_size=2,
+        max_workers=1,
+        item_exporter=item_exporter,
+    ).run()
+
+    assert provider.batches[0] == [100, 100]
+    assert sorted(account['pubkey'] for account in item_exporter.get_items('account')) == \
+        sorted(account['pubkey'] for account in created_accounts)
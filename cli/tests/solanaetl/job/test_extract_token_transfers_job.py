@@ -39,13 +39,14 @@ def read_resource(resource_group, file_name):
 
 
 @pytest.mark.parametrize(
-    'batch_size,resource_group',
+    'batch_size,resource_group,ordered',
     [
-        (100, 'token_transfers_only'),
+        (100, 'token_transfers_only', False),
+        (1, 'token_transfers_only', True),
     ],
 )
 def test_extract_token_transfers(
-    tmpdir, batch_size, resource_group
+    tmpdir, batch_size, resource_group, ordered
 ):
     token_transfers_output_file = str(
         tmpdir.join('actual_token_transfers.csv'))
@@ -61,9 +62,13 @@ def test_extract_token_transfers(
             token_transfers_output=token_transfers_output_file,
         ),
         instructions_iterable=instructions_csv_reader,
+        ordered=ordered,
     )
     job.run()
 
+    if ordered:
+        assert read_resource(resource_group, 'expected_token_transfers.csv') == read_file(token_transfers_output_file)
+
     compare_lines_ignore_order(
         read_resource(resource_group, 'expected_token_transfers.csv'),
         read_file(token_transfers_output_file),
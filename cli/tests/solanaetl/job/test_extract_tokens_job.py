@@ -37,22 +37,29 @@ def read_resource(resource_group, file_name):
 
 
 @pytest.mark.parametrize(
-    'batch_size,resource_group,web3_provider_type',
+    'batch_size,resource_group,web3_provider_type,in_memory',
     [
-        (100, 'tokens_only', 'mock'),
+        (100, 'tokens_only', 'mock', False),
+        # As exported by ExtractAccountsJob in the same run, with export_all --fused
+        (100, 'tokens_only', 'mock', True),
         skip_if_slow_tests_disabled(
-            (100, 'tokens_only', 'online'),
+            (100, 'tokens_only', 'online', False),
         )
     ],
 )
 def test_extract_tokens(
-    tmpdir, batch_size, resource_group, web3_provider_type
+    tmpdir, batch_size, resource_group, web3_provider_type, in_memory
 ):
     tokens_output_file = str(tmpdir.join('actual_tokens.csv'))
 
     accounts_content = read_resource(resource_group, 'accounts.csv')
     set_max_field_size_limit()
     accounts_csv_reader = csv.DictReader(io.StringIO(accounts_content))
+    if in_memory:
+        accounts_csv_reader = [
+            dict(account, token_amount_decimals=int(account['token_amount_decimals'])
+                 if account['token_amount_decimals'] != '' else None)
+            for account in accounts_csv_reader]
 
     job = ExtractTokensJob(
         batch_web3_provider=ThreadLocalProxy(
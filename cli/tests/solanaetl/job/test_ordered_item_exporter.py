@@ -0,0 +1,63 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import random
+
+from solanaetl.jobs.exporters.ordered_item_exporter import OrderedItemExporter
+
+
+class ListItemExporter(object):
+    def __init__(self):
+        self.items = []
+        self.closed = False
+
+    def open(self):
+        pass
+
+    def export_item(self, item):
+        self.items.append(item)
+
+    def close(self):
+        self.closed = True
+
+
+def test_items_are_exported_in_key_order_spilling_the_buffer():
+    keys = list(range(100))
+    shuffled_keys = list(keys)
+    random.Random(1).shuffle(shuffled_keys)
+
+    list_item_exporter = ListItemExporter()
+    ordered_item_exporter = OrderedItemExporter(list_item_exporter, keys, max_buffer_bytes=1024)
+    ordered_item_exporter.open()
+    for key in shuffled_keys:
+        ordered_item_exporter.export_items(key, [{'slot': key, 'index': index} for index in range(3)])
+    assert ordered_item_exporter.spilled_bytes > 0
+    ordered_item_exporter.close()
+
+    assert list_item_exporter.items == [{'slot': key, 'index': index} for key in keys for index in range(3)]
+    assert list_item_exporter.closed
+
+
+def test_keys_after_a_missing_key_are_exported_on_close():
+    list_item_exporter = ListItemExporter()
+    ordered_item_exporter = OrderedItemExporter(list_item_exporter, range(5))
+    for key in [0, 4, 2, 3]:
+        ordered_item_exporter.export_items(key, [key])
+    assert list_item_exporter.items == [0]
+
+    ordered_item_exporter.close()
+    assert list_item_exporter.items == [0, 2, 3, 4]
@@ -0,0 +1,83 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import time
+
+from blockchainetl_common.jobs.exporters.in_memory_item_exporter import InMemoryItemExporter
+from solanaetl.jobs.export_all_common import export_all_common
+from solanaetl.jobs.export_blocks_job import ExportBlocksJob
+from solanaetl.providers.async_rpc import AsyncBatchHTTPProvider
+from solanaetl.services.fake_rpc_server import FakeRpcServer, SyntheticResponses, parse_latency_distribution
+from tests.solanaetl.job.test_export_all_fused import read_outputs
+
+PARTITIONS = [(300000000, 300000039, '/start_block=300000000/end_block=300000039')]
+
+
+def export_blocks(provider, batch_size, max_workers):
+    item_exporter = InMemoryItemExporter(item_types=['block', 'transaction', 'instruction'])
+    ExportBlocksJob(
+        start_block=300000000,
+        end_block=300000015,
+        batch_size=batch_size,
+        batch_web3_provider=provider,
+        max_workers=max_workers,
+        item_exporter=item_exporter,
+    ).run()
+    return sorted(block['number'] for block in item_exporter.get_items('block'))
+
+
+def test_batches_are_in_flight_at_once():
+    server = FakeRpcServer(synthetic_responses=SyntheticResponses(transactions_per_block=1),
+                           latency=parse_latency_distribution('constant:200'))
+    server.start()
+    try:
+        start_time = time.time()
+        blocks = export_blocks(AsyncBatchHTTPProvider(server.endpoint_uri), batch_size=1, max_workers=8)
+        elapsed_seconds = time.time() - start_time
+    finally:
+        server.shutdown()
+
+    assert blocks == list(range(300000000, 300000016))
+    # One request at a time would take 200 ms each
+    assert server.request_count > 8
+    assert elapsed_seconds < server.request_count * 0.2 / 2
+
+
+def test_oversized_batches_are_bisected():
+    server = FakeRpcServer(synthetic_responses=SyntheticResponses(transactions_per_block=1), max_batch_size=4)
+    server.start()
+    try:
+        blocks = export_blocks(AsyncBatchHTTPProvider(server.endpoint_uri), batch_size=16, max_workers=2)
+    finally:
+        server.shutdown()
+
+    assert blocks == list(range(300000000, 300000016))
+
+
+def test_async_export_writes_the_same_items(tmpdir):
+    server = FakeRpcServer(synthetic_responses=SyntheticResponses(transactions_per_block=5))
+    server.start()
+    try:
+        for use_async in [False, True]:
+            export_all_common(PARTITIONS, str(tmpdir.join('async' if use_async else 'sync')), server.endpoint_uri,
+                              max_workers=3, batch_size=10, use_async=use_async, ordered=True)
+    finally:
+        server.shutdown()
+
+    sync_outputs = read_outputs(str(tmpdir.join('sync')))
+    assert len(sync_outputs) == 6
+    assert read_outputs(str(tmpdir.join('async'))) == sync_outputs
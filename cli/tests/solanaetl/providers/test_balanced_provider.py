@@ -0,0 +1,119 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import json
+
+import pytest
+from requests import HTTPError, Response
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from solanaetl.providers.auto import get_batch_provider_from_uri
+from solanaetl.providers.balanced import LoadBalancedBatchProvider
+from solanaetl.providers.batch import BatchProvider
+
+
+class StaticBatchProvider(BatchProvider):
+    def __init__(self, result=None, error=None, exception=None):
+        self.result = result
+        self.error = error
+        self.exception = exception
+        self.request_count = 0
+
+    def make_batch_request(self, text):
+        self.request_count += 1
+        if self.exception is not None:
+            raise self.exception
+        response = []
+        for request in json.loads(text):
+            if self.error is not None:
+                response.append({'jsonrpc': '2.0', 'id': request['id'], 'error': self.error})
+            else:
+                response.append({'jsonrpc': '2.0', 'id': request['id'], 'result': self.result})
+        return response
+
+
+def http_error(status_code):
+    response = Response()
+    response.status_code = status_code
+    return HTTPError(response=response)
+
+
+REQUEST = json.dumps([{'jsonrpc': '2.0', 'method': 'getBlock', 'params': [1], 'id': 0}])
+
+
+def test_fails_over_and_drains_unavailable_endpoint():
+    down = StaticBatchProvider(exception=RequestsConnectionError())
+    up = StaticBatchProvider(result='ok')
+    provider = LoadBalancedBatchProvider([('down', down), ('up', up)])
+
+    for _ in range(10):
+        assert provider.make_batch_request(REQUEST)[0]['result'] == 'ok'
+
+    assert down.request_count <= 1
+    assert up.request_count == 10
+
+
+def test_asks_another_endpoint_when_lagging():
+    lagging = StaticBatchProvider(error={'code': -32004, 'message': 'Block not available for slot 1'})
+    synced = StaticBatchProvider(result='ok')
+    provider = LoadBalancedBatchProvider([('lagging', lagging), ('synced', synced)])
+
+    for _ in range(10):
+        assert provider.make_batch_request(REQUEST)[0]['result'] == 'ok'
+
+    assert lagging.request_count <= 1
+
+
+def test_raw_responses_are_checked_for_lag_errors():
+    lagging = StaticBatchProvider(error={'code': -32004, 'message': 'Block not available for slot 1'})
+    synced = StaticBatchProvider(result='ok')
+    provider = LoadBalancedBatchProvider([('lagging', lagging), ('synced', synced)])
+
+    for _ in range(10):
+        assert json.loads(provider.make_raw_batch_request(REQUEST))[0]['result'] == 'ok'
+
+    assert lagging.request_count <= 1
+
+
+def test_returns_lag_errors_when_all_endpoints_lag():
+    error = {'code': -32004, 'message': 'Block not available for slot 1'}
+    provider = LoadBalancedBatchProvider([
+        ('lagging1', StaticBatchProvider(error=error)), ('lagging2', StaticBatchProvider(error=error))])
+
+    assert provider.make_batch_request(REQUEST)[0]['error'] == error
+
+
+@pytest.mark.parametrize('status_code,fails_over', [(429, True), (503, True), (400, False)])
+def test_http_errors(status_code, fails_over):
+    failing = StaticBatchProvider(exception=http_error(status_code))
+    up = StaticBatchProvider(result='ok')
+    provider = LoadBalancedBatchProvider([('failing', failing), ('up', up)])
+    provider.endpoints[1].drained_until = float('inf')
+
+    if fails_over:
+        assert provider.make_batch_request(REQUEST)[0]['result'] == 'ok'
+    else:
+        with pytest.raises(HTTPError):
+            provider.make_batch_request(REQUEST)
+
+
+def test_comma_separated_uris():
+    provider = get_batch_provider_from_uri('http://localhost:8899, http://localhost:8900')
+
+    assert isinstance(provider, LoadBalancedBatchProvider)
+    assert [endpoint.endpoint_uri for endpoint in provider.endpoints] == [
+        'http://localhost:8899', 'http://localhost:8900']
@@ -0,0 +1,85 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import json
+import os
+
+from solanaetl.json_rpc_requests import generate_get_block_by_number_json_rpc, generate_json_rpc
+from solanaetl.providers.batch import BatchProvider
+from solanaetl.providers.cache import CachingBatchProvider, ResponseCache
+
+
+class EchoBatchProvider(BatchProvider):
+    def __init__(self):
+        self.requests = []
+
+    def make_batch_request(self, text):
+        batch = json.loads(text)
+        self.requests.extend(batch)
+        return [{'jsonrpc': '2.0', 'result': {'slot': request['params'][0]}, 'id': request['id']}
+                for request in batch]
+
+
+def blocks_request(block_numbers):
+    return json.dumps(list(generate_get_block_by_number_json_rpc(block_numbers, True)))
+
+
+def test_only_missing_requests_are_sent(tmpdir):
+    echo_provider = EchoBatchProvider()
+    provider = CachingBatchProvider(echo_provider, ResponseCache(str(tmpdir)))
+
+    first_response = provider.make_batch_request(blocks_request([1, 2]))
+    second_response = provider.make_batch_request(blocks_request([1, 2, 3]))
+
+    assert [item['result']['slot'] for item in first_response] == [1, 2]
+    assert [item['result']['slot'] for item in second_response] == [1, 2, 3]
+    assert [item['id'] for item in second_response] == [0, 1, 2]
+    assert [request['params'][0] for request in echo_provider.requests] == [1, 2, 3]
+
+
+def test_unfinalized_responses_are_not_cached(tmpdir):
+    echo_provider = EchoBatchProvider()
+    provider = CachingBatchProvider(echo_provider, ResponseCache(str(tmpdir)))
+    request = json.dumps([generate_json_rpc('getBlock', [1, {'commitment': 'confirmed'}], 0)])
+
+    provider.make_batch_request(request)
+    provider.make_batch_request(request)
+
+    assert len(echo_provider.requests) == 2
+
+
+def test_least_recently_used_responses_are_evicted(tmpdir):
+    cache = ResponseCache(str(tmpdir), max_size_bytes=1000)
+    for block_number in range(20):
+        cache.put('getBlock', [block_number], {'slot': block_number, 'data': os.urandom(50).hex()})
+        # Keeps the first block in use
+        assert cache.get('getBlock', [0]) is not None
+
+    sizes = [os.path.getsize(os.path.join(directory, file_name))
+             for directory, _, file_names in os.walk(str(tmpdir)) for file_name in file_names]
+    assert sum(sizes) <= 1000
+    assert cache.get('getBlock', [1]) is None
+    assert cache.get('getBlock', [19]) is not None
+
+
+def test_replaced_responses_are_counted_once(tmpdir):
+    cache = ResponseCache(str(tmpdir), max_size_bytes=1000)
+    for _ in range(100):
+        cache.put('getMultipleAccounts', [['pubkey']], {'value': [{'lamports': 1}]})
+
+    assert cache._size_bytes == cache._compute_size()
@@ -0,0 +1,104 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from solanaetl.providers.batch import AsyncBatchProvider
+from solanaetl.providers.concurrency import (AsyncConcurrencyLimitedBatchProvider, ConcurrencyLimitedBatchProvider,
+                                             ConcurrencyLimiter)
+
+
+class SlowBatchProvider(AsyncBatchProvider):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def make_batch_request(self, text):
+        self._enter()
+        time.sleep(0.01)
+        self._exit()
+        return text
+
+    async def make_batch_request_async(self, text):
+        self._enter()
+        await asyncio.sleep(0.01)
+        self._exit()
+        return text
+
+    def _enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+def test_providers_sharing_a_limiter_stay_within_its_requests():
+    slow_provider = SlowBatchProvider()
+    limiter = ConcurrencyLimiter(3)
+    providers = [ConcurrencyLimitedBatchProvider(slow_provider, limiter) for _ in range(4)]
+
+    with ThreadPoolExecutor(max_workers=12) as executor:
+        responses = list(executor.map(
+            lambda index: providers[index % 4].make_batch_request(str(index)), range(48)))
+
+    assert responses == [str(index) for index in range(48)]
+    assert slow_provider.max_in_flight == 3
+
+
+def test_async_providers_share_the_limiter_with_threads():
+    slow_provider = SlowBatchProvider()
+    limiter = ConcurrencyLimiter(2)
+    provider = AsyncConcurrencyLimitedBatchProvider(slow_provider, limiter)
+
+    async def make_requests():
+        return await asyncio.gather(*[provider.make_batch_request_async(str(index)) for index in range(10)])
+
+    thread = threading.Thread(target=lambda: [provider.make_batch_request('thread') for _ in range(10)])
+    thread.start()
+    responses = asyncio.run(make_requests())
+    thread.join()
+
+    assert responses == [str(index) for index in range(10)]
+    assert slow_provider.max_in_flight == 2
+
+
+def test_cancelled_requests_give_their_slot_back():
+    limiter = ConcurrencyLimiter(1)
+
+    async def hold_slot():
+        async with limiter.slot_async():
+            await asyncio.sleep(10)
+
+    async def cancel_requests():
+        tasks = [asyncio.ensure_future(hold_slot()) for _ in range(4)]
+        await asyncio.sleep(0.01)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        async with limiter.slot_async():
+            pass
+
+    asyncio.run(asyncio.wait_for(cancel_requests(), 5))
+    with limiter.slot():
+        pass
@@ -0,0 +1,43 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import json
+
+import pytest
+from solanaetl.providers.json_stream import decode_json_chunks
+
+RESPONSES = [
+    # Nested objects with an id field and escaped ids in strings
+    '[{"jsonrpc":"2.0","result":{"a":{"id":1},"s":"x\\"id\\":1}"},"id":0} , '
+    '{"jsonrpc":"2.0","error":{"code":-32009,"message":"Slot 1 was skipped"},"id":1}]',
+    # Not a batch
+    '{"jsonrpc":"2.0","error":{"code":-32600,"message":"Invalid request"},"id":null}',
+    ' [ ] ',
+    # The id isn't the last field
+    '[{"id":1,"result":2},{"id":2,"result":3}]',
+    '[{"jsonrpc":"2.0","result":"éè","id":"abc"}]',
+]
+
+
+@pytest.mark.parametrize('response', RESPONSES)
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 1024])
+def test_decode_json_chunks(response, chunk_size):
+    body = response.encode('utf-8')
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+    assert decode_json_chunks(chunks) == json.loads(body)
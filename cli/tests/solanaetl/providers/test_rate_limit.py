@@ -0,0 +1,90 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import time
+from multiprocessing import Process
+
+import pytest
+from solanaetl.providers.rate_limit import (FileTokenStore, RateLimiter,
+                                            get_rate_limited_seconds)
+
+
+def test_requests_per_second():
+    rate_limiter = RateLimiter(requests_per_second=50)
+
+    start_time = time.time()
+    for _ in range(75):
+        rate_limiter.acquire()
+
+    # 50 requests burst, the other 25 take half a second
+    assert 0.4 < time.time() - start_time < 1
+
+
+def test_response_bytes_delay_next_requests():
+    rate_limiter = RateLimiter(bytes_per_second=1000)
+    rate_limiter.acquire(100)
+    rate_limiter.observe_response(200, {}, 1200)
+
+    start_time = time.time()
+    rate_limiter.acquire(100)
+    assert time.time() - start_time > 0.35
+
+
+def test_retry_after_blocks_requests():
+    rate_limiter = RateLimiter(requests_per_second=1000)
+    rate_limiter.observe_response(429, {'Retry-After': '0.3'})
+
+    start_time = time.time()
+    rate_limiter.acquire()
+    assert time.time() - start_time > 0.25
+
+
+@pytest.mark.parametrize('status_code,headers,expected', [
+    (200, {}, None),
+    (429, {}, 1),
+    (429, {'Retry-After': '7'}, 7),
+    (429, {'X-RateLimit-Reset': '5'}, 5),
+    (429, {'X-RateLimit-Reset': '2000000012'}, 12),
+    (429, {'X-RateLimit-Reset': '2000000012000'}, 12),
+    (200, {'RateLimit-Remaining': '0', 'RateLimit-Reset': '3'}, 3),
+    (200, {'RateLimit-Remaining': '10', 'RateLimit-Reset': '3'}, None),
+    (503, {'Retry-After': 'Wed, 18 May 2033 03:33:30 GMT'}, 10),
+])
+def test_get_rate_limited_seconds(status_code, headers, expected):
+    assert get_rate_limited_seconds(status_code, headers, now=2000000000) == expected
+
+
+def acquire_requests(path, count):
+    rate_limiter = RateLimiter(requests_per_second=50, store=FileTokenStore(path))
+    for _ in range(count):
+        rate_limiter.acquire()
+
+
+def test_file_token_store_is_shared_between_processes(tmpdir):
+    path = str(tmpdir.join('rate_limit.json'))
+
+    start_time = time.time()
+    processes = [Process(target=acquire_requests, args=(path, 25)) for _ in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    # 75 requests at 50 requests per second across all the processes
+    assert all(process.exitcode == 0 for process in processes)
+    assert time.time() - start_time > 0.4
@@ -0,0 +1,65 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from solanaetl.jobs.export_blocks_job import ExportBlocksJob
+from solanaetl.jobs.exporters.blocks_and_transactions_item_exporter import \
+    blocks_and_transactions_item_exporter
+from solanaetl.providers.auto import get_batch_provider_from_uri
+from solanaetl.providers.cache import ResponseCache
+from solanaetl.services.fake_rpc_server import FakeRpcServer, SyntheticResponses
+from tests.helpers import compare_lines_ignore_order, read_file
+
+
+def export_blocks(batch_web3_provider, output_dir):
+    blocks_output_file = str(output_dir.join('blocks.csv'))
+    transactions_output_file = str(output_dir.join('transactions.csv'))
+    job = ExportBlocksJob(
+        start_block=100,
+        end_block=119,
+        batch_size=4,
+        batch_web3_provider=batch_web3_provider,
+        max_workers=2,
+        item_exporter=blocks_and_transactions_item_exporter(
+            blocks_output=blocks_output_file,
+            transactions_output=transactions_output_file,
+        ),
+        export_blocks=True,
+        export_transactions=True,
+        export_instructions=False,
+    )
+    job.run()
+    return read_file(blocks_output_file), read_file(transactions_output_file)
+
+
+def test_replay_recorded_responses(tmpdir):
+    recordings_dir = str(tmpdir.mkdir('recordings'))
+    server = FakeRpcServer(synthetic_responses=SyntheticResponses(
+        transactions_per_block=3, first_slot=100)).start()
+    try:
+        recorded = export_blocks(get_batch_provider_from_uri(
+            server.endpoint_uri, response_cache=ResponseCache(recordings_dir)), tmpdir.mkdir('recorded'))
+    finally:
+        server.shutdown()
+
+    replayed = export_blocks(
+        get_batch_provider_from_uri('replay://' + recordings_dir), tmpdir.mkdir('replayed'))
+
+    assert server.item_count > 0
+    for recorded_lines, replayed_lines in zip(recorded, replayed):
+        assert len(recorded_lines.splitlines()) > 1
+        compare_lines_ignore_order(recorded_lines, replayed_lines)
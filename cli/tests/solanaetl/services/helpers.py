@@ -0,0 +1,34 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import json
+
+from solanaetl.providers.batch import BatchProvider
+
+
+# Serves the synthetic responses of the fake RPC server in process, keeping the requests
+class SyntheticBatchProvider(BatchProvider):
+    def __init__(self, synthetic_responses):
+        self.synthetic_responses = synthetic_responses
+        self.requests = []
+
+    def make_batch_request(self, text):
+        batch = json.loads(text)
+        self.requests.extend(batch)
+        return [dict(self.synthetic_responses.get_response_item(request['method'], request['params']),
+                     jsonrpc='2.0', id=request['id']) for request in batch]
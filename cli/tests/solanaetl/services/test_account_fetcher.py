@@ -0,0 +1,74 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import pytest
+from solanaetl.misc.partial_batch_error import PartialBatchError
+from solanaetl.services.account_fetcher import AccountFetcher
+from solanaetl.services.fake_rpc_server import SyntheticResponses
+from tests.solanaetl.services.helpers import SyntheticBatchProvider
+
+
+# Answers in reverse order, with a retriable error for the given request ids
+class ShuffledBatchProvider(SyntheticBatchProvider):
+    def __init__(self, synthetic_responses, failed_ids=()):
+        super().__init__(synthetic_responses)
+        self.failed_ids = failed_ids
+        self.batch_count = 0
+
+    def make_batch_request(self, text):
+        self.batch_count += 1
+        response = super().make_batch_request(text)
+        return [{'jsonrpc': '2.0', 'error': {'code': -32005, 'message': 'Node is behind'}, 'id': item['id']}
+                if item['id'] in self.failed_ids else item for item in reversed(response)]
+
+
+def get_pubkeys(count):
+    return ['Pubkey{}'.format(index) for index in range(count)]
+
+
+def test_pubkeys_are_deduplicated_and_split_in_calls_of_one_batch():
+    synthetic_responses = SyntheticResponses()
+    provider = ShuffledBatchProvider(synthetic_responses)
+    items = list(enumerate(get_pubkeys(230) + get_pubkeys(20)))
+
+    values = list(AccountFetcher(provider).fetch(items, get_pubkey=lambda item: item[1]))
+
+    assert provider.batch_count == 1
+    assert [len(request['params'][0]) for request in provider.requests] == [100, 100, 30]
+    assert [item for item, _ in values] == items
+    assert [value for _, value in values] == [synthetic_responses.account(pubkey) for _, pubkey in items]
+
+
+def test_the_items_of_failed_calls_are_raised_after_the_others():
+    synthetic_responses = SyntheticResponses()
+    pubkeys = get_pubkeys(250)
+    fetched = []
+
+    with pytest.raises(PartialBatchError) as e:
+        for pubkey, value in AccountFetcher(ShuffledBatchProvider(synthetic_responses, failed_ids=[1])).fetch(pubkeys):
+            fetched.append(pubkey)
+
+    assert fetched == pubkeys[:100] + pubkeys[200:]
+    assert e.value.failed_items == pubkeys[100:200]
+    assert set(e.value.error_codes) == {-32005}
+
+
+def test_no_request_without_items():
+    provider = ShuffledBatchProvider(SyntheticResponses())
+
+    assert list(AccountFetcher(provider).fetch([])) == []
+    assert provider.batch_count == 0
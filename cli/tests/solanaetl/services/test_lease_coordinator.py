@@ -0,0 +1,125 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import multiprocessing
+import os
+import time
+
+from solanaetl.misc.export_stopped_error import ExportStoppedError
+from solanaetl.services.lease_coordinator import Lease, LeaseCoordinator, run_worker
+
+PARTITIONS = [(start, start + 9, '/start_block={}'.format(start)) for start in range(0, 100, 10)]
+
+
+def test_expired_leases_are_taken_over(tmpdir):
+    coordinator_dir = str(tmpdir.join('coordinator'))
+    dead_worker = LeaseCoordinator(coordinator_dir, 'dead', lease_seconds=0.2)
+    dead_worker.add_partitions(PARTITIONS[:1])
+    worker = LeaseCoordinator(coordinator_dir, 'alive', lease_seconds=0.2)
+
+    lease = dead_worker.claim()
+    assert lease.partition == PARTITIONS[0]
+    assert worker.claim() is None
+
+    time.sleep(0.3)
+    taken_over_lease = worker.claim()
+    assert taken_over_lease.partition == PARTITIONS[0]
+    assert not dead_worker.renew(lease)
+
+    worker.complete(taken_over_lease)
+    assert worker.is_finished()
+    assert dead_worker.claim() is None
+
+
+def test_a_lease_taken_over_meanwhile_stays_with_its_worker(tmpdir):
+    coordinator_dir = str(tmpdir.join('coordinator'))
+    dead_worker = LeaseCoordinator(coordinator_dir, 'dead', lease_seconds=0.2)
+    dead_worker.add_partitions(PARTITIONS[:1])
+    dead_worker.claim()
+    time.sleep(0.3)
+    first_worker = LeaseCoordinator(coordinator_dir, 'first', lease_seconds=5)
+    second_worker = LeaseCoordinator(coordinator_dir, 'second', lease_seconds=5)
+
+    # The second worker read the expired lease before the first one took it over
+    expired_leases = [second_worker._read_lease(second_worker._get_lease_path(PARTITIONS[0], 0))]
+    read_lease = second_worker._read_lease
+    second_worker._read_lease = lambda path: expired_leases.pop() if expired_leases else read_lease(path)
+    second_worker._get_lease_generation = lambda partition: 0
+    lease = first_worker.claim()
+
+    assert second_worker.claim() is None
+    assert first_worker.renew(lease)
+    assert first_worker.complete(lease)
+    assert first_worker.is_finished()
+
+
+def test_a_lost_lease_stops_the_export_without_completing_it(tmpdir):
+    coordinator_dir = str(tmpdir.join('coordinator'))
+    worker = LeaseCoordinator(coordinator_dir, 'worker', lease_seconds=0.3)
+    worker.add_partitions(PARTITIONS[:1])
+    thief = LeaseCoordinator(coordinator_dir, 'thief', lease_seconds=60)
+
+    def export_partition(partition, lease_lost):
+        thief_lease = Lease(partition, 'thief', 1)
+        assert thief._link_file(thief._get_lease_path(partition, 1), thief._get_lease_content(thief_lease))
+        assert lease_lost.wait(5)
+        assert thief.complete(thief_lease)
+        raise ExportStoppedError('The export was stopped')
+
+    assert run_worker(worker, export_partition, poll_seconds=0.1) == 0
+    with open(os.path.join(coordinator_dir, 'done', '0_9.json')) as done_file:
+        assert 'thief' in done_file.read()
+
+
+def test_complete_fails_without_the_lease(tmpdir):
+    coordinator_dir = str(tmpdir.join('coordinator'))
+    worker = LeaseCoordinator(coordinator_dir, 'worker')
+    worker.add_partitions(PARTITIONS[:1])
+
+    assert not worker.complete(Lease(PARTITIONS[0], 'unknown'))
+    assert not worker.is_finished()
+
+
+def export_partitions(coordinator_dir, output_dir, worker_id):
+    coordinator = LeaseCoordinator(coordinator_dir, worker_id, lease_seconds=5)
+    coordinator.add_partitions(PARTITIONS)
+
+    def export_partition(partition, lease_lost):
+        time.sleep(0.05)
+        with open(os.path.join(output_dir, '{}_{}.{}'.format(partition[0], partition[1], worker_id)), 'w'):
+            pass
+
+    run_worker(coordinator, export_partition, poll_seconds=0.1)
+
+
+def test_workers_export_each_partition_once(tmpdir):
+    coordinator_dir = str(tmpdir.join('coordinator'))
+    output_dir = str(tmpdir.mkdir('output'))
+
+    workers = [
+        multiprocessing.Process(target=export_partitions, args=(coordinator_dir, output_dir, 'worker{}'.format(index)))
+        for index in range(3)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+
+    exported_partitions = sorted(file_name.split('.')[0] for file_name in os.listdir(output_dir))
+    assert exported_partitions == sorted('{}_{}'.format(start, end) for start, end, _ in PARTITIONS)
+    assert LeaseCoordinator(coordinator_dir).is_finished()
@@ -0,0 +1,78 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from blockchainetl_common.jobs.exporters.in_memory_item_exporter import InMemoryItemExporter
+from solanaetl.jobs.export_blocks_job import ExportBlocksJob
+from solanaetl.services.fake_rpc_server import SyntheticResponses
+from solanaetl.services.skipped_slot_registry import CHUNK_SLOTS, SkippedSlotRegistry
+from tests.solanaetl.services.helpers import SyntheticBatchProvider
+
+
+def export_blocks(provider, start_block, end_block, skipped_slot_registry):
+    item_exporter = InMemoryItemExporter(item_types=['block', 'transaction', 'instruction'])
+    ExportBlocksJob(
+        start_block=start_block,
+        end_block=end_block,
+        batch_size=10,
+        batch_web3_provider=provider,
+        max_workers=2,
+        item_exporter=item_exporter,
+        export_transactions=False,
+        export_instructions=False,
+        skipped_slot_registry=skipped_slot_registry,
+    ).run()
+    return sorted(block['number'] for block in item_exporter.get_items('block'))
+
+
+def test_skipped_slots_are_never_requested(tmpdir):
+    synthetic_responses = SyntheticResponses(transactions_per_block=0, skipped_slot_rate=0.1, first_slot=1000)
+    produced_slots = [slot for slot in range(CHUNK_SLOTS - 50, CHUNK_SLOTS + 50)
+                      if not synthetic_responses.is_skipped(slot)]
+    provider = SyntheticBatchProvider(synthetic_responses)
+
+    blocks = export_blocks(provider, CHUNK_SLOTS - 50, CHUNK_SLOTS + 49, SkippedSlotRegistry(str(tmpdir)))
+
+    assert blocks == produced_slots
+    assert sorted(request['params'][0] for request in provider.requests if request['method'] == 'getBlock') == \
+        produced_slots
+
+    # Re-runs and gap fills within the scanned range don't scan again
+    provider.requests = []
+    blocks = export_blocks(provider, CHUNK_SLOTS - 20, CHUNK_SLOTS + 20, SkippedSlotRegistry(str(tmpdir)))
+
+    assert blocks == [slot for slot in produced_slots if CHUNK_SLOTS - 20 <= slot <= CHUNK_SLOTS + 20]
+    assert [request for request in provider.requests if request['method'] != 'getBlock'] == []
+
+
+def test_slots_after_the_last_block_are_not_known():
+    registry = SkippedSlotRegistry()
+    registry.record_scan(100, 200, [100, 102, 150])
+
+    assert registry.is_skipped(101)
+    assert not registry.is_skipped(160)
+    assert registry.get_unscanned_intervals(90, 210) == [(90, 99), (151, 210)]
+
+
+def test_slots_before_the_first_block_are_not_known():
+    # e.g. a node whose ledger starts at slot 120
+    registry = SkippedSlotRegistry()
+    registry.record_scan(100, 200, [120, 122, 200])
+
+    assert not registry.is_skipped(110)
+    assert registry.is_skipped(121)
+    assert registry.get_unscanned_intervals(100, 200) == [(100, 119)]
@@ -0,0 +1,92 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import calendar
+from datetime import date
+
+from requests import Response
+from requests.exceptions import HTTPError, ReadTimeout
+from solanaetl.services.fake_rpc_server import SyntheticResponses
+from solanaetl.services.slot_time_index import SlotTimeIndex
+from solanaetl.services.sol_service import SolService
+from tests.solanaetl.services.helpers import SyntheticBatchProvider
+
+
+def get_first_slot(synthetic_responses, timestamp):
+    slot = int((timestamp - synthetic_responses.block_time(0)) / 0.4) - 10
+    while synthetic_responses.block_time(slot) < timestamp or synthetic_responses.is_skipped(slot):
+        slot += 1
+    return slot
+
+
+def test_get_block_range_for_date(tmpdir):
+    synthetic_responses = SyntheticResponses(skipped_slot_rate=0.1, first_slot=150000000)
+    provider = SyntheticBatchProvider(synthetic_responses)
+    index_file = str(tmpdir.join('slot_time_index.json'))
+    sol_service = SolService(provider, SlotTimeIndex(index_file))
+
+    start_slot, end_slot = sol_service.get_block_range_for_date(date(2021, 12, 18))
+
+    start_timestamp = calendar.timegm(date(2021, 12, 18).timetuple())
+    assert start_slot == get_first_slot(synthetic_responses, start_timestamp)
+    assert end_slot == get_first_slot(synthetic_responses, start_timestamp + 24 * 60 * 60) - 1
+    assert len(provider.requests) < 150
+
+    # The next day is bounded by the indexed block times, the same day is already known
+    provider.requests = []
+    sol_service = SolService(provider, SlotTimeIndex(index_file))
+    assert sol_service.get_block_range_for_date(date(2021, 12, 18)) == (start_slot, end_slot)
+    assert provider.requests == []
+
+    next_start_slot, _ = sol_service.get_block_range_for_date(date(2021, 12, 19))
+    assert next_start_slot == end_slot + 1 or synthetic_responses.is_skipped(end_slot + 1)
+
+
+# Fails every other request, in turn rate limited, timed out and answered by a node behind the cluster
+class FlakySyntheticBatchProvider(SyntheticBatchProvider):
+    def __init__(self, synthetic_responses):
+        super().__init__(synthetic_responses)
+        self.request_count = 0
+        self.failure_count = 0
+
+    def make_batch_request(self, text):
+        self.request_count += 1
+        if self.request_count % 2 == 1:
+            return super().make_batch_request(text)
+        self.failure_count += 1
+        failure = self.failure_count % 3
+        if failure == 0:
+            response = Response()
+            response.status_code = 429
+            raise HTTPError('429 Too Many Requests', response=response)
+        if failure == 1:
+            raise ReadTimeout('Read timed out')
+        return [dict(item, result=None, error={'code': -32004, 'message': 'Block not available'})
+                for item in super().make_batch_request(text)]
+
+
+def test_probes_are_retried_on_transient_errors():
+    synthetic_responses = SyntheticResponses(skipped_slot_rate=0.1, first_slot=150000000)
+    provider = FlakySyntheticBatchProvider(synthetic_responses)
+    sol_service = SolService(provider, retry_delay_seconds=0)
+
+    start_slot, _ = sol_service.get_block_range_for_date(date(2021, 12, 18))
+
+    start_timestamp = calendar.timegm(date(2021, 12, 18).timetuple())
+    assert start_slot == get_first_slot(synthetic_responses, start_timestamp)
+    assert provider.failure_count > 3
@@ -0,0 +1,135 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import asyncio
+import json
+import threading
+import time
+
+import websockets
+from blockchainetl_common.jobs.exporters.in_memory_item_exporter import InMemoryItemExporter
+from blockchainetl_common.streaming.streamer import Streamer
+from solanaetl.providers.auto import get_batch_provider_from_uri
+from solanaetl.services.fake_rpc_server import FakeRpcServer, SyntheticResponses
+from solanaetl.streaming.slot_watcher import SlotWatcher
+from solanaetl.streaming.solana_streamer_adapter import SolanaStreamerAdapter
+
+
+class InMemoryStreamItemExporter(InMemoryItemExporter):
+    def export_items(self, items):
+        for item in items:
+            self.export_item(item)
+
+
+def test_stream(tmpdir):
+    # The chain is already past the streamed slots
+    server = FakeRpcServer(synthetic_responses=SyntheticResponses(
+        transactions_per_block=2, skipped_slot_rate=0.2, first_slot=1030)).start()
+    last_synced_block_file = str(tmpdir.join('last_synced_slot.txt'))
+    item_exporter = InMemoryStreamItemExporter(item_types=['block', 'transaction', 'instruction'])
+    try:
+        streamer = Streamer(
+            blockchain_streamer_adapter=SolanaStreamerAdapter(
+                batch_web3_provider=get_batch_provider_from_uri(server.endpoint_uri),
+                item_exporter=item_exporter,
+                batch_size=3,
+                entity_types=['block', 'transaction'],
+            ),
+            last_synced_block_file=last_synced_block_file,
+            start_block=1000,
+            end_block=1019,
+            period_seconds=0.1,
+            block_batch_size=7,
+        )
+        streamer.stream()
+    finally:
+        server.shutdown()
+
+    blocks = item_exporter.get_items('block')
+    skipped_slots = [slot for slot in range(1000, 1020) if server.synthetic_responses.is_skipped(slot)]
+    assert sorted(block['number'] for block in blocks) == \
+        [slot for slot in range(1000, 1020) if slot not in skipped_slots]
+    assert len(item_exporter.get_items('transaction')) == 2 * len(blocks)
+    assert item_exporter.get_items('instruction') == []
+    with open(last_synced_block_file) as f:
+        assert int(f.read()) == 1019
+
+
+def test_stream_confirmed(tmpdir):
+    # Nodes answer retriable errors for the recent skipped slots, they must be found by the getBlocks scans. The
+    # ranges start and end with skipped slots
+    server = FakeRpcServer(synthetic_responses=SyntheticResponses(
+        transactions_per_block=2, skipped_slot_rate=0.2, first_slot=1030, skipped_slot_error_code=-32007)).start()
+    last_synced_block_file = str(tmpdir.join('last_synced_slot.txt'))
+    item_exporter = InMemoryStreamItemExporter(item_types=['block', 'transaction', 'instruction'])
+    try:
+        streamer = Streamer(
+            blockchain_streamer_adapter=SolanaStreamerAdapter(
+                batch_web3_provider=get_batch_provider_from_uri(server.endpoint_uri),
+                item_exporter=item_exporter,
+                batch_size=3,
+                entity_types=['block'],
+                commitment='confirmed',
+            ),
+            last_synced_block_file=last_synced_block_file,
+            start_block=1000,
+            end_block=1019,
+            period_seconds=0.1,
+            block_batch_size=5,
+            retry_errors=False,
+        )
+        streamer.stream()
+    finally:
+        server.shutdown()
+
+    blocks = item_exporter.get_items('block')
+    assert sorted(block['number'] for block in blocks) == \
+        [slot for slot in range(1000, 1020) if not server.synthetic_responses.is_skipped(slot)]
+
+
+def test_slot_watcher():
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    async def notify_roots(connection):
+        request = json.loads(await connection.recv())
+        assert request['method'] == 'rootSubscribe'
+        await connection.send(json.dumps({'jsonrpc': '2.0', 'result': 0, 'id': request['id']}))
+        for slot in range(100, 103):
+            await connection.send(json.dumps({
+                'jsonrpc': '2.0', 'method': 'rootNotification', 'params': {'result': slot, 'subscription': 0}}))
+        await connection.wait_closed()
+
+    async def serve():
+        async with websockets.serve(notify_roots, '127.0.0.1', 0) as ws_server:
+            serve.port = ws_server.sockets[0].getsockname()[1]
+            started.set()
+            await asyncio.Future()
+
+    threading.Thread(target=lambda: loop.run_until_complete(serve()), daemon=True).start()
+    started.wait()
+
+    slot_watcher = SlotWatcher('ws://127.0.0.1:{}'.format(serve.port), 'finalized')
+    slot_watcher.start()
+    try:
+        deadline = time.monotonic() + 10
+        while slot_watcher.get_latest_slot() != 102 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert slot_watcher.get_latest_slot() == 102
+    finally:
+        slot_watcher.stop()
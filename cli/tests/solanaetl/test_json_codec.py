@@ -0,0 +1,82 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import importlib.util
+import json
+import sys
+
+import pytest
+from solanaetl import json_codec
+
+DOCUMENTS = [
+    {'jsonrpc': '2.0', 'result': {'slot': 138802069, 'fee': 5000, 'ratio': 1e-07, 'ok': True, 'err': None}, 'id': 0},
+    [{'memo': 'éè / "quoted" \\ ✓', 'data': ['AQID', 'base64'], 'nested': [[], {}]}],
+]
+
+
+def load_json_codec(monkeypatch, missing_modules):
+    """A fresh copy of the module, imported as if the given libraries weren't installed"""
+    for module_name in missing_modules:
+        monkeypatch.setitem(sys.modules, module_name, None)
+    spec = importlib.util.spec_from_file_location('json_codec_under_test', json_codec.__file__)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.mark.parametrize('missing_modules,codec', [
+    ([], 'orjson'),
+    (['orjson'], 'ujson'),
+    (['orjson', 'ujson'], 'json'),
+])
+def test_the_fastest_installed_library_is_picked(monkeypatch, missing_modules, codec):
+    pytest.importorskip('orjson')
+    pytest.importorskip('ujson')
+
+    assert load_json_codec(monkeypatch, missing_modules).CODEC == codec
+
+
+@pytest.mark.parametrize('missing_modules', [[], ['orjson'], ['orjson', 'ujson']])
+@pytest.mark.parametrize('document', DOCUMENTS)
+def test_dumps_compact_round_trips(monkeypatch, missing_modules, document):
+    codec = load_json_codec(monkeypatch, missing_modules)
+
+    text = codec.dumps_compact(document)
+
+    assert codec.loads(text) == document
+    assert codec.loads(text.encode('utf-8')) == document
+    assert codec.loads(bytearray(text.encode('utf-8'))) == document
+    assert json.loads(text) == document
+    assert ', ' not in text and ': ' not in text
+
+
+@pytest.mark.parametrize('missing_modules', [[], ['orjson'], ['orjson', 'ujson']])
+def test_loads_accepts_what_the_standard_library_accepts(monkeypatch, missing_modules):
+    codec = load_json_codec(monkeypatch, missing_modules)
+
+    # A lone surrogate, which orjson rejects
+    assert codec.loads(b'{"memo":"\\ud800"}') == {'memo': '\ud800'}
+    with pytest.raises(ValueError):
+        codec.loads(b'{"memo":')
+
+
+@pytest.mark.parametrize('missing_modules', [[], ['orjson'], ['orjson', 'ujson']])
+def test_dumps_matches_the_standard_library(monkeypatch, missing_modules):
+    codec = load_json_codec(monkeypatch, missing_modules)
+
+    for document in DOCUMENTS:
+        assert codec.dumps(document) == json.dumps(document)
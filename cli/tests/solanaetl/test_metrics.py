@@ -0,0 +1,69 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import json
+from urllib.request import urlopen
+
+from solanaetl import metrics
+from solanaetl.metrics import MetricsRegistry
+from solanaetl.providers.rpc import BatchHTTPProvider
+from solanaetl.services.fake_rpc_server import FakeRpcServer, SyntheticResponses
+
+
+def test_histograms_are_exposed_with_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('latency_seconds', 'Latency.', ['method'], buckets=(0.1, 1))
+    for value in [0.05, 0.5, 5]:
+        histogram.labels('getBlock').observe(value)
+    registry.counter('requests_total', 'Requests.').inc(3)
+
+    assert registry.to_text().splitlines() == [
+        '# HELP latency_seconds Latency.',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{method="getBlock",le="0.1"} 1',
+        'latency_seconds_bucket{method="getBlock",le="1"} 2',
+        'latency_seconds_bucket{method="getBlock",le="+Inf"} 3',
+        'latency_seconds_sum{method="getBlock"} 5.55',
+        'latency_seconds_count{method="getBlock"} 3',
+        '# HELP requests_total Requests.',
+        '# TYPE requests_total counter',
+        'requests_total 3',
+    ]
+
+
+def test_rpc_requests_are_served_and_dumped(tmpdir):
+    server = FakeRpcServer(synthetic_responses=SyntheticResponses(transactions_per_block=1))
+    server.start()
+    metrics_server = metrics.start_metrics_server('127.0.0.1:0')
+    try:
+        provider = BatchHTTPProvider(server.endpoint_uri + '/secret-api-key')
+        provider.make_batch_request('[{"jsonrpc":"2.0","method":"getBlockTime","params":[300000000],"id":0}]')
+        with urlopen('http://127.0.0.1:{}/metrics'.format(metrics_server.server_address[1])) as response:
+            text = response.read().decode('utf-8')
+    finally:
+        metrics_server.shutdown()
+        server.shutdown()
+
+    assert 'solanaetl_rpc_requests_total{method="getBlockTime",endpoint="127.0.0.1",status="200"}' in text
+    assert 'secret-api-key' not in text
+
+    metrics_file = str(tmpdir.join('metrics.json'))
+    metrics.dump_metrics(metrics_file)
+    with open(metrics_file) as file:
+        samples = json.load(file)['metrics']['solanaetl_rpc_request_seconds']['samples']
+    assert {'method': 'getBlockTime', 'endpoint': '127.0.0.1'} in [sample['labels'] for sample in samples]
@@ -0,0 +1,66 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import threading
+import time
+
+from solanaetl.profiler import AllocationProfiler, SamplingProfiler
+
+
+def spin(seconds):
+    end_time = time.time() + seconds
+    while time.time() < end_time:
+        pass
+
+
+def allocate_blocks():
+    return [bytearray(1024) for _ in range(4096)]
+
+
+def test_stacks_are_sampled_by_thread(tmpdir):
+    profiler = SamplingProfiler(interval_seconds=0.001)
+    profiler.start()
+    thread = threading.Thread(target=spin, args=(0.3,), name='Spinner')
+    thread.start()
+    thread.join()
+    profiler.stop()
+
+    stacks_file = str(tmpdir.join('stacks.collapsed'))
+    profiler.write_collapsed_stacks(stacks_file)
+    with open(stacks_file) as file:
+        spinner_stacks = [line for line in file if line.startswith('Spinner;')]
+
+    assert any(';spin (tests/solanaetl/test_profiler.py:' in line for line in spinner_stacks)
+    assert sum(int(line.rsplit(' ', 1)[1]) for line in spinner_stacks) > 10
+
+
+def test_allocations_are_reported_at_the_peak(tmpdir):
+    allocation_profiler = AllocationProfiler(frame_count=5, interval_seconds=0.01)
+    allocation_profiler.start()
+    blocks = allocate_blocks()
+    time.sleep(0.1)
+    del blocks
+    allocation_profiler.stop()
+
+    report_file = str(tmpdir.join('allocations.txt'))
+    allocation_profiler.write_report(report_file, top=3)
+    with open(report_file) as file:
+        report = file.read()
+
+    assert allocation_profiler.peak_snapshot_bytes > 4 * 2 ** 20
+    assert 'tests/solanaetl/test_profiler.py:' in report
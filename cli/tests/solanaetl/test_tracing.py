@@ -0,0 +1,55 @@
+# The MIT License (MIT)
+# Copyright (c) 2022 Gamejam.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial
+# portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import json
+
+from solanaetl import tracing
+from solanaetl.jobs.export_blocks_job import ExportBlocksJob
+from solanaetl.jobs.exporters.blocks_and_transactions_item_exporter import \
+    blocks_and_transactions_item_exporter
+from solanaetl.providers.rpc import BatchHTTPProvider
+from solanaetl.services.fake_rpc_server import FakeRpcServer, SyntheticResponses
+
+
+def test_export_batches_are_traced(tmpdir):
+    trace_file = str(tmpdir.join('trace.json'))
+    server = FakeRpcServer(synthetic_responses=SyntheticResponses(transactions_per_block=2))
+    server.start()
+    tracing.start_tracing(trace_file)
+    try:
+        job = ExportBlocksJob(
+            start_block=300000000, end_block=300000009, batch_size=5,
+            batch_web3_provider=BatchHTTPProvider(server.endpoint_uri), max_workers=2,
+            item_exporter=blocks_and_transactions_item_exporter(
+                str(tmpdir.join('blocks.csv')), str(tmpdir.join('transactions.csv')),
+                str(tmpdir.join('instructions.csv'))))
+        job.run()
+    finally:
+        tracing.stop_tracing()
+        server.shutdown()
+
+    with open(trace_file) as file:
+        # The closing bracket is left out, trace viewers accept it missing
+        events = json.loads(file.read().rstrip().rstrip(',') + ']')
+
+    spans = [event for event in events if event['ph'] == 'X']
+    assert {'batch', 'build_request', 'http_wait', 'json_decode', 'BlockMapper.from_json_dict', 'map_block',
+            'export_items'} <= {event['name'] for event in spans}
+    map_block_spans = [event for event in spans if event['name'] == 'map_block']
+    assert len(map_block_spans) == 10
+    assert all('to_dict' in event['args'] and 'InstructionParser.parse' in event['args'] for event in map_block_spans)